@@ -13,6 +13,10 @@ target_metadata = Base.metadata
 # access to the values within the .ini file in use.
 config = context.config
 
+# Migrate the database the app uses (DATABASE_URL, default: the dev SQLite file)
+from backend.config import DATABASE_URL
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
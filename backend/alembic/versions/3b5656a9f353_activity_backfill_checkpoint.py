@@ -0,0 +1,40 @@
+"""add backfill checkpoint columns to activity_sync_state
+
+Revision ID: 3b5656a9f353
+Revises: 3ec6fbb5ee6f
+Create Date: 2026-10-16 15:22:48.604127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b5656a9f353'
+down_revision: Union[str, Sequence[str], None] = '3ec6fbb5ee6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("activity_sync_state") as batch:
+        batch.add_column(sa.Column("backfill_status", sa.String, nullable=True))
+        batch.add_column(sa.Column("backfill_before", sa.Integer, nullable=True))
+        batch.add_column(sa.Column("backfill_imported", sa.Integer, nullable=False, server_default="0"))
+        batch.add_column(sa.Column("backfill_failed", sa.Integer, nullable=False, server_default="0"))
+        batch.add_column(sa.Column("backfill_started_at", sa.Integer, nullable=True))
+        batch.add_column(sa.Column("backfill_updated_at", sa.Integer, nullable=True))
+        batch.add_column(sa.Column("backfill_error", sa.Text, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("activity_sync_state") as batch:
+        batch.drop_column("backfill_error")
+        batch.drop_column("backfill_updated_at")
+        batch.drop_column("backfill_started_at")
+        batch.drop_column("backfill_failed")
+        batch.drop_column("backfill_imported")
+        batch.drop_column("backfill_before")
+        batch.drop_column("backfill_status")
@@ -0,0 +1,35 @@
+"""add gpt_cache table for cached coach answers
+
+Revision ID: 3ec6fbb5ee6f
+Revises: e6f669e502d4
+Create Date: 2026-10-16 14:05:37.281904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3ec6fbb5ee6f'
+down_revision: Union[str, Sequence[str], None] = 'e6f669e502d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gpt_cache",
+        sa.Column("key", sa.String, primary_key=True),
+        sa.Column("model", sa.String, nullable=False),
+        sa.Column("response_json", sa.Text, nullable=False),
+        sa.Column("created_at", sa.Float, nullable=False),
+        sa.Column("last_used_at", sa.Float, nullable=False),
+    )
+    op.create_index("ix_gpt_cache_last_used_at", "gpt_cache", ["last_used_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_gpt_cache_last_used_at", table_name="gpt_cache")
+    op.drop_table("gpt_cache")
@@ -0,0 +1,96 @@
+"""add local activity store (activities, laps, splits, streams)
+
+Revision ID: 4ec7b3acb3ee
+Revises: 8507240777a6
+Create Date: 2026-10-16 09:12:40.118372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4ec7b3acb3ee'
+down_revision: Union[str, Sequence[str], None] = '8507240777a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "activities",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("strava_id", sa.BigInteger, nullable=False),
+        sa.Column("name", sa.String, nullable=True),
+        sa.Column("sport_type", sa.String, nullable=True),
+        sa.Column("start_date_local", sa.String, nullable=True),
+        sa.Column("distance", sa.Float, nullable=True),
+        sa.Column("moving_time", sa.Integer, nullable=True),
+        sa.Column("elapsed_time", sa.Integer, nullable=True),
+        sa.Column("average_heartrate", sa.Float, nullable=True),
+        sa.Column("max_heartrate", sa.Float, nullable=True),
+        sa.Column("total_elevation_gain", sa.Float, nullable=True),
+        sa.Column("summary_hash", sa.String, nullable=True),
+        sa.Column("detail_json", sa.Text, nullable=True),
+        sa.Column("updated_at", sa.Integer, nullable=False),
+        sa.Column("detail_fetched_at", sa.Integer, nullable=True),
+        sa.UniqueConstraint("user_id", "strava_id", name="uq_activity_owner_strava"),
+    )
+    op.create_index("ix_activities_user_start", "activities", ["user_id", "start_date_local"])
+
+    op.create_table(
+        "activity_laps",
+        sa.Column("activity_id", sa.Integer, sa.ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("lap_index", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String, nullable=True),
+        sa.Column("distance", sa.Float, nullable=True),
+        sa.Column("moving_time", sa.Integer, nullable=True),
+        sa.Column("elapsed_time", sa.Integer, nullable=True),
+        sa.Column("average_heartrate", sa.Float, nullable=True),
+        sa.Column("max_heartrate", sa.Float, nullable=True),
+        sa.Column("average_cadence", sa.Float, nullable=True),
+        sa.Column("total_elevation_gain", sa.Float, nullable=True),
+        sa.Column("average_speed", sa.Float, nullable=True),
+    )
+
+    op.create_table(
+        "activity_splits",
+        sa.Column("activity_id", sa.Integer, sa.ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("split_index", sa.Integer, primary_key=True),
+        sa.Column("distance", sa.Float, nullable=True),
+        sa.Column("moving_time", sa.Integer, nullable=True),
+        sa.Column("elapsed_time", sa.Integer, nullable=True),
+        sa.Column("average_heartrate", sa.Float, nullable=True),
+        sa.Column("elevation_difference", sa.Float, nullable=True),
+        sa.Column("average_speed", sa.Float, nullable=True),
+        sa.Column("pace_zone", sa.Integer, nullable=True),
+    )
+
+    op.create_table(
+        "activity_streams",
+        sa.Column("activity_id", sa.Integer, sa.ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("stream_type", sa.String, primary_key=True),
+        sa.Column("series_type", sa.String, nullable=True),
+        sa.Column("original_size", sa.Integer, nullable=True),
+        sa.Column("resolution", sa.String, nullable=True),
+        sa.Column("data", sa.Text, nullable=False),
+    )
+
+    op.create_table(
+        "activity_sync_state",
+        sa.Column("user_id", sa.Integer, primary_key=True),
+        sa.Column("athlete_json", sa.Text, nullable=True),
+        sa.Column("list_synced_at", sa.Integer, nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("activity_sync_state")
+    op.drop_table("activity_streams")
+    op.drop_table("activity_splits")
+    op.drop_table("activity_laps")
+    op.drop_index("ix_activities_user_start", table_name="activities")
+    op.drop_table("activities")
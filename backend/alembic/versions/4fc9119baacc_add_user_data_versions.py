@@ -0,0 +1,31 @@
+"""add user_data_versions table for ETags
+
+Revision ID: 4fc9119baacc
+Revises: 842328372629
+Create Date: 2026-10-16 18:26:04.771390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4fc9119baacc'
+down_revision: Union[str, Sequence[str], None] = '842328372629'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_data_versions",
+        sa.Column("user_id", sa.Integer, primary_key=True),
+        sa.Column("scope", sa.String, primary_key=True),
+        sa.Column("version", sa.Integer, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_data_versions")
@@ -0,0 +1,28 @@
+"""add version column to training_plan for optimistic concurrency
+
+Revision ID: 842328372629
+Revises: a27b4c00dabf
+Create Date: 2026-10-16 17:48:30.215563
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '842328372629'
+down_revision: Union[str, Sequence[str], None] = 'a27b4c00dabf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("training_plan") as batch:
+        batch.add_column(sa.Column("version", sa.Integer, nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("training_plan") as batch:
+        batch.drop_column("version")
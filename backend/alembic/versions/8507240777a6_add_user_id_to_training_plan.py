@@ -12,7 +12,7 @@ import sqlalchemy as sa
 
 
 # revision identifiers, used by Alembic.
-revision: str = "<PUT_NEW_REVISION_ID_HERE>"
+revision: str = "8507240777a6"
 down_revision: Union[str, Sequence[str], None] = "facd5735c1af"  # <-- your last head; adjust if different
 branch_labels = None
 depends_on = None
@@ -0,0 +1,55 @@
+"""training_plan.date as DATE, composite (user_id, date, id) index
+
+Revision ID: a27b4c00dabf
+Revises: 3b5656a9f353
+Create Date: 2026-10-16 17:05:12.381940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a27b4c00dabf'
+down_revision: Union[str, Sequence[str], None] = '3b5656a9f353'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_training_plan_user_id", table_name="training_plan")
+    if op.get_bind().dialect.name == "sqlite":
+        # Batch mode would copy rows with CAST(date AS DATE), which SQLite turns into a
+        # number ('2026-10-18' -> 2026). DATE is stored as 'YYYY-MM-DD' text, so copy
+        # the (trimmed) text into a new DATE column instead.
+        with op.batch_alter_table("training_plan") as batch:
+            batch.add_column(sa.Column("date_new", sa.Date(), nullable=True))
+        op.execute("UPDATE training_plan SET date_new = substr(date, 1, 10)")
+        with op.batch_alter_table("training_plan") as batch:
+            batch.drop_column("date")
+            batch.alter_column("date_new", new_column_name="date", existing_type=sa.Date(), nullable=False)
+    else:
+        op.alter_column(
+            "training_plan",
+            "date",
+            existing_type=sa.String(),
+            type_=sa.Date(),
+            existing_nullable=False,
+            postgresql_using="substr(date, 1, 10)::date",
+        )
+    # Covers the old user_id-only lookups too (leftmost prefix)
+    op.create_index("ix_training_plan_user_date_id", "training_plan", ["user_id", "date", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_training_plan_user_date_id", table_name="training_plan")
+    with op.batch_alter_table("training_plan") as batch:
+        batch.alter_column(
+            "date",
+            existing_type=sa.Date(),
+            type_=sa.String(),
+            existing_nullable=False,
+        )
+    op.create_index("ix_training_plan_user_id", "training_plan", ["user_id"])
@@ -0,0 +1,29 @@
+"""add min/max pyramid blob to activity_streams
+
+Revision ID: a59a50a79b2c
+Revises: 4fc9119baacc
+Create Date: 2026-10-16 19:02:41.517306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a59a50a79b2c'
+down_revision: Union[str, Sequence[str], None] = '4fc9119baacc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows stay NULL: activity_store builds their pyramid when they are first read
+    with op.batch_alter_table("activity_streams") as batch:
+        batch.add_column(sa.Column("pyramid", sa.LargeBinary, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("activity_streams") as batch:
+        batch.drop_column("pyramid")
@@ -0,0 +1,29 @@
+"""add refresh claim to strava_tokens
+
+Revision ID: c81d2f4e7a93
+Revises: a59a50a79b2c
+Create Date: 2026-10-17 00:12:08.204517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d2f4e7a93'
+down_revision: Union[str, Sequence[str], None] = 'a59a50a79b2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Epoch seconds until which one process owns the row's refresh (NULL = nobody)
+    with op.batch_alter_table("strava_tokens") as batch:
+        batch.add_column(sa.Column("refresh_claimed_until", sa.Integer, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("strava_tokens") as batch:
+        batch.drop_column("refresh_claimed_until")
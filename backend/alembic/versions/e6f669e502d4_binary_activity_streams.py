@@ -0,0 +1,94 @@
+"""store activity streams as compact binary columns
+
+Revision ID: e6f669e502d4
+Revises: 4ec7b3acb3ee
+Create Date: 2026-10-16 11:40:05.502317
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f669e502d4'
+down_revision: Union[str, Sequence[str], None] = '4ec7b3acb3ee'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of backend/utils/stream_codec.py at the time of this migration
+_CODECS = {
+    "heartrate": ("<u1", False),
+    "cadence": ("<u1", False),
+    "distance": ("<f4", True),
+    "time": ("<u4", True),
+    "altitude": ("<f4", False),
+    "velocity_smooth": ("<f4", False),
+    "watts": ("<u2", False),
+    "temp": ("<i1", False),
+}
+
+def _encode(stream_type, data):
+    dtype, delta = _CODECS.get(stream_type, ("<f4", False))
+    arr = np.asarray(data or [], dtype=np.float64)
+    if delta:
+        arr = np.diff(arr, prepend=0.0)
+    if np.dtype(dtype).kind in "iu":
+        info = np.iinfo(dtype)
+        arr = np.clip(np.rint(arr), 0 if delta else info.min, info.max)
+    return arr.astype(dtype).tobytes(), f"{dtype}+delta" if delta else dtype
+
+def _decode(payload, encoding):
+    dtype, _, transform = encoding.partition("+")
+    arr = np.frombuffer(payload, dtype=dtype)
+    if transform == "delta":
+        arr = np.cumsum(arr, dtype=np.float64)
+    return arr.tolist()
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("activity_streams") as batch:
+        batch.add_column(sa.Column("length", sa.Integer, nullable=True))
+        batch.add_column(sa.Column("encoding", sa.String, nullable=True))
+        batch.add_column(sa.Column("payload", sa.LargeBinary, nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT activity_id, stream_type, data FROM activity_streams")).fetchall()
+    for activity_id, stream_type, data in rows:
+        values = json.loads(data or "[]")
+        payload, encoding = _encode(stream_type, values)
+        bind.execute(
+            sa.text("""
+                UPDATE activity_streams SET length=:n, encoding=:enc, payload=:payload
+                WHERE activity_id=:aid AND stream_type=:st
+            """),
+            {"n": len(values), "enc": encoding, "payload": payload, "aid": activity_id, "st": stream_type},
+        )
+
+    with op.batch_alter_table("activity_streams") as batch:
+        batch.alter_column("length", existing_type=sa.Integer, nullable=False)
+        batch.alter_column("encoding", existing_type=sa.String, nullable=False)
+        batch.alter_column("payload", existing_type=sa.LargeBinary, nullable=False)
+        batch.drop_column("data")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("activity_streams") as batch:
+        batch.add_column(sa.Column("data", sa.Text, nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT activity_id, stream_type, encoding, payload FROM activity_streams")).fetchall()
+    for activity_id, stream_type, encoding, payload in rows:
+        bind.execute(
+            sa.text("UPDATE activity_streams SET data=:data WHERE activity_id=:aid AND stream_type=:st"),
+            {"data": json.dumps(_decode(payload, encoding)), "aid": activity_id, "st": stream_type},
+        )
+
+    with op.batch_alter_table("activity_streams") as batch:
+        batch.alter_column("data", existing_type=sa.Text, nullable=False)
+        batch.drop_column("payload")
+        batch.drop_column("encoding")
+        batch.drop_column("length")
@@ -10,4 +10,93 @@ ENABLE_GPT = os.getenv("ENABLE_GPT", "false").lower() in ("1","true","yes")
 STRAVA_CLIENT_ID = os.getenv("STRAVA_CLIENT_ID")
 STRAVA_CLIENT_SECRET = os.getenv("STRAVA_CLIENT_SECRET")
 STRAVA_REDIRECT_URI = os.getenv("STRAVA_REDIRECT_URI")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
\ No newline at end of file
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Database (see db/session.py): SQLite for dev, any SQLAlchemy URL (postgresql://…) in production
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///backend/db/RunningCoach.db")
+# SQLite pragmas applied to every new connection (WAL journal, synchronous=NORMAL)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+# Server databases: connection pool per engine (the sync and async engines each have one)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Strava API root (override to point at a local stub for benchmarks)
+STRAVA_API_BASE = os.getenv("STRAVA_API_BASE", "https://www.strava.com/api/v3").rstrip("/")
+
+# Pooled Strava HTTP client (see services/strava_http.py)
+STRAVA_HTTP_MAX_CONNECTIONS = int(os.getenv("STRAVA_HTTP_MAX_CONNECTIONS", "20"))
+STRAVA_HTTP_MAX_KEEPALIVE = int(os.getenv("STRAVA_HTTP_MAX_KEEPALIVE", "10"))
+STRAVA_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("STRAVA_HTTP_KEEPALIVE_EXPIRY", "30"))
+STRAVA_HTTP_TIMEOUT = float(os.getenv("STRAVA_HTTP_TIMEOUT", "20"))
+STRAVA_HTTP_CONNECT_TIMEOUT = float(os.getenv("STRAVA_HTTP_CONNECT_TIMEOUT", "5"))
+
+# Strava API budget, retries and circuit breaker (see services/strava_client.py).
+# Limits are read from Strava's X-RateLimit-* headers; these are the assumed values until the first response
+STRAVA_RATE_LIMIT_15MIN = int(os.getenv("STRAVA_RATE_LIMIT_15MIN", "100"))
+STRAVA_RATE_LIMIT_DAILY = int(os.getenv("STRAVA_RATE_LIMIT_DAILY", "1000"))
+STRAVA_RATE_BURST = float(os.getenv("STRAVA_RATE_BURST", "20"))
+# Share of each window that background work (backfill, webhooks) leaves for page views
+STRAVA_RATE_BACKGROUND_RESERVE = float(os.getenv("STRAVA_RATE_BACKGROUND_RESERVE", "0.2"))
+# Page views give up (StravaRateLimited) rather than wait longer than this for budget
+STRAVA_RATE_MAX_WAIT_SECONDS = float(os.getenv("STRAVA_RATE_MAX_WAIT_SECONDS", "10"))
+STRAVA_MAX_RETRIES = int(os.getenv("STRAVA_MAX_RETRIES", "3"))
+STRAVA_RETRY_BASE_SECONDS = float(os.getenv("STRAVA_RETRY_BASE_SECONDS", "0.5"))
+STRAVA_RETRY_MAX_SECONDS = float(os.getenv("STRAVA_RETRY_MAX_SECONDS", "8"))
+STRAVA_BREAKER_THRESHOLD = int(os.getenv("STRAVA_BREAKER_THRESHOLD", "5"))
+STRAVA_BREAKER_COOLDOWN_SECONDS = float(os.getenv("STRAVA_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Local activity store (see services/activity_store.py)
+# Re-validate the activity list (home page / "latest activity") after this many seconds
+ACTIVITY_LIST_TTL_SECONDS = int(os.getenv("ACTIVITY_LIST_TTL_SECONDS", "900"))
+# Activities younger than this are still being edited on Strava (title, laps, crops)...
+ACTIVITY_SETTLE_SECONDS = int(os.getenv("ACTIVITY_SETTLE_SECONDS", str(3 * 24 * 3600)))
+# ...so their cached detail is re-fetched once it is older than this
+ACTIVITY_REFRESH_SECONDS = int(os.getenv("ACTIVITY_REFRESH_SECONDS", "3600"))
+
+# Strava push subscription (see routes/webhook_routes.py): the verify_token given when subscribing,
+# and the subscription id Strava returned; events are rejected (403) until both are set
+STRAVA_WEBHOOK_VERIFY_TOKEN = os.getenv("STRAVA_WEBHOOK_VERIFY_TOKEN")
+STRAVA_WEBHOOK_SUBSCRIPTION_ID = os.getenv("STRAVA_WEBHOOK_SUBSCRIPTION_ID")
+STRAVA_WEBHOOK_QUEUE_SIZE = int(os.getenv("STRAVA_WEBHOOK_QUEUE_SIZE", "1000"))
+
+# Full-history backfill (see services/backfill.py): activities per list page, bundles fetched at once
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "100"))
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+
+# HR chart on the feedback page: "plotly" (interactive, cached plot file) or "svg" (inline, no Plotly);
+# ?chart=plotly|svg overrides it per request
+HR_CHART = os.getenv("HR_CHART", "plotly").lower()
+# HR plot trace: decimate streams to this many points ("lttb" | "minmax", see utils/downsample.py), 0 = off
+PLOT_MAX_POINTS = int(os.getenv("PLOT_MAX_POINTS", "2000"))
+PLOT_DOWNSAMPLE = os.getenv("PLOT_DOWNSAMPLE", "lttb").lower()
+
+# Rendered HR plots cache, backend/static/plots (see utils/plot_cache.py)
+PLOT_CACHE_MAX_MB = int(os.getenv("PLOT_CACHE_MAX_MB", "200"))
+PLOT_CACHE_MAX_AGE_DAYS = int(os.getenv("PLOT_CACHE_MAX_AGE_DAYS", "30"))
+
+# Decrypted Strava access tokens kept in memory (see services/token_manager.py)
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "1024"))
+
+# Background token refresher (see services/token_refresher.py)
+TOKEN_REFRESHER_ENABLED = os.getenv("TOKEN_REFRESHER_ENABLED", "true").lower() in ("1","true","yes")
+# Refresh tokens that expire within this many seconds...
+TOKEN_REFRESH_WINDOW_SECONDS = int(os.getenv("TOKEN_REFRESH_WINDOW_SECONDS", "900"))
+# ...scanning this often, with at most this many refreshes in flight
+TOKEN_REFRESH_INTERVAL_SECONDS = int(os.getenv("TOKEN_REFRESH_INTERVAL_SECONDS", "60"))
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "4"))
+TOKEN_REFRESH_JITTER_SECONDS = float(os.getenv("TOKEN_REFRESH_JITTER_SECONDS", "5"))
+
+# OpenAI client (shared, see services/gpt_helper.py)
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# Coach answer cache (see services/gpt_cache.py)
+GPT_CACHE_ENABLED = os.getenv("GPT_CACHE_ENABLED", "true").lower() in ("1","true","yes")
+GPT_CACHE_TTL_SECONDS = int(os.getenv("GPT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+GPT_CACHE_MAX_ENTRIES = int(os.getenv("GPT_CACHE_MAX_ENTRIES", "1000"))
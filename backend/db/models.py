@@ -1,5 +1,5 @@
 # backend/db/models.py
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, UniqueConstraint, func, Index
+from sqlalchemy import Column, Integer, BigInteger, Float, LargeBinary, String, Text, Date, DateTime, ForeignKey, UniqueConstraint, func, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -8,8 +8,8 @@ class TrainingPlan(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     # NEW:
-    user_id = Column(Integer, nullable=True, index=True)  # keep nullable for SQLite; enforce in app
-    date = Column(String, nullable=False)
+    user_id = Column(Integer, nullable=True)  # keep nullable for SQLite; enforce in app
+    date = Column(Date, nullable=False)
     type = Column(String, nullable=True)
     description = Column(String, nullable=True)
     warmup_target = Column(String, nullable=True)
@@ -17,6 +17,13 @@ class TrainingPlan(Base):
     cooldown_target = Column(String, nullable=True)
     terrain = Column(String, nullable=True)
     notes = Column(String, nullable=True)
+    # Optimistic concurrency: ORM flushes bump it and check the old value (StaleDataError
+    # on mismatch); Core updates in the routes do the same by hand
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Serves GET /plans: one user's plans in (date, id) order, range filters and keyset pages
+    __table_args__ = (Index("ix_training_plan_user_date_id", "user_id", "date", "id"),)
+    __mapper_args__ = {"version_id_col": version}
 
 class StravaToken(Base):
     __tablename__ = "strava_tokens"
@@ -24,6 +31,8 @@ class StravaToken(Base):
     access_token  = Column(String,  nullable=False)
     refresh_token = Column(String,  nullable=False)
     expires_at    = Column(Integer, nullable=False)
+    # Cross-process refresh lock (see token_manager._claim_refresh): epoch seconds, NULL = free
+    refresh_claimed_until = Column(Integer, nullable=True)
 
 class User(Base):
     __tablename__ = "users"
@@ -49,4 +58,101 @@ class AuthIdentity(Base):
     expires_at       = Column(Integer, nullable=True)
 
     user = relationship("User", back_populates="identities")
-    __table_args__ = (UniqueConstraint("provider", "provider_user_id", name="uq_provider_user"),)
\ No newline at end of file
+    __table_args__ = (UniqueConstraint("provider", "provider_user_id", name="uq_provider_user"),)
+class Activity(Base):
+    """Local copy of a Strava activity (summary columns + raw detail payload)."""
+    __tablename__ = "activities"
+    id                   = Column(Integer, primary_key=True, autoincrement=True)
+    user_id              = Column(Integer, nullable=False)           # local owner (users.id)
+    strava_id            = Column(BigInteger, nullable=False)        # Strava activity id
+    name                 = Column(String, nullable=True)
+    sport_type           = Column(String, nullable=True)
+    start_date_local     = Column(String, nullable=True)             # ISO string, as Strava sends it
+    distance             = Column(Float, nullable=True)              # meters
+    moving_time          = Column(Integer, nullable=True)            # seconds
+    elapsed_time         = Column(Integer, nullable=True)
+    average_heartrate    = Column(Float, nullable=True)
+    max_heartrate        = Column(Float, nullable=True)
+    total_elevation_gain = Column(Float, nullable=True)
+    summary_hash         = Column(String, nullable=True)             # fingerprint of the list summary
+    detail_json          = Column(Text, nullable=True)               # NULL until the detail was fetched
+    updated_at           = Column(Integer, nullable=False)           # epoch: last known change on Strava's side
+    detail_fetched_at    = Column(Integer, nullable=True)            # epoch: detail/streams/laps pulled
+
+    laps    = relationship("ActivityLap", cascade="all, delete-orphan", order_by="ActivityLap.lap_index")
+    splits  = relationship("ActivitySplit", cascade="all, delete-orphan", order_by="ActivitySplit.split_index")
+    streams = relationship("ActivityStream", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "strava_id", name="uq_activity_owner_strava"),
+        Index("ix_activities_user_start", "user_id", "start_date_local"),
+    )
+
+class ActivityLap(Base):
+    __tablename__ = "activity_laps"
+    activity_id          = Column(Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True)
+    lap_index            = Column(Integer, primary_key=True)         # 1-based, Strava order
+    name                 = Column(String, nullable=True)
+    distance             = Column(Float, nullable=True)
+    moving_time          = Column(Integer, nullable=True)
+    elapsed_time         = Column(Integer, nullable=True)
+    average_heartrate    = Column(Float, nullable=True)
+    max_heartrate        = Column(Float, nullable=True)
+    average_cadence      = Column(Float, nullable=True)
+    total_elevation_gain = Column(Float, nullable=True)
+    average_speed        = Column(Float, nullable=True)
+
+class ActivitySplit(Base):
+    __tablename__ = "activity_splits"
+    activity_id          = Column(Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True)
+    split_index          = Column(Integer, primary_key=True)         # Strava "split" (1-based, metric)
+    distance             = Column(Float, nullable=True)
+    moving_time          = Column(Integer, nullable=True)
+    elapsed_time         = Column(Integer, nullable=True)
+    average_heartrate    = Column(Float, nullable=True)
+    elevation_difference = Column(Float, nullable=True)
+    average_speed        = Column(Float, nullable=True)
+    pace_zone            = Column(Integer, nullable=True)
+
+class ActivityStream(Base):
+    __tablename__ = "activity_streams"
+    activity_id   = Column(Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True)
+    stream_type   = Column(String, primary_key=True)                 # "heartrate" | "distance" | ...
+    series_type   = Column(String, nullable=True)
+    original_size = Column(Integer, nullable=True)
+    resolution    = Column(String, nullable=True)
+    length        = Column(Integer, nullable=False)                  # number of samples
+    encoding      = Column(String, nullable=False)                   # see utils/stream_codec.py, e.g. "<u1", "<f4+delta"
+    payload       = Column(LargeBinary, nullable=False)
+    pyramid       = Column(LargeBinary, nullable=True)                # min/max levels, see utils/stream_pyramid.py
+
+class ActivitySyncState(Base):
+    """Per-user bookkeeping for the activity store (when the list was last pulled, cached athlete)."""
+    __tablename__ = "activity_sync_state"
+    user_id        = Column(Integer, primary_key=True)
+    athlete_json   = Column(Text, nullable=True)
+    list_synced_at = Column(Integer, nullable=True)                  # epoch of the last /athlete/activities pull
+    # Full-history backfill checkpoint (see services/backfill.py)
+    backfill_status     = Column(String, nullable=True)             # running | done | failed
+    backfill_before     = Column(Integer, nullable=True)            # epoch cursor: everything newer is imported
+    backfill_imported   = Column(Integer, nullable=False, default=0, server_default="0")
+    backfill_failed     = Column(Integer, nullable=False, default=0, server_default="0")
+    backfill_started_at = Column(Integer, nullable=True)
+    backfill_updated_at = Column(Integer, nullable=True)
+    backfill_error      = Column(Text, nullable=True)
+
+class GptCacheEntry(Base):
+    """Cached chat completion, keyed by sha256(model + messages) (see services/gpt_cache.py)."""
+    __tablename__ = "gpt_cache"
+    key           = Column(String, primary_key=True)                # hex sha256
+    model         = Column(String, nullable=False)
+    response_json = Column(Text, nullable=False)                    # resp.model_dump() as JSON
+    created_at    = Column(Float, nullable=False)                   # epoch; TTL counts from here
+    last_used_at  = Column(Float, nullable=False, index=True)       # epoch; LRU eviction order
+
+class UserDataVersion(Base):
+    """Per-user change counter per data scope, bumped on every write (ETags; see services/data_versions.py)."""
+    __tablename__ = "user_data_versions"
+    user_id = Column(Integer, primary_key=True)
+    scope   = Column(String, primary_key=True)        # "plans" | "activities" | "feedback"
+    version = Column(Integer, nullable=False, default=0)
@@ -1,25 +1,97 @@
 # backend/db/session.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from .base import Base
 import os
+import backend.config as config
 # Import the whole module so all models register with Base
 from . import models  # noqa: F401
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///backend/db/RunningCoach.db"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL: readers no longer block the writer (and vice versa); synchronous=NORMAL is
+    # durable across app crashes and only risks the last commits on power loss
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(config.SQLITE_CACHE_SIZE_KB)}")   # negative = KiB
+    finally:
+        cursor.close()
+
+def _engine_options(url: str) -> dict:
+    """Per-backend create_engine()/create_async_engine() options."""
+    if _is_sqlite(url):
+        # Per-file pool; the limits below only make sense for a database server
+        return {}
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE_SECONDS,   # before the server/proxy drops idle connections
+        "pool_pre_ping": config.DB_POOL_PRE_PING,        # replace connections that died while idle
+    }
+
+def _tune(sync_engine: Engine, url: str) -> None:
+    if _is_sqlite(url) and make_url(url).database not in (None, "", ":memory:"):
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+def make_engine(url: str) -> Engine:
+    """Sync engine for `url` with the pool/pragma tuning above (also used by scripts/bench_db.py)."""
+    connect_args = {"check_same_thread": False} if _is_sqlite(url) else {}
+    eng = create_engine(url, connect_args=connect_args, **_engine_options(url))
+    _tune(eng, url)
+    return eng
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async twin for request handlers: DB waits suspend the coroutine instead of holding
+# one of the threadpool's slots. Same database, async driver (aiosqlite / asyncpg).
+# Used by auth, training plans, tokens, identities and data_versions. The activity
+# store and the coach cache stay on SessionLocal: their writes also encode streams and
+# build pyramids, which an async driver wouldn't take off the loop, so async code
+# calls their a* functions, which run the sync transaction in a worker thread.
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """'sqlite:///x.db' -> 'sqlite+aiosqlite:///x.db', 'postgresql://…' -> 'postgresql+asyncpg://…'."""
+    u = make_url(url)
+    driver = _ASYNC_DRIVERS.get(u.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {u.drivername!r}")
+    return u.set(drivername=driver).render_as_string(hide_password=False)
+
+def make_async_engine(url: str):
+    eng = create_async_engine(async_database_url(url), **_engine_options(url))
+    _tune(eng.sync_engine, url)
+    return eng
+
+async_engine = make_async_engine(SQLALCHEMY_DATABASE_URL)
+
+# expire_on_commit=False: attribute access after commit would need a lazy (sync) load
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # ❌ REMOVE this in an Alembic-managed project:
 # Base.metadata.create_all(bind=engine)
 
 def init_models():
     Base.metadata.create_all(bind=engine)
 
+async def dispose_engines():
+    """Close pooled connections on shutdown (main.lifespan)."""
+    await async_engine.dispose()
+    engine.dispose()
+
 # Optional dev-only escape hatch (off by default):
 if os.getenv("DB_CREATE_ALL") == "1":
     Base.metadata.create_all(bind=engine)
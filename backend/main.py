@@ -2,22 +2,37 @@
 import os
 from fastapi.responses import RedirectResponse
 from fastapi import FastAPI, Response, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-from .db.session import init_models
+from .db.session import init_models, dispose_engines
+from .services.strava_http import open_clients, close_clients
+from .services import gpt_helper, token_refresher, backfill, strava_webhook
 from contextlib import asynccontextmanager
 
 import backend.config as config
 from backend.routes.auth_routes import router as auth_router
 from backend.routes.activity_routes import router as activity_router
 from backend.routes.training_plan_routes import router as training_plan_router
+from backend.routes.webhook_routes import router as webhook_router
+from backend.utils.static_files import CachedStaticFiles
 
 @asynccontextmanager
 async def lifespan(app):
     init_models()   # <- this creates missing tables
-    yield
+    await open_clients()   # pooled Strava HTTP clients, shared by all requests
+    strava_webhook.start()   # applies queued Strava webhook events to the local store
+    if config.TOKEN_REFRESHER_ENABLED:
+        token_refresher.start()   # refresh tokens before they expire, off the request path
+    try:
+        yield
+    finally:
+        await token_refresher.stop()
+        await backfill.stop_all()
+        await strava_webhook.stop()
+        await close_clients()
+        await gpt_helper.close_clients()
+        await dispose_engines()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -39,6 +54,7 @@ async def metrics():
 app.include_router(auth_router)
 app.include_router(activity_router)
 app.include_router(training_plan_router)
+app.include_router(webhook_router)
 
 # CORS (adjust as needed for your dev/prod hosts)
 app.add_middleware(
@@ -48,6 +64,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # GET /plans paging, GET /activities/{id}/streams binary layout
+    expose_headers=["X-Next-Cursor", "X-Stream-Columns", "X-Stream-Resolution", "X-Stream-Count"],
 )
 # Cookie-based sessions (set https_only=True in production over HTTPS)
 app.add_middleware(
@@ -59,10 +77,10 @@ app.add_middleware(
     domain=os.getenv("SESSION_COOKIE_DOMAIN"),
 )
 
-# Static files
+# Static files (plots/ and vendor/ are content-addressed, see utils/plot_cache.py and utils/plotly_asset.py)
 app.mount(
     "/static",
-    StaticFiles(directory=os.path.join(os.path.dirname(__file__), "static")),
+    CachedStaticFiles(directory=os.path.join(os.path.dirname(__file__), "static"), immutable_prefixes=("plots", "vendor")),
     name="static",
 )
 
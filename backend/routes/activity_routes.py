@@ -1,32 +1,44 @@
 # backend/routes/activity_routes.py
 
-from fastapi import Request, APIRouter, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import Request, APIRouter, Depends, HTTPException, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
 
 import os
+import json
 import httpx
 import secrets
 import logging
 import math
+import numpy as np
 
-from collections import defaultdict
 from datetime import datetime, timezone
+from typing import AsyncIterator, Literal
 from html import escape
 
 from backend.deps.auth import get_current_user
-from backend.services.token_manager import get_access_token, save_tokens, delete_tokens
-from backend.services.identity_manager import link_strava_identity, unlink_strava_identity
+from backend.services.token_manager import aget_access_token, asave_tokens, adelete_tokens
+from backend.services.identity_manager import alink_strava_identity, aunlink_strava_identity
 from backend.utils.utils import (
     safe_str, safe_round, safe_int, safe_int_scaled,
     format_date, format_duration, format_pace, to_float, to_int, to_int_scaled
 )
-from backend.utils.hr_plot import save_hr_plot_plotly
-from backend.services.gpt_helper import call_chat_completion
+from backend.utils.hr_plot import save_hr_plot_plotly, PLOT_REVISION
+from backend.utils.hr_svg import render_hr_svg
+from backend.utils.splits import split_hr_stats, SPLIT_LENGTHS_M
+from backend.utils import stream_pyramid
+from backend.services.gpt_helper import astream_chat_completion
+from backend.services.strava_api import StravaAuthError, get_activity_bundle, get_recent_activities
+from backend.services import strava_client, backfill, activity_store, data_versions
+from backend.services.strava_client import StravaUnavailable
+from backend.services.activity_store import aget_cached_list_state, asave_athlete
+from backend.services.strava_http import get_async_client
+from backend.utils.etag import make_etag, etag_matches
+import backend.config as config
 from urllib.parse import urlencode, parse_qs, quote
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from zoneinfo import ZoneInfo  # Python 3.9+
-from pathlib import Path
 from time import time
 
 FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
@@ -90,7 +102,7 @@ async def require_csrf(request: Request):
     raise HTTPException(status_code=403, detail="CSRF check failed")
 
 @router.get("/", response_class=HTMLResponse)
-def home(request: Request):
+async def home(request: Request):
     # If NOT logged in → send to login SPA (same as you already do elsewhere if desired)
     # return RedirectResponse("/login?next=/", status_code=303)
 
@@ -100,28 +112,31 @@ def home(request: Request):
     activities_list = []
 
     if local_user_id:
-        access_token = get_access_token(str(local_user_id))
-        if access_token:
-            headers = {"Authorization": f"Bearer {access_token}"}
+        access_token = await aget_access_token(str(local_user_id))
+        list_fresh, cached_athlete = await aget_cached_list_state(int(local_user_id))
+        if access_token and list_fresh and cached_athlete:
+            # Served from the local store: no Strava round trips on repeat views
+            athlete = cached_athlete
+            valid_token = True
+            from backend.services.strava_api import get_last_20_activities
+            activities_list = await get_last_20_activities(str(local_user_id))
+        elif access_token:
             try:
-                r = httpx.get(
-                    "https://www.strava.com/api/v3/athlete",
-                    headers=headers,
-                    timeout=10.0,
-                )
+                r = await strava_client.request("GET", "/athlete", access_token=access_token, timeout=10.0)
                 if r.status_code == 200:
                     athlete = r.json()
                     valid_token = True
+                    await asave_athlete(int(local_user_id), athlete)
                     # only fetch activities if the token actually works
                     from backend.services.strava_api import get_last_20_activities
-                    activities_list = get_last_20_activities(str(local_user_id))
+                    activities_list = await get_last_20_activities(str(local_user_id))
                 elif r.status_code in (401, 403):
                     # token was invalidated at Strava (e.g., deauthorize in another session)
                     logger.warning(
                         "Strava %s on /athlete for user %s → wiping tokens",
                         r.status_code, local_user_id
                     )
-                    delete_tokens(str(local_user_id))
+                    await adelete_tokens(str(local_user_id))
                     valid_token = False
                     athlete = None
                     activities_list = []
@@ -130,7 +145,7 @@ def home(request: Request):
                         "Strava unexpected %s on /athlete: %s",
                         r.status_code, r.text
                     )
-            except httpx.HTTPError as e:
+            except (httpx.HTTPError, StravaUnavailable) as e:
                 logger.warning("Strava API error on /athlete: %s", e)
 
     csrf = ensure_csrf(request)
@@ -172,7 +187,7 @@ def connect_strava(request: Request):
 
 # --- Callback (no login required here) ---
 @router.get("/strava_callback")
-def strava_callback(code: str, state: str):
+async def strava_callback(code: str, state: str):
     # 1) Verify state
     try:
         data = SER.loads(state, max_age=600)  # 10 minutes
@@ -184,7 +199,7 @@ def strava_callback(code: str, state: str):
     user_id = data["u"]
 
     # 2) Exchange code → tokens
-    token_url = "https://www.strava.com/api/v3/oauth/token"
+    token_url = f"{config.STRAVA_API_BASE}/oauth/token"
     payload = {
         "client_id": os.getenv("STRAVA_CLIENT_ID"),
         "client_secret": os.getenv("STRAVA_CLIENT_SECRET"),
@@ -192,7 +207,7 @@ def strava_callback(code: str, state: str):
         "grant_type": "authorization_code",
     }
     try:
-        res = httpx.post(token_url, data=payload, timeout=20.0)
+        res = await get_async_client().post(token_url, data=payload)
         res.raise_for_status()
     except httpx.HTTPStatusError as e:
         logger.error("Strava token exchange failed: %s %s", e.response.status_code, e.response.text)
@@ -207,11 +222,12 @@ def strava_callback(code: str, state: str):
         raise HTTPException(502, "Token exchange succeeded but no access_token in response")
 
     # 3) Save + link
-    save_tokens(str(user_id), tokens)
+    await asave_tokens(str(user_id), tokens)
     try:
-        link_strava_identity(user_id, tokens)
+        await alink_strava_identity(user_id, tokens)
     except Exception as e:
         logger.warning("Identity link warning: %s", e)
+    await data_versions.abump_now(int(user_id), data_versions.FEEDBACK)
 
     return RedirectResponse(url="/activity_feedback")
 
@@ -223,72 +239,113 @@ async def disconnect_strava(request: Request):
         return RedirectResponse("/login?next=/", status_code=303)
 
     # Revoke on Strava (optional, if you want consent next time)
-    access_token = get_access_token(str(user_id))
+    access_token = await aget_access_token(str(user_id))
     if access_token:
         try:
             # Strava deauth; pass the athlete token
-            await httpx.AsyncClient().post(
+            await get_async_client().post(
                 "https://www.strava.com/oauth/deauthorize",
                 data={"access_token": access_token}, timeout=10.0
             )
         except httpx.HTTPError as e:
             logger.warning("Strava deauthorize failed: %s", e)
 
-    delete_tokens(str(user_id))
+    await adelete_tokens(str(user_id))
     try:
-        unlink_strava_identity(int(user_id))
+        await aunlink_strava_identity(int(user_id))
     except Exception as e:
         logger.warning("unlink warning: %s", e)
+    await data_versions.abump_now(int(user_id), data_versions.FEEDBACK)
 
     return RedirectResponse("/", status_code=303)
 
-@router.get("/activity_feedback", response_class=HTMLResponse)
-async def activity_feedback(request: Request, activity_id: str | None = None):
+@router.post("/activities/backfill")
+async def start_backfill(request: Request, restart: bool = False):
+    """Import the user's whole Strava history in the background (resumes a previous run)."""
+    await require_csrf(request)
     user_id = request.session.get("user_id")
     if not user_id:
-        # preserve deep link back to this page
-        nxt = "/activity_feedback"
-        if activity_id:
-            from urllib.parse import urlencode
-            nxt = f"/activity_feedback?{urlencode({'activity_id': str(activity_id)})}"
-        return RedirectResponse(f"/login?next={nxt}", status_code=303)
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if not await aget_access_token(str(user_id)):
+        raise HTTPException(status_code=409, detail="Strava not connected")
+    return JSONResponse(await backfill.start(int(user_id), restart=restart), status_code=202)
 
-    local_user_id = str(user_id)
-    access_token = get_access_token(local_user_id)
+@router.get("/activities/backfill")
+def backfill_status(request: Request):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return backfill.status(int(user_id))
+
+COACH_MODEL = "gpt-3.5-turbo"
+COACH_SYSTEM_PROMPT = (
+    "You are an expert marathon coach. Analyze the workout below, "
+    "comment on pacing strategy, heart rate drift, aerobic vs threshold distribution, "
+    "and give feedback on execution and improvement tips. Be clear and detailed."
+)
+
+PAGE_HEAD = """
+    <!doctype html>
+    <meta charset="utf-8">
+    <title>Activity Feedback</title>
+    <style>
+    body { font-family: ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Arial; padding: 16px; }
+    pre { white-space: pre-wrap; background:#f7f7f7; padding:12px; border-radius:8px; }
+    .grid { display:grid; gap:16px; grid-template-columns: 1fr; max-width: 1000px; }
+    h1, h2 { margin: 0 0 8px; }
+    </style>
+    <div class="grid">
+"""
+# Part of the /activity_feedback ETag: bump when the page markup changes
+FEEDBACK_PAGE_REVISION = 1
+
+class FeedbackUnavailable(Exception):
+    """The feedback page can't be built; `reason` tells the caller how to answer."""
+    def __init__(self, reason: str, status_code: int, message: str = ""):
+        super().__init__(message or reason)
+        self.reason = reason            # "reconnect" | "no_activities" | "strava_error"
+        self.status_code = status_code
+        self.message = message
+
+async def _load_feedback(local_user_id: str, activity_id: int | None) -> dict:
+    """Everything up to (not including) the plot and the coach: Strava data + summary text."""
+    access_token = await aget_access_token(local_user_id)
     if not access_token:
-        return RedirectResponse("/connect_strava", status_code=303)
-
-    headers = {"Authorization": f"Bearer {access_token}"}
-
-    async def get_json(url: str, *, params: dict | None = None):
-        """Fetch JSON from Strava; if 401, ask user to reconnect (or refresh here if you have a refresher)."""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            r = await client.get(url, headers=headers, params=params)
-            if r.status_code == 401:
-                # If you have a refresh flow, do it here then retry once.
-                # tokens = await refresh_tokens_for_user(local_user_id)  # if implemented
-                # headers["Authorization"] = f"Bearer {tokens['access_token']}"
-                # r = await client.get(url, headers=headers, params=params)
-                return RedirectResponse("/connect_strava")
-            r.raise_for_status()
-            return r.json()
+        raise FeedbackUnavailable("reconnect", 303)
 
     # 1) Latest activity if none specified
-    if not activity_id:
-        activities = await get_json("https://www.strava.com/api/v3/athlete/activities")
-        if isinstance(activities, RedirectResponse):  # bubbled reconnection
-            return activities
+    if activity_id is None:
+        try:
+            activities = await get_recent_activities(int(local_user_id), access_token)
+        except StravaAuthError:
+            raise FeedbackUnavailable("reconnect", 307)
+        except StravaUnavailable as e:
+            logger.warning("Strava unavailable for the activity list: %s", e)
+            raise FeedbackUnavailable("strava_error", 503, "Strava is busy right now, please try again in a few minutes.")
         if not activities:
-            return HTMLResponse("No activities found", status_code=200)
+            raise FeedbackUnavailable("no_activities", 200, "No activities found")
         latest_activity = activities[0]
         activity_id = latest_activity["id"]
 
-    # 2) Detailed activity
-    activity_url = f"https://www.strava.com/api/v3/activities/{activity_id}"
-    activity = await get_json(activity_url)
-    if isinstance(activity, RedirectResponse):
-        return activity
+    # 2) Detailed activity + 3) streams + 6) laps: local store, else fetched concurrently
+    try:
+        activity, streams, laps = await get_activity_bundle(int(local_user_id), access_token, activity_id)
+    except StravaAuthError:
+        raise FeedbackUnavailable("reconnect", 307)
+    except StravaUnavailable as e:
+        logger.warning("Strava unavailable for activity %s: %s", activity_id, e)
+        raise FeedbackUnavailable("strava_error", 503, "Strava is busy right now, please try again in a few minutes.")
+    except httpx.HTTPStatusError as e:
+        logger.warning("Strava activity %s fetch failed: %s", activity_id, e)
+        status = 404 if e.response.status_code == 404 else 502
+        raise FeedbackUnavailable("strava_error", status, "Could not load this activity from Strava.")
+    except httpx.HTTPError as e:
+        logger.warning("Strava activity %s fetch failed: %s", activity_id, e)
+        raise FeedbackUnavailable("strava_error", 502, "Could not reach Strava, please try again.")
+
+    return {"activity_id": activity_id, **_build_feedback(activity, streams, laps)}
 
+def _build_feedback(activity: dict, streams: dict, laps: list) -> dict:
     # Basic fields
     name = safe_str(activity.get("name"), "Unnamed Activity")
     start_time = format_date(activity.get("start_date_local"))
@@ -304,46 +361,15 @@ async def activity_feedback(request: Request, activity_id: str | None = None):
     splits = activity.get("splits_metric", []) or []
 
     # 3) HR Stream
-    streams = await get_json(
-        f"https://www.strava.com/api/v3/activities/{activity_id}/streams",
-        params={"keys": "heartrate,distance", "key_by_type": True},
-    )
-    if isinstance(streams, RedirectResponse):
-        return streams
-    hr_data = (streams.get("heartrate") or {}).get("data", []) or []
-    dist_data = (streams.get("distance") or {}).get("data", []) or []
-
-    # Optional plot (use existing helper)
-    hr_plot_html = ""
-    if hr_data and dist_data:
-        try:
-            plot_result = save_hr_plot_plotly(dist_data, hr_data, distance_km)
-            # Support common return styles from your helper:
-            if isinstance(plot_result, str):
-                pr = plot_result.strip()
-                if pr.startswith("<"):  # helper returned inline HTML
-                    hr_plot_html = pr
-                elif pr.lower().endswith((".html", ".htm")):  # path to an HTML file
-                    hr_plot_html = f"<iframe src='{pr}' style='width:100%;height:380px;border:0'></iframe>"
-                elif pr.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".svg")):  # image path
-                    hr_plot_html = f"<img src='{pr}' alt='Heart rate plot' style='max-width:100%;height:auto'/>"
-            # If helper returns None, nothing to embed (keeps page clean)
-        except Exception as e:
-            logger.warning("HR plot render failed: %s", e)
-        static_path = Path(__file__).parent / "static" / "hr_plot.html"
-        if not hr_plot_html and static_path.exists():
-            hr_plot_html = "<iframe src='/static/hr_plot.html' style='width:100%;height:380px;border:0'></iframe>"
-
-    # 4) HR split map
-    split_hr_map: dict[int, list[int]] = defaultdict(list)
-    for dist, hr in zip(dist_data, hr_data):
-        split_index = int(dist // 1000)
-        split_hr_map[split_index].append(hr)
+    # NumPy arrays (uint8 HR, float64 meters), decoded from the compact stored form
+    hr_data = (streams.get("heartrate") or {}).get("data", [])
+    dist_data = (streams.get("distance") or {}).get("data", [])
+    time_data = (streams.get("time") or {}).get("data")
 
-    split_max_hrs: dict[int, int | str] = {}
-    for i in range(1, len(splits) + 1):
-        split_max_hr = max(split_hr_map.get(i - 1, []), default="N/A")
-        split_max_hrs[i] = split_max_hr
+    # 4) HR per split (vectorized over the distance stream, see utils/splits.py)
+    split_hr = split_hr_stats(dist_data, hr_data, split_m=SPLIT_LENGTHS_M["km"], time_s=time_data, n_splits=len(splits))
+    split_max_hrs: dict[int, int | str] = {i: safe_int(v) for i, v in enumerate(split_hr.max, 1)}
+    split_avg_hrs: dict[int, int | str] = {i: safe_int(v) for i, v in enumerate(split_hr.time_weighted, 1)}
 
     # 5) Format splits
     split_text = ""
@@ -355,7 +381,7 @@ async def activity_feedback(request: Request, activity_id: str | None = None):
         # labels (safe_* for display)
         dist_km_s = safe_round(split.get("distance"), divisor=1000, decimals=2)
         move_str  = format_duration(move_sec, style="compact")
-        hr        = safe_int(split.get("average_heartrate"))
+        hr        = safe_int(split.get("average_heartrate"), split_avg_hrs.get(i, "N/A"))
         max_hr_s  = split_max_hrs.get(i, "N/A")
         elev_s    = f"{safe_round(split.get('elevation_difference', 0), decimals=1):+}m"
 
@@ -366,10 +392,7 @@ async def activity_feedback(request: Request, activity_id: str | None = None):
 
     # 6) Custom laps
     lap_text = "Custom Laps:\n"
-    laps = await get_json(f"https://www.strava.com/api/v3/activities/{activity_id}/laps")
-    if isinstance(laps, RedirectResponse):
-        return laps
-    for i, lap in enumerate(laps or [], 1):
+    for i, lap in enumerate(laps, 1):
         move_sec = to_int(lap.get("moving_time"))
         dist_km  = to_float(lap.get("distance")) / 1000.0
         pace     = format_pace(move_sec, dist_km) if dist_km else "N/A"
@@ -389,14 +412,14 @@ async def activity_feedback(request: Request, activity_id: str | None = None):
 
     # 7) Privacy warnings
     privacy_warning = ""
-    if dist_data and dist_data[0] > 30:
+    if len(dist_data) and dist_data[0] > 30:
         privacy_warning += "\n⚠️ Missing early HR data — likely due to start location privacy settings.\n"
-    if dist_data and distance_km - dist_data[-1] / 1000 > 0.1:
+    if len(dist_data) and distance_km - dist_data[-1] / 1000 > 0.1:
         privacy_warning += "\n⚠️ Missing end HR data — likely due to end location privacy settings.\n"
     if privacy_warning:
         split_text += privacy_warning
 
-    # 8) Compose summary + call coach
+    # 8) Compose summary
     summary = (
         f"🏃‍♂️ Workout: {name}\n📍 Start: {start_time}\n📏 Distance: {distance_km} km\n"
         f"⏱️ Moving Time: {moving} | Elapsed: {elapsed}\n"
@@ -404,47 +427,260 @@ async def activity_feedback(request: Request, activity_id: str | None = None):
         f"🌡️ Temp: {temp}°C | Cadence: {cadence} spm\n⛰️ Elev Gain: {elev} m\n\n"
         f"{'='*40}\n📊 Splits:\n{split_text}\n{'='*40}\n🟧 {lap_text}"
     )
+    return {
+        "summary": summary,
+        "dist_data": dist_data,
+        "hr_data": hr_data,
+        "distance_km": distance_km,
+    }
+
+# HR chart renderers: "plotly" = interactive plot file in an iframe, "svg" = static inline SVG
+HrChart = Literal["plotly", "svg"]
 
-    # Make sure this call can't kill the page
+def _chart_kind(chart: str | None) -> str:
+    return chart or ("svg" if config.HR_CHART == "svg" else "plotly")
+
+def _render_hr_plot(dist_data, hr_data, distance_km, activity_id=None, chart: str = "plotly") -> str:
+    """HTML snippet embedding the HR plot ("" if there is nothing to show)."""
+    hr_plot_html = ""
+    if len(hr_data) and len(dist_data) and chart == "svg":
+        try:
+            return render_hr_svg(dist_data, hr_data, distance_km)
+        except Exception as e:
+            logger.warning("HR SVG render failed: %s", e)
+            return ""
+    if len(hr_data) and len(dist_data):
+        try:
+            plot_result = save_hr_plot_plotly(dist_data, hr_data, distance_km, activity_id=activity_id)
+            # Support common return styles from your helper:
+            if isinstance(plot_result, str):
+                pr = plot_result.strip()
+                if pr.startswith("<"):  # helper returned inline HTML
+                    hr_plot_html = pr
+                elif pr.lower().endswith((".html", ".htm")):  # path to an HTML file
+                    hr_plot_html = f"<iframe src='{pr}' style='width:100%;height:380px;border:0'></iframe>"
+                elif pr.lower().endswith((".png", ".jpg", ".jpeg", ".webp", ".svg")):  # image path
+                    hr_plot_html = f"<img src='{pr}' alt='Heart rate plot' style='max-width:100%;height:auto'/>"
+            # If helper returns None, nothing to embed (keeps page clean)
+        except Exception as e:
+            logger.warning("HR plot render failed: %s", e)
+    return hr_plot_html
+
+async def _coach_deltas(summary: str, regenerate: bool = False, user_id: int | None = None) -> AsyncIterator[str]:
+    """
+    Coach notes as they are generated; errors become a note instead of killing the page.
+    With `user_id`, an error also bumps the user's feedback version so the page carrying
+    the note isn't revalidated as current.
+    """
+    messages = [
+        {"role": "system", "content": COACH_SYSTEM_PROMPT},
+        {"role": "user", "content": summary},
+    ]
     try:
-        chat_response = call_chat_completion(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content":
-                    "You are an expert marathon coach. Analyze the workout below, "
-                    "comment on pacing strategy, heart rate drift, aerobic vs threshold distribution, "
-                    "and give feedback on execution and improvement tips. Be clear and detailed."
-                },
-                {"role": "user", "content": summary},
-            ],
-        )
+        async for delta in astream_chat_completion(
+            model=COACH_MODEL, messages=messages, regenerate=regenerate
+        ):
+            yield delta
     except Exception as e:
-        chat_response = f"(Coach analysis temporarily unavailable: {e})"
+        if user_id is not None:
+            await data_versions.abump_now(user_id, data_versions.FEEDBACK)
+        yield f"(Coach analysis temporarily unavailable: {e})"
 
-    # 9) RETURN actual HTML so the page renders
-    html = f"""
-    <!doctype html>
-    <meta charset="utf-8">
-    <title>Activity Feedback</title>
-    <style>
-    body {{ font-family: ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Arial; padding: 16px; }}
-    pre {{ white-space: pre-wrap; background:#f7f7f7; padding:12px; border-radius:8px; }}
-    .grid {{ display:grid; gap:16px; grid-template-columns: 1fr; max-width: 1000px; }}
-    h1, h2 {{ margin: 0 0 8px; }}
-    </style>
-    <div class="grid">
+async def _feedback_etag(user_id: int, activity_id: int | None, regenerate: bool, chart: str) -> str:
+    """
+    ETag of the feedback page: the user's activity + feedback versions and everything
+    else the page depends on. Read before the page is built (see data_versions).
+    """
+    if regenerate:
+        # The coach answer is about to be replaced: copies held by browsers are stale
+        await data_versions.abump_now(user_id, data_versions.FEEDBACK)
+    versions = await data_versions.aversions(user_id, data_versions.ACTIVITIES, data_versions.FEEDBACK)
+    return make_etag(
+        "feedback", user_id, "latest" if activity_id is None else activity_id, *versions,
+        config.ENABLE_GPT, COACH_MODEL, FEEDBACK_PAGE_REVISION, PLOT_REVISION, chart,
+    )
+
+async def _feedback_not_modified(request: Request, etag: str, user_id: int, activity_id: int | None) -> bool:
+    """If-None-Match matches and the page would come out of the store unchanged."""
+    if not etag_matches(request.headers.get("if-none-match"), etag):
+        return False
+    return await activity_store.afeedback_is_cacheable(user_id, activity_id)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/activity_feedback", response_class=HTMLResponse)
+async def activity_feedback(
+    request: Request, activity_id: int | None = None, regenerate: bool = False, chart: HrChart | None = None,
+):
+    user_id = request.session.get("user_id")
+    if not user_id:
+        # preserve deep link back to this page
+        nxt = "/activity_feedback"
+        if activity_id is not None:
+            from urllib.parse import urlencode
+            nxt = f"/activity_feedback?{urlencode({'activity_id': str(activity_id)})}"
+        return RedirectResponse(f"/login?next={nxt}", status_code=303)
+
+    chart = _chart_kind(chart)
+    etag = await _feedback_etag(int(user_id), activity_id, regenerate, chart)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not regenerate and await _feedback_not_modified(request, etag, int(user_id), activity_id):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        feedback = await _load_feedback(str(user_id), activity_id)
+    except FeedbackUnavailable as e:
+        if e.reason == "reconnect":
+            return RedirectResponse("/connect_strava", status_code=e.status_code)
+        return HTMLResponse(e.message, status_code=e.status_code)
+
+    # 9) Stream the page: summary now, then the plot, then the coach notes token by token
+    async def page():
+        yield PAGE_HEAD + f"""
     <div>
         <h1>Activity Feedback</h1>
-        <pre>{escape(summary)}</pre>
+        <pre>{escape(feedback["summary"])}</pre>
     </div>
+"""
+        hr_plot_html = await run_in_threadpool(
+            _render_hr_plot, feedback["dist_data"], feedback["hr_data"], feedback["distance_km"],
+            feedback["activity_id"], chart,
+        )
+        yield f"""
         <div>
         <h2>Heart Rate Plot</h2>
         {hr_plot_html or "<p>No HR data available.</p>"}
     </div>
     <div>
         <h2>Coach Notes</h2>
-        <pre>{escape(str(chat_response))}</pre>
+        <pre>"""
+        async for delta in _coach_deltas(feedback["summary"], regenerate, int(user_id)):
+            yield escape(delta)
+        yield """</pre>
     </div>
     </div>
+"""
+
+    return StreamingResponse(page(), media_type="text/html; charset=utf-8", headers=headers)
+
+@router.get("/activity_feedback/events")
+async def activity_feedback_events(
+    request: Request, activity_id: int | None = None, regenerate: bool = False, chart: HrChart | None = None,
+):
     """
-    return HTMLResponse(html)
\ No newline at end of file
+    Server-Sent Events version of /activity_feedback for the SPA:
+    `summary` -> `plot` -> `coach` (one event per text delta) -> `done`.
+    `?regenerate=1` bypasses the cached coach answer and replaces it.
+    `?chart=svg|plotly` picks the HR chart renderer (default: HR_CHART).
+    """
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    chart = _chart_kind(chart)
+
+    try:
+        feedback = await _load_feedback(str(user_id), activity_id)
+    except FeedbackUnavailable as e:
+        if e.reason == "reconnect":
+            raise HTTPException(status_code=409, detail="Strava not connected")
+        if e.reason == "no_activities":
+            raise HTTPException(status_code=404, detail=e.message)
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+    async def events():
+        yield _sse("summary", {"activity_id": feedback["activity_id"], "summary": feedback["summary"]})
+        hr_plot_html = await run_in_threadpool(
+            _render_hr_plot, feedback["dist_data"], feedback["hr_data"], feedback["distance_km"],
+            feedback["activity_id"], chart,
+        )
+        yield _sse("plot", {"html": hr_plot_html})
+        async for delta in _coach_deltas(feedback["summary"], regenerate, int(user_id)):
+            yield _sse("coach", {"delta": delta})
+        yield _sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# GET /activities/{id}/streams: upper bound on points per response
+MAX_STREAM_POINTS = 20000
+
+@router.get("/activities/{activity_id}/streams")
+async def activity_streams(
+    request: Request,
+    activity_id: int,
+    types: str = Query("heartrate", description="Comma-separated stream types (heartrate, altitude, cadence...)"),
+    x: Literal["distance", "time"] = Query("distance", description="Stream the range applies to"),
+    x_from: float | None = Query(None, alias="from", description="Range start, in x units (m or s)"),
+    x_to: float | None = Query(None, alias="to", description="Range end, in x units (m or s)"),
+    max_points: int = Query(1000, ge=4, le=MAX_STREAM_POINTS),
+    format: Literal["json", "binary"] = "json",
+):
+    """
+    Streams of one activity over an x range at a resolution that fits `max_points`, for
+    zoomable charts. Served from the per-stream min/max pyramids (utils/stream_pyramid.py):
+    resolution 1 means raw samples ({type: values}); otherwise every point is a bucket
+    of `resolution` samples ({"type.min": ..., "type.max": ...}, the x columns being each
+    bucket's first and last x). `format=binary` returns the same columns as little-endian
+    float32 arrays back to back, named in X-Stream-Columns.
+    """
+    user_id = request.session.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id = int(user_id)
+    stream_types = list(dict.fromkeys([x, *(t.strip() for t in types.split(",") if t.strip())]))
+
+    (version,) = await data_versions.aversions(user_id, data_versions.ACTIVITIES)
+    etag = make_etag("streams", user_id, activity_id, version, x, ",".join(stream_types), x_from, x_to, max_points, format)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    streams = await activity_store.aload_streams(user_id, activity_id, stream_types)
+    if streams is None:
+        # Not stored yet: read through Strava (which stores the bundle), then use the store
+        access_token = await aget_access_token(str(user_id))
+        if not access_token:
+            raise HTTPException(status_code=409, detail="Strava not connected")
+        try:
+            await get_activity_bundle(user_id, access_token, activity_id)
+        except StravaAuthError:
+            raise HTTPException(status_code=409, detail="Strava not connected")
+        except StravaUnavailable as e:
+            logger.warning("Strava unavailable for activity %s streams: %s", activity_id, e)
+            raise HTTPException(status_code=503, detail="Strava is busy right now, please try again in a few minutes.")
+        except httpx.HTTPStatusError as e:
+            logger.warning("Strava activity %s fetch failed: %s", activity_id, e)
+            status = 404 if e.response.status_code == 404 else 502
+            raise HTTPException(status_code=status, detail="Could not load this activity from Strava.")
+        except httpx.HTTPError as e:
+            logger.warning("Strava activity %s fetch failed: %s", activity_id, e)
+            raise HTTPException(status_code=502, detail="Could not reach Strava, please try again.")
+        streams = await activity_store.aload_streams(user_id, activity_id, stream_types)
+    missing = [t for t in stream_types if t not in (streams or {})]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Streams not available: {', '.join(missing)}")
+
+    resolution, columns = stream_pyramid.window(streams, x, x_from, x_to, max_points)
+    count = len(next(iter(columns.values())))
+    if format == "binary":
+        headers.update({
+            "X-Stream-Columns": ",".join(columns),
+            "X-Stream-Resolution": str(resolution),
+            "X-Stream-Count": str(count),
+        })
+        body = b"".join(np.asarray(c, dtype="<f4").tobytes() for c in columns.values())
+        return Response(body, media_type="application/octet-stream", headers=headers)
+    return JSONResponse(
+        {
+            "activity_id": activity_id,
+            "x": x,
+            "resolution": resolution,
+            "count": count,
+            "columns": {name: np.round(np.asarray(c, dtype=np.float64), 2).tolist() for name, c in columns.items()},
+        },
+        headers=headers,
+    )
@@ -1,8 +1,9 @@
 # backend/routes/auth_routes.py
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
-from backend.db.session import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.services.passwords import hash_password, verify_password
 import secrets
 from backend.deps.auth import get_db, get_current_user
@@ -42,47 +43,52 @@ def require_csrf(request: Request):
         raise HTTPException(status_code=403, detail="CSRF check failed")
 
 @router.get("/csrf")
-def get_csrf(request: Request):
+async def get_csrf(request: Request):
     token = secrets.token_urlsafe(32)
     request.session["csrf"] = token
     return {"csrf": token}
 
+async def _user_by_email(db: AsyncSession, email: str) -> User | None:
+    return (await db.execute(select(User).where(User.email == email))).scalars().first()
+
+# bcrypt is deliberately slow (CPU-bound), so it runs in the threadpool, off the event loop
 @router.post("/register", response_model=UserOut)
-def register(payload: RegisterIn, request: Request, db: Session = Depends(get_db)):
+async def register(payload: RegisterIn, request: Request, db: AsyncSession = Depends(get_db)):
     require_csrf(request)
-    if db.query(User).filter(User.email == payload.email).first():
+    if await _user_by_email(db, payload.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = User(email=payload.email, password_hash=hash_password(payload.password), name=payload.name)
-    db.add(user); db.commit(); db.refresh(user)
+    password_hash = await run_in_threadpool(hash_password, payload.password)
+    user = User(email=payload.email, password_hash=password_hash, name=payload.name)
+    db.add(user); await db.commit(); await db.refresh(user)
     request.session["user_id"] = user.id
     return user
 
 @router.post("/login", response_model=UserOut)
-def login(payload: LoginIn, request: Request, db: Session = Depends(get_db)):
+async def login(payload: LoginIn, request: Request, db: AsyncSession = Depends(get_db)):
     require_csrf(request)
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+    user = await _user_by_email(db, payload.email)
+    if not user or not await run_in_threadpool(verify_password, payload.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     request.session["user_id"] = user.id
     return user
 
 @router.post("/logout")
-def logout(request: Request):
+async def logout(request: Request):
     require_csrf(request)
     request.session.clear()
     return {"message": "ok"}
 
 @router.get("/me", response_model=UserOut | None)
-def me(request: Request, db: Session = Depends(get_db)):
+async def me(request: Request, db: AsyncSession = Depends(get_db)):
     uid = request.session.get("user_id")
     if not uid: return None
-    return db.get(User, uid)
+    return await db.get(User, uid)
 
 @router.put("/me")
-def update_me(
+async def update_me(
     payload: UpdateMe,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     me: User = Depends(get_current_user),
 ):
     # CSRF
@@ -92,17 +98,17 @@ def update_me(
         raise HTTPException(status_code=403, detail="CSRF check failed")
 
     # Reload user in this session
-    db_user = db.get(User, me.id)
+    db_user = await db.get(User, me.id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Email uniqueness (exclude me)
     if payload.email and payload.email != db_user.email:
         exists = (
-            db.query(User)
-              .filter(User.email == payload.email, User.id != db_user.id)
-              .first()
-        )
+            await db.execute(
+                select(User.id).where(User.email == payload.email, User.id != db_user.id)
+            )
+        ).first()
         if exists:
             raise HTTPException(status_code=400, detail="Email already in use")
         db_user.email = payload.email
@@ -110,6 +116,6 @@ def update_me(
     if payload.name is not None:
         db_user.name = payload.name.strip()
 
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return {"id": db_user.id, "email": db_user.email, "name": db_user.name}
@@ -1,128 +1,350 @@
 # backend/routes/training_plan_routes.py
+import base64
+import codecs
+from datetime import date
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from backend.db.session import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy import bindparam, delete, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from backend.db.models import TrainingPlan as ORMTrainingPlan
-from backend.schemas import TrainingPlan
-from backend.deps.auth import get_current_user
+from backend.schemas import TrainingPlan, PlanBatch, PLAN_READONLY_FIELDS
+from backend.deps.auth import get_db, get_current_user
+from backend.services import data_versions
+from backend.utils.etag import etag_matches, make_etag
+from backend.utils.plan_import import ImportFormatError, parser_for, sniff_format
 
 router = APIRouter(tags=["Training Plans"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def require_csrf(request: Request):
     sess = request.session.get("csrf")
     hdr = request.headers.get("X-CSRF-Token")
     if not sess or not hdr or hdr != sess:
         raise HTTPException(status_code=403, detail="CSRF check failed")
 
+MAX_PAGE_SIZE = 500
+
+# Plain columns for GET /plans: rows go straight to the response model, no ORM objects
+_PLAN_COLUMNS = [ORMTrainingPlan.__table__.c[name] for name in TrainingPlan.model_fields]
+
+def _encode_cursor(d: date, plan_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{d.isoformat()},{plan_id}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        d, plan_id = raw.split(",")
+        return date.fromisoformat(d), int(plan_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/plans", response_model=List[TrainingPlan])
-def get_all_plans(
-    db: Session = Depends(get_db),
+async def get_all_plans(
+    request: Request,
+    response: Response,
+    from_date: date | None = Query(None, alias="from", description="First date (inclusive)"),
+    to_date: date | None = Query(None, alias="to", description="Last date (inclusive)"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (default: no paging)"),
+    cursor: str | None = Query(None, description="X-Next-Cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
-    return (
-        db.query(ORMTrainingPlan)
-        .filter(ORMTrainingPlan.user_id == current_user.id)
-        .order_by(ORMTrainingPlan.date.asc(), ORMTrainingPlan.id.asc())
-        .all()
-    )
+    """
+    The user's plans in (date, id) order, optionally within [from, to].
+    With `limit`, returns one page and sets X-Next-Cursor when there are more; pass it
+    back as `cursor`. Pages are keyset-based, so each one is an index range scan on
+    (user_id, date, id) no matter how much history precedes it.
+
+    Responses carry a strong ETag (the user's plans version + the query); a matching
+    If-None-Match is answered 304 after one primary-key lookup.
+    """
+    (version,) = await data_versions.aversions(current_user.id, data_versions.PLANS, db=db)
+    etag = make_etag("plans", current_user.id, version, from_date, to_date, limit, cursor)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    stmt = select(*_PLAN_COLUMNS).where(ORMTrainingPlan.user_id == current_user.id)
+    if from_date is not None:
+        stmt = stmt.where(ORMTrainingPlan.date >= from_date)
+    if to_date is not None:
+        stmt = stmt.where(ORMTrainingPlan.date <= to_date)
+    if cursor:
+        stmt = stmt.where(tuple_(ORMTrainingPlan.date, ORMTrainingPlan.id) > tuple_(*_decode_cursor(cursor)))
+    stmt = stmt.order_by(ORMTrainingPlan.date.asc(), ORMTrainingPlan.id.asc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)   # one extra row tells us whether there is a next page
+
+    rows = (await db.execute(stmt)).mappings().all()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["date"], rows[-1]["id"])
+    return rows
 
 @router.post("/plans", status_code=201)
-def add_plan(
+async def add_plan(
     plan: TrainingPlan,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     require_csrf(request)
-    data = plan.model_dump(exclude={"id"})
+    data = plan.model_dump(exclude=PLAN_READONLY_FIELDS)
     data["type"] = "planned"
     orm_plan = ORMTrainingPlan(
         **data,
         user_id=current_user.id,   # 👈 set owner
     )
     db.add(orm_plan)
+    await data_versions.abump(db, current_user.id, data_versions.PLANS)
     try:
-        db.commit()
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise
-    db.refresh(orm_plan)
+    await db.refresh(orm_plan)
     return {"message": "Plan added", "id": orm_plan.id}
 
-def _get_owned_plan(db: Session, plan_id: int, user_id: int) -> ORMTrainingPlan | None:
-    return (
-        db.query(ORMTrainingPlan)
-        .filter(ORMTrainingPlan.id == plan_id, ORMTrainingPlan.user_id == user_id)
-        .order_by(ORMTrainingPlan.date.asc(), ORMTrainingPlan.id.asc())
-        .first()
+MAX_IMPORT_ROWS = 5000
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
     )
 
+@router.post("/plans/import")
+async def import_plans(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ics)$", description="Default: from Content-Type / content"),
+    strict: bool = Query(False, description="Import nothing if any row is invalid"),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Bulk-create plans from a CSV or iCalendar upload sent as the raw request body
+    (e.g. `curl --data-binary @block.csv -H 'Content-Type: text/csv'`).
+
+    The body is decoded and parsed as it streams in; each record is validated
+    against TrainingPlan, and the valid ones are inserted with one executemany in a
+    single transaction once the upload is complete (so a slow upload never holds the
+    database's write lock). Invalid rows are reported as {"line", "error"} and
+    skipped, or abort the whole import with `strict=true` (422).
+    """
+    require_csrf(request)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    parser, head = None, ""
+    rows: list[dict] = []
+    errors: list[dict] = []
+
+    def take(records):
+        for line, fields in records:
+            try:
+                plan = TrainingPlan.model_validate(fields)
+            except ValidationError as e:
+                errors.append({"line": line, "error": _validation_message(e)})
+                continue
+            if len(rows) >= MAX_IMPORT_ROWS:
+                raise HTTPException(status_code=413, detail=f"At most {MAX_IMPORT_ROWS} plans per import")
+            data = plan.model_dump(exclude=PLAN_READONLY_FIELDS)
+            data["type"] = "planned"
+            data["user_id"] = current_user.id
+            rows.append(data)
+
+    try:
+        async for chunk in request.stream():
+            text = decoder.decode(chunk)
+            if parser is None:
+                head += text
+                if not head.strip():
+                    continue
+                fmt = format or sniff_format(request.headers.get("content-type"), head)
+                parser, text = parser_for(fmt), head
+            take(parser.feed(text))
+        tail = decoder.decode(b"", final=True)
+        if parser is None:
+            if not (head + tail).strip():
+                raise HTTPException(status_code=400, detail="Empty upload")
+            fmt = format or sniff_format(request.headers.get("content-type"), head + tail)
+            parser, tail = parser_for(fmt), head + tail
+        take(parser.feed(tail))
+        take(parser.close())
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if strict and errors:
+        return JSONResponse({"imported": 0, "errors": errors}, status_code=422)
+    if rows:
+        try:
+            await db.execute(insert(ORMTrainingPlan.__table__), rows)   # executemany
+            await data_versions.abump(db, current_user.id, data_versions.PLANS)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    return {"imported": len(rows), "errors": errors}
+
+async def _get_owned_plan(db: AsyncSession, plan_id: int, user_id: int) -> ORMTrainingPlan | None:
+    result = await db.execute(
+        select(ORMTrainingPlan)
+        .where(ORMTrainingPlan.id == plan_id, ORMTrainingPlan.user_id == user_id)
+    )
+    return result.scalars().first()
+
+def _conflict(plan_id: int, expected: int | None, current: int | None) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={"message": "Plan was changed by another request", "id": plan_id,
+                "expected_version": expected, "current_version": current},
+    )
+
+def _check_version(orm_plan: ORMTrainingPlan, expected: int | None) -> None:
+    if expected is not None and expected != orm_plan.version:
+        raise _conflict(orm_plan.id, expected, orm_plan.version)
+
+async def _commit(db: AsyncSession, user_id: int, plan_id: int, expected: int | None) -> None:
+    """Commit (with a plans version bump); a concurrent change between our read and write (StaleDataError) is a 409."""
+    try:
+        await data_versions.abump(db, user_id, data_versions.PLANS)
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise _conflict(plan_id, expected, None)
+    except Exception:
+        await db.rollback()
+        raise
+
 @router.put("/plans/{plan_id}")
-def update_plan(
+async def update_plan(
     plan_id: int,
     plan: TrainingPlan,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     require_csrf(request)
-    orm_plan = _get_owned_plan(db, plan_id, current_user.id)
+    orm_plan = await _get_owned_plan(db, plan_id, current_user.id)
     if not orm_plan:
         raise HTTPException(status_code=404, detail="Plan not found")
-    for field, value in plan.model_dump(exclude={"id"}).items():
+    _check_version(orm_plan, plan.version)
+    for field, value in plan.model_dump(exclude=PLAN_READONLY_FIELDS).items():
         if field == "type":
             value = "planned"
         setattr(orm_plan, field, value)
-    try:
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
-    return {"message": "Plan updated"}
+    await _commit(db, current_user.id, plan_id, plan.version)
+    return {"message": "Plan updated", "version": orm_plan.version}
 
 @router.patch("/plans/{plan_id}")
-def patch_plan(
+async def patch_plan(
     plan_id: int,
     plan: TrainingPlan,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     require_csrf(request)
-    orm_plan = _get_owned_plan(db, plan_id, current_user.id)
+    orm_plan = await _get_owned_plan(db, plan_id, current_user.id)
     if not orm_plan:
         raise HTTPException(status_code=404, detail="Plan not found")
+    _check_version(orm_plan, plan.version)
     orm_plan.date = plan.date
-    try:
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
-    return {"message": "Plan date updated"}
+    await _commit(db, current_user.id, plan_id, plan.version)
+    return {"message": "Plan date updated", "version": orm_plan.version}
 
 @router.delete("/plans/{plan_id}")
-def delete_plan(
+async def delete_plan(
     plan_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    version: int | None = Query(None, description="Expected current version"),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     require_csrf(request)
-    orm_plan = _get_owned_plan(db, plan_id, current_user.id)
+    orm_plan = await _get_owned_plan(db, plan_id, current_user.id)
     if not orm_plan:
         raise HTTPException(status_code=404, detail="Plan not found")
-    db.delete(orm_plan)
+    _check_version(orm_plan, version)
+    await db.delete(orm_plan)
+    await _commit(db, current_user.id, plan_id, version)
+    return {"message": "Plan deleted"}
+
+_PLANS = ORMTrainingPlan.__table__
+
+# executemany statements for POST /plans/batch; each row also matches the version read
+# in the same transaction, so a concurrent write in between shows up as a short rowcount
+_MOVE = (
+    update(_PLANS)
+    .where(_PLANS.c.id == bindparam("b_id"), _PLANS.c.version == bindparam("b_version"))
+    .values(date=bindparam("b_date"), version=_PLANS.c.version + 1)
+)
+_UPDATE_FIELDS = sorted(set(TrainingPlan.model_fields) - PLAN_READONLY_FIELDS)
+_UPDATE = (
+    update(_PLANS)
+    .where(_PLANS.c.id == bindparam("b_id"), _PLANS.c.version == bindparam("b_version"))
+    .values(version=_PLANS.c.version + 1, **{f: bindparam(f"b_{f}") for f in _UPDATE_FIELDS})
+)
+_DELETE = delete(_PLANS).where(_PLANS.c.id == bindparam("b_id"), _PLANS.c.version == bindparam("b_version"))
+
+@router.post("/plans/batch")
+async def batch_plans(
+    batch: PlanBatch,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Apply a list of move / update / delete operations atomically (e.g. dragging a
+    whole week in the calendar). Ownership and versions of every plan are checked
+    with one IN query; any unknown id is a 404 and any version mismatch a 409, and
+    then nothing is changed. Returns the new version of each surviving plan.
+    """
+    require_csrf(request)
+    ids = [op.id for op in batch.ops]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Each plan may appear only once per batch")
+
+    current = dict((await db.execute(
+        select(_PLANS.c.id, _PLANS.c.version)
+        .where(_PLANS.c.user_id == current_user.id, _PLANS.c.id.in_(ids))
+    )).all())
+    missing = [i for i in ids if i not in current]
+    if missing:
+        raise HTTPException(status_code=404, detail={"message": "Plan not found", "ids": missing})
+    for op in batch.ops:
+        if op.version is not None and op.version != current[op.id]:
+            raise _conflict(op.id, op.version, current[op.id])
+
+    moves, updates, deletes = [], [], []
+    for op in batch.ops:
+        params = {"b_id": op.id, "b_version": current[op.id]}
+        if op.op == "move":
+            moves.append({**params, "b_date": op.date})
+        elif op.op == "update":
+            data = op.plan.model_dump(exclude=PLAN_READONLY_FIELDS)
+            data["type"] = "planned"
+            updates.append({**params, **{f"b_{f}": data[f] for f in _UPDATE_FIELDS}})
+        else:
+            deletes.append(params)
+
     try:
-        db.commit()
+        for stmt, rows in ((_MOVE, moves), (_UPDATE, updates), (_DELETE, deletes)):
+            if not rows:
+                continue
+            result = await db.execute(stmt, rows)
+            if result.rowcount not in (-1, len(rows)):   # -1: driver can't tell for executemany
+                raise StaleDataError("plan changed during batch")
+        await data_versions.abump(db, current_user.id, data_versions.PLANS)
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail={"message": "Plans were changed by another request"})
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise
-    return {"message": "Plan deleted"}
+
+    return {"results": [
+        {"id": op.id, "deleted": True} if op.op == "delete" else {"id": op.id, "version": current[op.id] + 1}
+        for op in batch.ops
+    ]}
@@ -0,0 +1,59 @@
+# backend/routes/webhook_routes.py
+"""
+Strava push subscription callback.
+
+Subscribe once (callback_url must be publicly reachable):
+    curl -X POST https://www.strava.com/api/v3/push_subscriptions \
+      -F client_id=... -F client_secret=... \
+      -F callback_url=https://<host>/strava/webhook -F verify_token=$STRAVA_WEBHOOK_VERIFY_TOKEN
+Strava then validates the callback with the GET handshake below and POSTs one JSON
+event per change. Events are queued for services/strava_webhook.py; locally they
+can be replayed with scripts/replay_strava_events.py.
+
+The POST endpoint has no other authentication, so it only accepts events carrying
+the subscription id returned by the call above (STRAVA_WEBHOOK_SUBSCRIPTION_ID), and
+answers 403 to everything while that isn't configured. Events the worker queue can't
+take are answered 503, which Strava treats as a failed delivery and retries.
+"""
+import hmac
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request
+import backend.config as config
+from backend.services import strava_webhook
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Strava Webhook"])
+
+@router.get("/strava/webhook")
+def verify_subscription(
+    mode: str = Query(..., alias="hub.mode"),
+    verify_token: str = Query(..., alias="hub.verify_token"),
+    challenge: str = Query(..., alias="hub.challenge"),
+):
+    expected = config.STRAVA_WEBHOOK_VERIFY_TOKEN
+    if mode != "subscribe" or not expected or not hmac.compare_digest(verify_token, expected):
+        raise HTTPException(status_code=403, detail="Verification failed")
+    return {"hub.challenge": challenge}
+
+@router.post("/strava/webhook")
+async def receive_event(request: Request):
+    expected_sub = config.STRAVA_WEBHOOK_SUBSCRIPTION_ID
+    if not expected_sub:
+        raise HTTPException(status_code=403, detail="Webhook not configured")
+    try:
+        event = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(event, dict) or "object_type" not in event or "owner_id" not in event:
+        raise HTTPException(status_code=400, detail="Not a Strava event")
+
+    if not hmac.compare_digest(str(event.get("subscription_id")), str(expected_sub)):
+        logger.warning("Rejecting webhook event for subscription %s", event.get("subscription_id"))
+        raise HTTPException(status_code=403, detail="Unknown subscription")
+
+    # Answer right away (Strava retries after 2s); the worker does the actual sync.
+    # If the event can't be queued, fail the delivery so Strava sends it again.
+    if not strava_webhook.enqueue(event):
+        raise HTTPException(status_code=503, detail="Webhook queue full", headers={"Retry-After": "2"})
+    return {"ok": True}
@@ -1,7 +1,7 @@
 # backend/schemas.py
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Union
 from datetime import date
 
 class TrainingPlan(BaseModel):
@@ -14,6 +14,8 @@ class TrainingPlan(BaseModel):
     cooldown_target: Optional[str] = None
     terrain: Optional[str] = None
     notes: Optional[str] = None
+    # Set by the server, bumped on every change; send it back to detect concurrent edits
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True      # replaces orm_mode in Pydantic v2
@@ -30,3 +32,28 @@ class TrainingPlan(BaseModel):
                 "notes": "Keep HR in Z2"
             }
         }
+
+# Fields a client may write (id and version belong to the server)
+PLAN_READONLY_FIELDS = {"id", "version"}
+
+class PlanMove(BaseModel):
+    op: Literal["move"]
+    id: int
+    version: Optional[int] = None   # expected current version; omit to skip the check
+    date: date
+
+class PlanUpdate(BaseModel):
+    op: Literal["update"]
+    id: int
+    version: Optional[int] = None
+    plan: TrainingPlan              # full replacement, like PUT /plans/{id}
+
+class PlanDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+    version: Optional[int] = None
+
+PlanOperation = Annotated[Union[PlanMove, PlanUpdate, PlanDelete], Field(discriminator="op")]
+
+class PlanBatch(BaseModel):
+    ops: List[PlanOperation] = Field(min_length=1, max_length=500)
@@ -0,0 +1,445 @@
+# backend/services/activity_store.py
+"""
+Local, read-through copy of Strava activities.
+
+Summaries (from /athlete/activities), details, laps, splits and streams are kept
+in SQLite, keyed by (owner, Strava activity id). A stored detail is served as long
+as it is fresh:
+  - nothing changed on Strava's side since we fetched it (updated_at), and
+  - either it was fetched recently, or the activity is old enough that it is
+    no longer being edited (ACTIVITY_SETTLE_SECONDS).
+Every write that changes what a user sees bumps their "activities" data version
+(services/data_versions.py) in the same transaction.
+
+Async code (request handlers, background jobs) uses the a* counterparts at the end
+of this module: they run the same transaction in a worker thread, so neither SQLite
+waits nor stream encoding (codec, pyramids) stall the event loop.
+"""
+import json
+import asyncio
+import time
+import hashlib
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+import backend.config as config
+from backend.db.session import SessionLocal
+from backend.services import data_versions
+from backend.db.models import (
+    Activity, ActivityLap, ActivitySplit, ActivityStream, ActivitySyncState,
+)
+from backend.utils import stream_codec, stream_pyramid
+from backend.utils.utils import iso_to_epoch
+
+# Summary columns shared by list items and the detailed activity
+_SUMMARY_FIELDS = (
+    "name", "sport_type", "start_date_local", "distance", "moving_time", "elapsed_time",
+    "average_heartrate", "max_heartrate", "total_elevation_gain",
+)
+# Normalised into their own tables (or too bulky to keep)
+_DETAIL_DROP = ("splits_metric", "laps", "segment_efforts")
+
+_LAP_FIELDS = (
+    "name", "distance", "moving_time", "elapsed_time", "average_heartrate", "max_heartrate",
+    "average_cadence", "total_elevation_gain", "average_speed",
+)
+_SPLIT_FIELDS = (
+    "distance", "moving_time", "elapsed_time", "average_heartrate", "elevation_difference",
+    "average_speed", "pace_zone",
+)
+
+def _summary_hash(act: dict) -> str:
+    fields = {k: act.get(k) for k in _SUMMARY_FIELDS}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+def _get_row(db: Session, user_id: int, strava_id: int) -> Activity | None:
+    return db.execute(
+        select(Activity).where(Activity.user_id == user_id, Activity.strava_id == strava_id)
+    ).scalar_one_or_none()
+
+def _upsert_summary(db: Session, user_id: int, act: dict, now: int) -> Activity:
+    """Insert/update the summary columns; bump updated_at if Strava's copy changed."""
+    strava_id = int(act["id"])
+    new_hash = _summary_hash(act)
+    row = _get_row(db, user_id, strava_id)
+    if row is None:
+        row = Activity(user_id=user_id, strava_id=strava_id, updated_at=now)
+        db.add(row)
+    elif row.summary_hash != new_hash:
+        row.updated_at = now
+    for k in _SUMMARY_FIELDS:
+        setattr(row, k, act.get(k))
+    row.summary_hash = new_hash
+    return row
+
+def _is_fresh(row: Activity, now: int) -> bool:
+    if row.detail_json is None or row.detail_fetched_at is None:
+        return False
+    if row.detail_fetched_at < row.updated_at:
+        return False
+    if now - row.detail_fetched_at < config.ACTIVITY_REFRESH_SECONDS:
+        return True
+    started = iso_to_epoch(row.start_date_local)
+    return started is not None and now - started > config.ACTIVITY_SETTLE_SECONDS
+
+# --- Activity list ----------------------------------------------------------
+
+def save_summaries(user_id: int, activities: list[dict]) -> None:
+    """Store a page of /athlete/activities results and mark the list as synced."""
+    now = int(time.time())
+    db: Session = SessionLocal()
+    try:
+        for act in activities:
+            _upsert_summary(db, user_id, act, now)
+        if db.new or any(db.is_modified(obj) for obj in db.dirty):
+            data_versions.bump(db, user_id, data_versions.ACTIVITIES)
+        state = db.get(ActivitySyncState, user_id) or ActivitySyncState(user_id=user_id)
+        state.list_synced_at = now
+        db.add(state)
+        db.commit()
+    finally:
+        db.close()
+
+def save_summary(user_id: int, activity: dict) -> None:
+    """Upsert a single activity's summary without touching the list's sync state."""
+    db: Session = SessionLocal()
+    try:
+        _upsert_summary(db, user_id, activity, int(time.time()))
+        data_versions.bump(db, user_id, data_versions.ACTIVITIES)
+        db.commit()
+    finally:
+        db.close()
+
+def save_athlete(user_id: int, athlete: dict) -> None:
+    db: Session = SessionLocal()
+    try:
+        state = db.get(ActivitySyncState, user_id) or ActivitySyncState(user_id=user_id)
+        state.athlete_json = json.dumps(athlete)
+        db.add(state)
+        db.commit()
+    finally:
+        db.close()
+
+def get_cached_list_state(user_id: int) -> tuple[bool, dict | None]:
+    """Return (list_is_fresh, cached_athlete)."""
+    db: Session = SessionLocal()
+    try:
+        state = db.get(ActivitySyncState, user_id)
+        if not state:
+            return False, None
+        fresh = bool(state.list_synced_at) and time.time() - state.list_synced_at < config.ACTIVITY_LIST_TTL_SECONDS
+        athlete = json.loads(state.athlete_json) if state.athlete_json else None
+        return fresh, athlete
+    finally:
+        db.close()
+
+def recent_summaries(user_id: int, limit: int = 20) -> list[dict]:
+    """Most recent stored activities, shaped like Strava's summary objects."""
+    db: Session = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Activity)
+            .where(Activity.user_id == user_id)
+            .order_by(Activity.start_date_local.desc(), Activity.strava_id.desc())
+            .limit(limit)
+        ).scalars().all()
+        return [{"id": r.strava_id, **{k: getattr(r, k) for k in _SUMMARY_FIELDS}} for r in rows]
+    finally:
+        db.close()
+
+def feedback_is_cacheable(user_id: int, strava_id: int | None) -> bool:
+    """
+    True if the feedback page for this activity (None = the latest) would be built from
+    the store without asking Strava, so it can't change without an "activities"
+    version bump and a conditional GET may answer 304.
+    """
+    now = int(time.time())
+    db: Session = SessionLocal()
+    try:
+        stmt = select(
+            Activity.detail_fetched_at, Activity.updated_at, Activity.start_date_local,
+            case((Activity.detail_json.is_not(None), 1)).label("detail_json"),   # skip the payload
+        ).where(Activity.user_id == user_id)
+        if strava_id is None:
+            state = db.get(ActivitySyncState, user_id)
+            if not state or not state.list_synced_at or now - state.list_synced_at >= config.ACTIVITY_LIST_TTL_SECONDS:
+                return False
+            stmt = stmt.order_by(Activity.start_date_local.desc(), Activity.strava_id.desc()).limit(1)
+        else:
+            stmt = stmt.where(Activity.strava_id == int(strava_id))
+        row = db.execute(stmt).first()
+        return row is not None and _is_fresh(row, now)
+    finally:
+        db.close()
+
+# --- Activity detail bundle -------------------------------------------------
+
+def load_bundle(user_id: int, strava_id: int) -> tuple[dict, dict, list] | None:
+    """
+    Return (activity, streams, laps) from the store if present and fresh, else None.
+    Stream "data" entries are NumPy arrays decoded straight from the stored BLOBs.
+    """
+    now = int(time.time())
+    db: Session = SessionLocal()
+    try:
+        row = _get_row(db, user_id, int(strava_id))
+        if row is None or not _is_fresh(row, now):
+            return None
+        activity = json.loads(row.detail_json)
+        activity["splits_metric"] = [
+            {"split": s.split_index, **{k: getattr(s, k) for k in _SPLIT_FIELDS}} for s in row.splits
+        ]
+        laps = [{"lap_index": l.lap_index, **{k: getattr(l, k) for k in _LAP_FIELDS}} for l in row.laps]
+        streams = {
+            s.stream_type: {
+                "data": stream_codec.decode(s.payload, s.encoding),
+                "series_type": s.series_type,
+                "original_size": s.original_size,
+                "resolution": s.resolution,
+            }
+            for s in row.streams
+        }
+        return activity, streams, laps
+    finally:
+        db.close()
+
+def save_bundle(user_id: int, activity: dict, streams: dict, laps: list) -> None:
+    """Replace the stored detail, splits, laps and streams of one activity."""
+    now = int(time.time())
+    db: Session = SessionLocal()
+    try:
+        _apply_bundle(db, user_id, activity, streams, laps, now)
+        data_versions.bump(db, user_id, data_versions.ACTIVITIES)
+        db.commit()
+    finally:
+        db.close()
+
+def _apply_bundle(db: Session, user_id: int, activity: dict, streams: dict, laps: list, now: int) -> Activity:
+    row = _upsert_summary(db, user_id, activity, now)
+    row.detail_json = json.dumps({k: v for k, v in activity.items() if k not in _DETAIL_DROP})
+    row.detail_fetched_at = now
+
+    row.splits = [
+        ActivitySplit(split_index=s.get("split") or i, **{k: s.get(k) for k in _SPLIT_FIELDS})
+        for i, s in enumerate(activity.get("splits_metric") or [], 1)
+    ]
+    row.laps = [
+        ActivityLap(lap_index=i, **{k: lap.get(k) for k in _LAP_FIELDS})
+        for i, lap in enumerate(laps or [], 1)
+    ]
+    row.streams = [_stream_row(stype, s) for stype, s in (streams or {}).items()]
+    return row
+
+def _stream_row(stream_type: str, stream: dict) -> ActivityStream:
+    data = stream.get("data")
+    payload, encoding = stream_codec.encode(stream_type, data)
+    return ActivityStream(
+        stream_type=stream_type,
+        series_type=stream.get("series_type"),
+        original_size=stream.get("original_size"),
+        resolution=stream.get("resolution"),
+        length=len(data) if data is not None else 0,
+        encoding=encoding,
+        payload=payload,
+        pyramid=stream_pyramid.dumps(_build_pyramid(payload, encoding)),
+    )
+
+def _build_pyramid(payload: bytes, encoding: str) -> stream_pyramid.Pyramid:
+    # Built from what decode() returns, so anchors line up with decode_range exactly
+    return stream_pyramid.build(stream_codec.decode(payload, encoding), anchors=encoding.endswith("+delta"))
+
+def load_streams(user_id: int, strava_id: int, stream_types: list[str]) -> dict[str, dict] | None:
+    """
+    Stored streams of one activity for the zoomable-chart API, as
+    {stream_type: {"payload", "encoding", "length", "pyramid"}} (pyramid parsed, see
+    utils/stream_pyramid.py). Only the requested types are read; None if the activity
+    has no streams stored yet.
+    """
+    db: Session = SessionLocal()
+    try:
+        activity_pk = (
+            select(Activity.id)
+            .where(Activity.user_id == user_id, Activity.strava_id == int(strava_id))
+            .scalar_subquery()
+        )
+        rows = db.execute(
+            select(
+                ActivityStream.stream_type, ActivityStream.encoding, ActivityStream.length,
+                ActivityStream.payload, ActivityStream.pyramid,
+            ).where(ActivityStream.activity_id == activity_pk, ActivityStream.stream_type.in_(stream_types))
+        ).all()
+        if not rows and db.execute(
+            select(ActivityStream.stream_type).where(ActivityStream.activity_id == activity_pk).limit(1)
+        ).first() is None:
+            return None
+    finally:
+        db.close()
+    out = {}
+    for row in rows:
+        pyramid = (
+            stream_pyramid.loads(row.pyramid) if row.pyramid is not None
+            else _build_pyramid(row.payload, row.encoding)   # stored before pyramids existed
+        )
+        out[row.stream_type] = {
+            "payload": row.payload, "encoding": row.encoding, "length": row.length, "pyramid": pyramid,
+        }
+    return out
+
+def mark_stale(user_id: int, strava_id: int, updated_at: int | None = None) -> None:
+    """Record that Strava's copy changed; the next read re-fetches the detail."""
+    db: Session = SessionLocal()
+    try:
+        row = _get_row(db, user_id, int(strava_id))
+        if row:
+            row.updated_at = updated_at or int(time.time())
+            data_versions.bump(db, user_id, data_versions.ACTIVITIES)
+            db.commit()
+    finally:
+        db.close()
+
+def delete_activity(user_id: int, strava_id: int) -> None:
+    db: Session = SessionLocal()
+    try:
+        row = _get_row(db, user_id, int(strava_id))
+        if row:
+            db.delete(row)
+            data_versions.bump(db, user_id, data_versions.ACTIVITIES)
+            db.commit()
+    finally:
+        db.close()
+
+# --- Full-history backfill (services/backfill.py) ---------------------------
+
+_BACKFILL_FIELDS = (
+    "backfill_status", "backfill_before", "backfill_imported", "backfill_failed",
+    "backfill_started_at", "backfill_updated_at", "backfill_error",
+)
+
+def without_detail(user_id: int, strava_ids: list[int]) -> set[int]:
+    """The subset of `strava_ids` that has no stored detail yet (new, or summary only)."""
+    if not strava_ids:
+        return set()
+    db: Session = SessionLocal()
+    try:
+        have = db.execute(
+            select(Activity.strava_id).where(
+                Activity.user_id == user_id,
+                Activity.strava_id.in_([int(i) for i in strava_ids]),
+                Activity.detail_fetched_at.is_not(None),
+            )
+        ).scalars().all()
+        return {int(i) for i in strava_ids} - set(have)
+    finally:
+        db.close()
+
+def get_backfill_state(user_id: int) -> dict:
+    db: Session = SessionLocal()
+    try:
+        state = db.get(ActivitySyncState, user_id)
+        return {k: getattr(state, k) if state else None for k in _BACKFILL_FIELDS}
+    finally:
+        db.close()
+
+def set_backfill_state(user_id: int, **fields) -> None:
+    db: Session = SessionLocal()
+    try:
+        state = db.get(ActivitySyncState, user_id) or ActivitySyncState(user_id=user_id)
+        for k, v in fields.items():
+            setattr(state, f"backfill_{k}", v)
+        state.backfill_updated_at = int(time.time())
+        db.add(state)
+        db.commit()
+    finally:
+        db.close()
+
+def save_backfill_page(
+    user_id: int,
+    summaries: list[dict],
+    bundles: list[tuple[dict, dict, list]],
+    *,
+    before: int | None,
+    imported: int,
+    failed: int,
+) -> None:
+    """
+    One transaction per page: summaries, fetched detail bundles and the advanced
+    checkpoint commit together, so a crash resumes exactly after the last full page.
+    """
+    now = int(time.time())
+    db: Session = SessionLocal()
+    try:
+        for act in summaries:
+            _upsert_summary(db, user_id, act, now)
+        db.flush()
+        for activity, streams, laps in bundles:
+            _apply_bundle(db, user_id, activity, streams, laps, now)
+        if summaries or bundles:
+            data_versions.bump(db, user_id, data_versions.ACTIVITIES)
+        state = db.get(ActivitySyncState, user_id) or ActivitySyncState(user_id=user_id)
+        state.backfill_before = before
+        state.backfill_imported = imported
+        state.backfill_failed = failed
+        state.backfill_updated_at = now
+        db.add(state)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+# --- Async callers ----------------------------------------------------------
+
+async def aload_bundle(user_id: int, strava_id: int) -> tuple[dict, dict, list] | None:
+    return await asyncio.to_thread(load_bundle, user_id, strava_id)
+
+async def asave_bundle(user_id: int, activity: dict, streams: dict, laps: list) -> None:
+    await asyncio.to_thread(save_bundle, user_id, activity, streams, laps)
+
+async def aload_streams(user_id: int, strava_id: int, stream_types: list[str]) -> dict[str, dict] | None:
+    return await asyncio.to_thread(load_streams, user_id, strava_id, stream_types)
+
+async def afeedback_is_cacheable(user_id: int, strava_id: int | None) -> bool:
+    return await asyncio.to_thread(feedback_is_cacheable, user_id, strava_id)
+
+async def aget_cached_list_state(user_id: int) -> tuple[bool, dict | None]:
+    return await asyncio.to_thread(get_cached_list_state, user_id)
+
+async def arecent_summaries(user_id: int, limit: int = 20) -> list[dict]:
+    return await asyncio.to_thread(recent_summaries, user_id, limit)
+
+async def asave_summaries(user_id: int, activities: list[dict]) -> None:
+    await asyncio.to_thread(save_summaries, user_id, activities)
+
+async def asave_athlete(user_id: int, athlete: dict) -> None:
+    await asyncio.to_thread(save_athlete, user_id, athlete)
+
+async def asave_summary(user_id: int, activity: dict) -> None:
+    await asyncio.to_thread(save_summary, user_id, activity)
+
+async def amark_stale(user_id: int, strava_id: int, updated_at: int | None = None) -> None:
+    await asyncio.to_thread(mark_stale, user_id, strava_id, updated_at)
+
+async def adelete_activity(user_id: int, strava_id: int) -> None:
+    await asyncio.to_thread(delete_activity, user_id, strava_id)
+
+async def awithout_detail(user_id: int, strava_ids: list[int]) -> set[int]:
+    return await asyncio.to_thread(without_detail, user_id, strava_ids)
+
+async def aget_backfill_state(user_id: int) -> dict:
+    return await asyncio.to_thread(get_backfill_state, user_id)
+
+async def aset_backfill_state(user_id: int, **fields) -> None:
+    await asyncio.to_thread(set_backfill_state, user_id, **fields)
+
+async def asave_backfill_page(
+    user_id: int,
+    summaries: list[dict],
+    bundles: list[tuple[dict, dict, list]],
+    *,
+    before: int | None,
+    imported: int,
+    failed: int,
+) -> None:
+    await asyncio.to_thread(
+        save_backfill_page, user_id, summaries, bundles, before=before, imported=imported, failed=failed,
+    )
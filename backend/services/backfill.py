@@ -0,0 +1,196 @@
+# backend/services/backfill.py
+"""
+Resumable import of a user's full Strava history into the local activity store.
+
+Pages through /athlete/activities from newest to oldest using Strava's `before`
+cursor (epoch seconds), fetches detail + streams + laps for every activity that
+isn't stored yet (at most BACKFILL_CONCURRENCY at a time), and writes each page
+together with the advanced cursor in one transaction. After a crash or restart the
+next run continues from the stored cursor; pages are idempotent, so at worst the
+last page is listed again.
+
+All Strava calls are made with BACKGROUND priority: they wait for budget instead of
+failing, and leave the reserved share of every rate-limit window to page views.
+Store reads and page writes (one transaction of up to BACKFILL_PAGE_SIZE bundles,
+streams encoded) run in a worker thread, so a running job doesn't stall requests.
+
+Run it from the CLI:
+    python -m backend.services.backfill --user 1 [--restart]
+or through POST /activities/backfill (progress: GET /activities/backfill).
+"""
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timezone
+import backend.config as config
+from backend.services import activity_store
+from backend.utils.utils import iso_to_epoch
+from backend.services.token_manager import aget_access_token
+from backend.services.strava_client import StravaUnavailable, BACKGROUND
+from backend.services.strava_api import StravaAuthError, get_json, fetch_activity_bundle
+
+logger = logging.getLogger(__name__)
+
+# Jobs running in this process, and their live throughput numbers
+_jobs: dict[int, asyncio.Task] = {}
+_progress: dict[int, dict] = {}
+
+async def _fetch_bundles(access_token: str, ids: list[int]) -> tuple[list, int]:
+    """(bundles, failures) for the given activity ids, BACKFILL_CONCURRENCY at a time."""
+    sem = asyncio.Semaphore(config.BACKFILL_CONCURRENCY)
+
+    async def one(activity_id):
+        async with sem:
+            return await fetch_activity_bundle(access_token, activity_id, priority=BACKGROUND)
+
+    results = await asyncio.gather(*(one(i) for i in ids), return_exceptions=True)
+    bundles, failed = [], 0
+    for activity_id, res in zip(ids, results):
+        if isinstance(res, (StravaAuthError, StravaUnavailable)):
+            raise res
+        if isinstance(res, BaseException) and not isinstance(res, Exception):
+            raise res
+        if isinstance(res, Exception):
+            logger.warning("Backfill: activity %s failed: %s", activity_id, res)
+            failed += 1
+            continue
+        activity, streams, laps = res
+        if streams is None or laps is None:
+            failed += 1   # summary is kept; the feedback page fetches the rest on demand
+            continue
+        bundles.append((activity, streams, laps))
+    return bundles, failed
+
+async def _import_page(user_id: int, before: int | None) -> tuple[int, int, int | None, bool]:
+    """Import one page; returns (imported, failed, next_before, finished)."""
+    access_token = await aget_access_token(str(user_id))
+    if not access_token:
+        raise StravaAuthError("no valid token")
+
+    params = {"per_page": config.BACKFILL_PAGE_SIZE}
+    if before is not None:
+        params["before"] = before
+    page = await get_json(access_token, "/athlete/activities", params=params, priority=BACKGROUND)
+    if not page:
+        return 0, 0, before, True
+
+    todo = sorted(await activity_store.awithout_detail(user_id, [a["id"] for a in page]))
+    bundles, failed = await _fetch_bundles(access_token, todo)
+
+    starts = [e for e in (iso_to_epoch(a.get("start_date")) for a in page) if e is not None]
+    # +1: activities sharing the boundary second are listed again (cheap, upserts are idempotent)
+    next_before = min(starts) + 1 if starts else before
+    if before is not None and next_before is not None and next_before >= before:
+        next_before = before - 1   # always move the cursor
+
+    state = await activity_store.aget_backfill_state(user_id)
+    imported = (state["backfill_imported"] or 0) + len(bundles)
+    failed_total = (state["backfill_failed"] or 0) + failed
+    await activity_store.asave_backfill_page(
+        user_id, page, bundles, before=next_before, imported=imported, failed=failed_total,
+    )
+    return len(bundles), failed, next_before, len(page) < config.BACKFILL_PAGE_SIZE
+
+async def run_backfill(user_id: int, *, restart: bool = False) -> dict:
+    """Import (or resume importing) the user's whole history; returns the final status()."""
+    state = await activity_store.aget_backfill_state(user_id)
+    if restart or state["backfill_status"] in (None, "done"):
+        await activity_store.aset_backfill_state(
+            user_id, status="running", before=None, imported=0, failed=0,
+            started_at=int(time.time()), error=None,
+        )
+        before = None
+    else:
+        await activity_store.aset_backfill_state(user_id, status="running", error=None)
+        before = state["backfill_before"]
+
+    progress = _progress[user_id] = {"run_started": time.time(), "run_imported": 0}
+    try:
+        while True:
+            try:
+                imported, failed, before, finished = await _import_page(user_id, before)
+            except StravaUnavailable as e:
+                wait = max(e.retry_after or 0, 5.0)
+                logger.info("Backfill for user %s paused %.0fs: %s", user_id, wait, e)
+                await asyncio.sleep(wait)
+                continue
+            progress["run_imported"] += imported
+            st = await astatus(user_id)
+            logger.info(
+                "Backfill user %s: +%s (%s failed), %s total, %.1f activities/min",
+                user_id, imported, failed, st["imported"], st["activities_per_minute"] or 0,
+            )
+            if finished:
+                break
+        await activity_store.aset_backfill_state(user_id, status="done")
+    except asyncio.CancelledError:
+        await activity_store.aset_backfill_state(user_id, status="failed", error="cancelled")
+        raise
+    except Exception as e:
+        logger.exception("Backfill for user %s failed", user_id)
+        await activity_store.aset_backfill_state(user_id, status="failed", error=str(e) or type(e).__name__)
+    return await astatus(user_id)
+
+def status(user_id: int) -> dict:
+    return _status(user_id, activity_store.get_backfill_state(user_id))
+
+async def astatus(user_id: int) -> dict:
+    return _status(user_id, await activity_store.aget_backfill_state(user_id))
+
+def _status(user_id: int, state: dict) -> dict:
+    task = _jobs.get(user_id)
+    progress = _progress.get(user_id)
+    rate = None
+    if progress:
+        minutes = (time.time() - progress["run_started"]) / 60
+        rate = round(progress["run_imported"] / minutes, 1) if minutes > 0 else None
+    before = state["backfill_before"]
+    return {
+        "status": state["backfill_status"] or "never_run",
+        "running_here": bool(task and not task.done()),
+        "imported": state["backfill_imported"] or 0,
+        "failed": state["backfill_failed"] or 0,
+        "oldest_imported": datetime.fromtimestamp(before, timezone.utc).isoformat() if before else None,
+        "started_at": state["backfill_started_at"],
+        "updated_at": state["backfill_updated_at"],
+        "activities_per_minute": rate,
+        "error": state["backfill_error"],
+    }
+
+async def start(user_id: int, *, restart: bool = False) -> dict:
+    """Start (or resume) the backfill as a background task of the running app."""
+    task = _jobs.get(user_id)
+    if task is None or task.done():
+        _jobs[user_id] = asyncio.create_task(run_backfill(user_id, restart=restart), name=f"backfill-{user_id}")
+    return await astatus(user_id)
+
+async def stop_all() -> None:
+    """Cancel running jobs on shutdown; they resume from their checkpoint next time."""
+    tasks = [t for t in _jobs.values() if not t.done()]
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _jobs.clear()
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Import a user's full Strava history into the local store.")
+    ap.add_argument("--user", type=int, required=True, help="local user id")
+    ap.add_argument("--restart", action="store_true", help="start from the newest activity instead of resuming")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from backend.services.strava_http import close_clients
+
+    async def run():
+        try:
+            return await run_backfill(args.user, restart=args.restart)
+        finally:
+            await close_clients()
+
+    result = asyncio.run(run())
+    print(result)
+    raise SystemExit(0 if result["status"] == "done" else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# backend/services/data_versions.py
+"""
+Per-user data version counters behind the ETags of GET /plans and /activity_feedback.
+
+Every write bumps the user's counter for its scope inside the write's own
+transaction, so a conditional GET costs one primary-key lookup: same counters (and
+same query) -> same body -> 304 Not Modified without loading or serialising data.
+Read the counters *before* the data: a write racing the request then changes the
+counter, and the ETag we sent can never match again.
+"""
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db.session import AsyncSessionLocal
+
+PLANS = "plans"
+ACTIVITIES = "activities"
+FEEDBACK = "feedback"   # rendered feedback pages (coach answer regenerated or failed)
+
+_BUMP = text("""
+    INSERT INTO user_data_versions (user_id, scope, version) VALUES (:uid, :scope, 1)
+    ON CONFLICT (user_id, scope) DO UPDATE SET version = user_data_versions.version + 1
+""")
+_SELECT = text("SELECT scope, version FROM user_data_versions WHERE user_id = :uid")
+
+def bump(db: Session, user_id: int, scope: str) -> None:
+    """Bump in the caller's transaction (committed with the write itself)."""
+    db.execute(_BUMP, {"uid": int(user_id), "scope": scope})
+
+async def abump(db: AsyncSession, user_id: int, scope: str) -> None:
+    await db.execute(_BUMP, {"uid": int(user_id), "scope": scope})
+
+async def abump_now(user_id: int, scope: str) -> None:
+    """Bump in a transaction of its own (no data write to ride along with)."""
+    async with AsyncSessionLocal() as db:
+        await abump(db, user_id, scope)
+        await db.commit()
+
+async def aversions(user_id: int, *scopes: str, db: AsyncSession | None = None) -> tuple[int, ...]:
+    """Current counters for `scopes` (0 = never written), in one query."""
+    if db is None:
+        async with AsyncSessionLocal() as db:
+            return await aversions(user_id, *scopes, db=db)
+    rows = dict((await db.execute(_SELECT, {"uid": int(user_id)})).all())
+    return tuple(rows.get(s, 0) for s in scopes)
@@ -0,0 +1,71 @@
+# backend/services/gpt_cache.py
+"""
+SQLite cache of chat completions, keyed by sha256(model + messages).
+
+Re-opening the feedback page for the same activity sends the exact same prompt, so
+the stored answer is reused instead of paying for (and waiting on) a new completion.
+Entries expire GPT_CACHE_TTL_SECONDS after they were written; beyond
+GPT_CACHE_MAX_ENTRIES the least recently used ones are evicted. Recency is only
+tracked to the hour (_TOUCH_SECONDS), so most hits are plain reads and don't queue
+for SQLite's write lock.
+"""
+import json
+import time
+import hashlib
+from sqlalchemy import select, delete, func
+import backend.config as config
+from backend.db.session import SessionLocal
+from backend.db.models import GptCacheEntry
+
+# A hit only rewrites last_used_at when the stored one is older than this
+_TOUCH_SECONDS = 3600
+
+def cache_key(model: str, messages: list[dict]) -> str:
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def get(key: str) -> dict | None:
+    """
+    Cached response for `key`, or None if missing/expired (expired rows are trimmed by
+    put). Hits refresh the LRU position at most once per _TOUCH_SECONDS.
+    """
+    now = time.time()
+    db = SessionLocal()
+    try:
+        row = db.get(GptCacheEntry, key)
+        if row is None or now - row.created_at > config.GPT_CACHE_TTL_SECONDS:
+            return None
+        response = json.loads(row.response_json)
+        if now - (row.last_used_at or 0) > _TOUCH_SECONDS:
+            row.last_used_at = now
+            db.commit()
+        return response
+    finally:
+        db.close()
+
+def put(key: str, model: str, response: dict) -> None:
+    """Store (or replace) a response, then trim expired and least recently used entries."""
+    now = time.time()
+    db = SessionLocal()
+    try:
+        row = db.get(GptCacheEntry, key)
+        if row is None:
+            row = GptCacheEntry(key=key, model=model)
+            db.add(row)
+        row.response_json = json.dumps(response, ensure_ascii=False)
+        row.created_at = now
+        row.last_used_at = now
+        db.flush()
+
+        db.execute(delete(GptCacheEntry).where(GptCacheEntry.created_at < now - config.GPT_CACHE_TTL_SECONDS))
+        excess = db.execute(select(func.count()).select_from(GptCacheEntry)).scalar_one() - config.GPT_CACHE_MAX_ENTRIES
+        if excess > 0:
+            oldest = (
+                select(GptCacheEntry.key)
+                .order_by(GptCacheEntry.last_used_at, GptCacheEntry.created_at)
+                .limit(excess)
+            )
+            db.execute(delete(GptCacheEntry).where(GptCacheEntry.key.in_(oldest)))
+        db.commit()
+    finally:
+        db.close()
@@ -1,7 +1,11 @@
 import os
 import time
-from openai import OpenAI
+import asyncio
+import threading
+from typing import AsyncIterator
+from openai import AsyncOpenAI
 import backend.config as config
+from backend.services import gpt_cache
 import structlog
 from prometheus_client import Counter, Histogram, Gauge
 
@@ -22,21 +26,36 @@ COST_TOTAL = Counter(
     "gpt_cost_total_usd", "Total USD cost of all GPT calls"
 )
 
+# Response cache (see services/gpt_cache.py)
+CACHE_HITS = Counter("gpt_cache_hits_total", "GPT responses served from the cache")
+CACHE_MISSES = Counter("gpt_cache_misses_total", "GPT calls not answered from the cache")
+
 # Stubbed response when GPT is disabled
 _STUB = {"choices": [{"message": {"content": "[ChatGPT not called – debug mode OFF]"}}]}
 
-def call_chat_completion(model: str, messages: list[dict]) -> dict:
-    if not config.ENABLE_GPT:
-        logger.info("gpt.call.stubbed", model=model)
-        REQUESTS.labels(status="stubbed").inc()
-        return _STUB
+_async_client: AsyncOpenAI | None = None
+_client_lock = threading.Lock()
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    start = time.time()
-    resp = client.chat.completions.create(model=model, messages=messages)
-    duration = time.time() - start
+def _get_async_client() -> AsyncOpenAI:
+    """Process-wide async client, closed by main.lifespan via close_clients()."""
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=config.OPENAI_TIMEOUT,
+                max_retries=config.OPENAI_MAX_RETRIES,
+            )
+        return _async_client
+
+async def close_clients() -> None:
+    global _async_client
+    with _client_lock:
+        aclient, _async_client = _async_client, None
+    if aclient is not None:
+        await aclient.close()
 
-    usage = getattr(resp, "usage", None)
+def _record_success(model: str, usage, duration: float) -> None:
     p = getattr(usage, "prompt_tokens", None)
     c = getattr(usage, "completion_tokens", None)
     t = getattr(usage, "total_tokens", None)
@@ -61,5 +80,96 @@ def call_chat_completion(model: str, messages: list[dict]) -> dict:
     cost = ((p or 0) / 1000) * 0.0015 + ((c or 0) / 1000) * 0.0020
     COST_TOTAL.inc(cost)
 
+def _cache_lookup(model: str, messages: list[dict], regenerate: bool) -> tuple[str | None, dict | None]:
+    """
+    (key, cached response). key is None when caching is off; with regenerate=True the
+    lookup is skipped and the fresh answer replaces the stored one.
+    A broken cache never fails the call, it just counts as a miss.
+    """
+    if not config.GPT_CACHE_ENABLED:
+        return None, None
+    key = gpt_cache.cache_key(model, messages)
+    cached = None
+    if not regenerate:
+        try:
+            cached = gpt_cache.get(key)
+        except Exception as e:
+            logger.warning("gpt.cache.error", model=model, error=str(e))
+    if cached is None:
+        CACHE_MISSES.inc()
+        return key, None
+    logger.info("gpt.cache.hit", model=model)
+    CACHE_HITS.inc()
+    return key, cached
+
+def _cache_store(key: str | None, model: str, response: dict) -> None:
+    if key is None:
+        return
+    try:
+        gpt_cache.put(key, model, response)
+    except Exception as e:
+        logger.warning("gpt.cache.error", model=model, error=str(e))
+
+# The cache is SQLite: async callers run lookups and stores in a worker thread
+async def _acache_lookup(model: str, messages: list[dict], regenerate: bool) -> tuple[str | None, dict | None]:
+    if not config.GPT_CACHE_ENABLED:
+        return None, None
+    return await asyncio.to_thread(_cache_lookup, model, messages, regenerate)
 
-    return resp.model_dump()
+async def _acache_store(key: str | None, model: str, response: dict) -> None:
+    if key is not None:
+        await asyncio.to_thread(_cache_store, key, model, response)
+
+async def astream_chat_completion(
+    model: str, messages: list[dict], *, timeout: float | None = None, regenerate: bool = False
+) -> AsyncIterator[str]:
+    """
+    Yield the completion text as it is generated (content deltas).
+    Token/cost metrics are recorded from the usage chunk at the end of the stream;
+    closing the generator early (client went away) aborts the request.
+    A cached answer is yielded in one piece; only completed streams are cached.
+    """
+    if not config.ENABLE_GPT:
+        logger.info("gpt.call.stubbed", model=model)
+        REQUESTS.labels(status="stubbed").inc()
+        yield _STUB["choices"][0]["message"]["content"]
+        return
+
+    key, cached = await _acache_lookup(model, messages, regenerate)
+    if cached is not None:
+        yield cached["choices"][0]["message"]["content"] or ""
+        return
+
+    start = time.time()
+    usage = None
+    parts: list[str] = []
+    try:
+        stream = await _get_async_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout or config.OPENAI_TIMEOUT,
+        )
+        async with stream:
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                for choice in chunk.choices:
+                    if choice.delta and choice.delta.content:
+                        parts.append(choice.delta.content)
+                        yield choice.delta.content
+    except (asyncio.CancelledError, GeneratorExit):
+        logger.info("gpt.call.cancelled", model=model, latency_s=time.time() - start)
+        REQUESTS.labels(status="cancelled").inc()
+        raise
+    except Exception as e:
+        logger.warning("gpt.call.error", model=model, error=str(e), latency_s=time.time() - start)
+        REQUESTS.labels(status="error").inc()
+        raise
+    _record_success(model, usage, time.time() - start)
+    await _acache_store(key, model, {
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(parts)}}],
+        "usage": usage.model_dump() if usage is not None else None,
+    })
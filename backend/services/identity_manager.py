@@ -1,14 +1,23 @@
 # backend/services/identity_manager.py
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from backend.db.session import SessionLocal
+from backend.db.session import SessionLocal, AsyncSessionLocal
 
-def link_strava_identity(local_user_id: int, tokens: dict) -> None:
-    """
-    Persist the link between this local user and the Strava account.
-    Enforces uniqueness: a Strava account can't be linked to two local users.
-    """
-    provider = "strava"
+# Shared by the sync and async variants below
+_SELECT_OWNER = text("""
+    SELECT user_id FROM auth_identities
+    WHERE provider='strava' AND provider_user_id=:pid
+""")
+_UPSERT_LINK = text("""
+    INSERT INTO auth_identities (user_id, provider, provider_user_id, email_from_provider)
+    VALUES (:uid, 'strava', :pid, :email)
+    ON CONFLICT(provider, provider_user_id) DO UPDATE SET
+        user_id = excluded.user_id,
+        email_from_provider = excluded.email_from_provider
+""")
+_DELETE_LINK = text("DELETE FROM auth_identities WHERE provider='strava' AND user_id=:uid")
+
+def _link_params(local_user_id: int, tokens: dict) -> dict:
     athlete = tokens.get("athlete") or {}
     provider_user_id = str(athlete.get("id"))
     email_from_provider = athlete.get("email")  # often absent; fine if None
@@ -17,43 +26,58 @@ def link_strava_identity(local_user_id: int, tokens: dict) -> None:
         # First-time code exchange should include athlete; if you're doing this after a refresh
         # you'll need to call /athlete to look it up.
         raise ValueError("Missing athlete.id in tokens")
+    return {"uid": local_user_id, "pid": provider_user_id, "email": email_from_provider}
+
+def _check_owner(row, local_user_id: int) -> None:
+    # Is this Strava account already linked to someone else?
+    if row and int(row[0]) != int(local_user_id):
+        raise ValueError("This Strava account is already linked to another user.")
 
+def link_strava_identity(local_user_id: int, tokens: dict) -> None:
+    """
+    Persist the link between this local user and the Strava account.
+    Enforces uniqueness: a Strava account can't be linked to two local users.
+    """
+    params = _link_params(local_user_id, tokens)
     db: Session = SessionLocal()
     try:
-        # Is this Strava account already linked to someone else?
-        row = db.execute(
-            text("""
-                SELECT user_id FROM auth_identities
-                WHERE provider='strava' AND provider_user_id=:pid
-            """),
-            {"pid": provider_user_id},
-        ).fetchone()
-
-        if row and int(row[0]) != int(local_user_id):
-            raise ValueError("This Strava account is already linked to another user.")
-
-        # Upsert link
-        db.execute(
-            text("""
-                INSERT INTO auth_identities (user_id, provider, provider_user_id, email_from_provider)
-                VALUES (:uid, 'strava', :pid, :email)
-                ON CONFLICT(provider, provider_user_id) DO UPDATE SET
-                    user_id = excluded.user_id,
-                    email_from_provider = excluded.email_from_provider
-            """),
-            {"uid": local_user_id, "pid": provider_user_id, "email": email_from_provider},
-        )
+        _check_owner(db.execute(_SELECT_OWNER, {"pid": params["pid"]}).fetchone(), local_user_id)
+        db.execute(_UPSERT_LINK, params)
         db.commit()
     finally:
         db.close()
 
+async def alink_strava_identity(local_user_id: int, tokens: dict) -> None:
+    """link_strava_identity for async callers."""
+    params = _link_params(local_user_id, tokens)
+    async with AsyncSessionLocal() as db:
+        _check_owner((await db.execute(_SELECT_OWNER, {"pid": params["pid"]})).fetchone(), local_user_id)
+        await db.execute(_UPSERT_LINK, params)
+        await db.commit()
+
 def unlink_strava_identity(local_user_id: int) -> None:
     db: Session = SessionLocal()
     try:
-        db.execute(
-            text("DELETE FROM auth_identities WHERE provider='strava' AND user_id=:uid"),
-            {"uid": local_user_id},
-        )
+        db.execute(_DELETE_LINK, {"uid": local_user_id})
         db.commit()
     finally:
         db.close()
+
+async def aunlink_strava_identity(local_user_id: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(_DELETE_LINK, {"uid": local_user_id})
+        await db.commit()
+
+def user_id_for_strava_athlete(athlete_id) -> int | None:
+    """Local user linked to this Strava athlete id (webhook events only carry the athlete)."""
+    db: Session = SessionLocal()
+    try:
+        row = db.execute(_SELECT_OWNER, {"pid": str(athlete_id)}).fetchone()
+        return int(row[0]) if row else None
+    finally:
+        db.close()
+
+async def auser_id_for_strava_athlete(athlete_id) -> int | None:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(_SELECT_OWNER, {"pid": str(athlete_id)})).fetchone()
+        return int(row[0]) if row else None
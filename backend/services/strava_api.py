@@ -1,31 +1,121 @@
-import requests
+import asyncio
+import logging
 import datetime
+import httpx
 from dotenv import load_dotenv
-from backend.services.token_manager import get_access_token
+import backend.config as config
+from backend.services.token_manager import aget_access_token
+from backend.services import strava_client
+from backend.services.strava_client import StravaUnavailable, INTERACTIVE
+from backend.services import activity_store
+from backend.utils import stream_codec
 from backend.utils.utils import safe_round, safe_str, safe_int
 
 load_dotenv()
 
-def get_last_20_activities(user_id):
-    access_token = get_access_token(user_id)
-    if not access_token:
-        print(f"⚠️ No access token found for user {user_id}.")
-        return []
+logger = logging.getLogger(__name__)
+
+STREAM_KEYS = "heartrate,distance,time"
+
+class StravaAuthError(Exception):
+    """Strava answered 401: the stored token is no longer accepted, user must reconnect."""
+
+async def get_json(access_token: str, path: str, *, params: dict | None = None, priority: str = INTERACTIVE):
+    """
+    GET a Strava API path (relative to STRAVA_API_BASE) through the rate-limited client
+    and return the decoded JSON. Raises StravaUnavailable when Strava can't be called now.
+    """
+    r = await strava_client.request("GET", path, access_token=access_token, params=params, priority=priority)
+    if r.status_code == 401:
+        raise StravaAuthError(path)
+    r.raise_for_status()
+    return r.json()
+
+async def fetch_activity_bundle(
+    access_token: str, activity_id, *, priority: str = INTERACTIVE
+) -> tuple[dict, dict, list]:
+    """
+    Fetch the detailed activity, its HR/distance/time streams and its laps concurrently,
+    so the cost is one Strava round trip instead of three.
+
+    The detail is required: a failure there is raised. Streams and laps are optional:
+    if they fail they come back as None and the page still renders without them.
+    A 401 from any of the three raises StravaAuthError.
+    """
+    activity, streams, laps = await asyncio.gather(
+        get_json(access_token, f"/activities/{activity_id}", priority=priority),
+        get_json(
+            access_token, f"/activities/{activity_id}/streams",
+            params={"keys": STREAM_KEYS, "key_by_type": True}, priority=priority,
+        ),
+        get_json(access_token, f"/activities/{activity_id}/laps", priority=priority),
+        return_exceptions=True,
+    )
 
-    url = "https://www.strava.com/api/v3/athlete/activities"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {
-        "per_page": 20,
-        "page": 1
+    results = (activity, streams, laps)
+    for res in results:
+        if isinstance(res, StravaAuthError):
+            raise res
+        if isinstance(res, BaseException) and not isinstance(res, Exception):
+            raise res  # cancellation etc. must propagate untouched
+    if isinstance(activity, Exception):
+        raise activity
+    if isinstance(streams, Exception):
+        logger.warning("Strava streams fetch failed for activity %s: %s", activity_id, streams)
+        streams = None
+    if isinstance(laps, Exception):
+        logger.warning("Strava laps fetch failed for activity %s: %s", activity_id, laps)
+        laps = None
+    return activity, streams, laps
+
+async def get_activity_bundle(user_id: int, access_token: str, activity_id) -> tuple[dict, dict, list]:
+    """
+    Read-through: (activity, streams, laps) from the local store when fresh,
+    otherwise from Strava (and stored, unless part of the fetch failed).
+    Either way stream "data" is a NumPy array (see utils/stream_codec.py).
+    """
+    cached = await activity_store.aload_bundle(user_id, activity_id)
+    if cached is not None:
+        return cached
+    activity, streams, laps = await fetch_activity_bundle(access_token, activity_id)
+    if streams is not None and laps is not None:
+        await activity_store.asave_bundle(user_id, activity, streams, laps)
+    streams = {
+        stype: {**s, "data": stream_codec.to_array(stype, s.get("data"))}
+        for stype, s in (streams or {}).items()
     }
+    return activity, streams, laps or []
+
+async def get_recent_activities(user_id: int, access_token: str, *, limit: int = 20) -> list[dict]:
+    """Raw summaries of the latest activities; served from the store while the list is fresh."""
+    fresh, _ = await activity_store.aget_cached_list_state(user_id)
+    if fresh:
+        return await activity_store.arecent_summaries(user_id, limit)
+    raw = await get_json(access_token, "/athlete/activities", params={"per_page": limit, "page": 1})
+    await activity_store.asave_summaries(user_id, raw)
+    return raw
 
-    response = requests.get(url, headers=headers, params=params)
+async def get_last_20_activities(user_id):
+    access_token = await aget_access_token(user_id)
+    if not access_token:
+        print(f"⚠️ No access token found for user {user_id}.")
+        return []
 
-    if response.status_code != 200:
-        print(f"❌ Strava API error: {response.status_code}, {response.text}")
+    try:
+        raw_activities = await get_recent_activities(int(user_id), access_token, limit=20)
+    except StravaAuthError:
+        print(f"❌ Strava API error: 401 for user {user_id}")
+        return []
+    except httpx.HTTPStatusError as e:
+        print(f"❌ Strava API error: {e.response.status_code}, {e.response.text}")
+        return []
+    except StravaUnavailable as e:
+        print(f"❌ Strava unavailable for user {user_id}: {e}")
+        return []
+    except httpx.HTTPError as e:
+        print(f"❌ Strava API error: {e}")
         return []
 
-    raw_activities = response.json()
     activities = []
 
     for act in raw_activities:
@@ -0,0 +1,293 @@
+# backend/services/strava_client.py
+"""
+Rate-limit-aware front door for Strava API calls.
+
+Strava budgets requests per application in a 15-minute window (resets at :00, :15,
+:30, :45 UTC) and a daily one (resets at midnight UTC), and reports both on every
+response:
+    X-RateLimit-Limit: 200,2000        X-RateLimit-Usage: 35,412
+(plus X-ReadRateLimit-* for the read budget; the tighter of the two is used).
+
+request() sends every call through:
+  - one process-wide token bucket, refilled so the remaining 15-minute budget is
+    spread over the rest of the window, with bursts of up to STRAVA_RATE_BURST;
+  - priorities: interactive calls (page views) are served before waiting background
+    calls, and background work (backfill, webhooks) stops once only
+    STRAVA_RATE_BACKGROUND_RESERVE of a window is left, so page views keep working;
+  - retries of 429/5xx/transport errors with jittered exponential backoff
+    (Retry-After wins when Strava sends it);
+  - a circuit breaker: after STRAVA_BREAKER_THRESHOLD consecutive failures calls
+    fail fast with StravaUnavailable for STRAVA_BREAKER_COOLDOWN_SECONDS, then a
+    single trial call decides whether to close it again.
+Interactive callers never wait longer than STRAVA_RATE_MAX_WAIT_SECONDS for budget;
+they get StravaRateLimited instead.
+
+OAuth endpoints (token exchange/refresh, deauthorize) don't count against the API
+budget and keep using strava_http directly.
+"""
+import time
+import random
+import asyncio
+import logging
+import httpx
+from prometheus_client import Counter, Gauge
+import backend.config as config
+from backend.services.strava_http import get_async_client
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+_WINDOW_S = 15 * 60
+_DAY_S = 24 * 3600
+
+RATE_LIMIT = Gauge("strava_ratelimit_limit", "Strava request budget per window", ["window"])
+RATE_USAGE = Gauge("strava_ratelimit_usage", "Strava requests used in the current window", ["window"])
+CIRCUIT_OPEN = Gauge("strava_circuit_open", "1 while the Strava circuit breaker is open")
+RETRIES = Counter("strava_retries_total", "Strava calls retried", ["reason"])
+REJECTED = Counter("strava_rate_limited_total", "Strava calls refused for lack of budget", ["priority"])
+
+class StravaUnavailable(Exception):
+    """Strava can't be called right now (circuit open or out of budget); retry after `retry_after` s."""
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class StravaRateLimited(StravaUnavailable):
+    """Out of Strava budget for longer than the caller is willing to wait."""
+
+def _pair(value: str | None) -> tuple[int, int] | None:
+    """'200,2000' -> (200, 2000)."""
+    try:
+        short, daily = (int(v) for v in value.split(","))
+        return short, daily
+    except (AttributeError, ValueError):
+        return None
+
+class _Budget:
+    """Latest known limits/usage for the 15-minute and daily windows."""
+    def __init__(self):
+        self.limit_15 = config.STRAVA_RATE_LIMIT_15MIN
+        self.limit_day = config.STRAVA_RATE_LIMIT_DAILY
+        self.usage_15 = 0
+        self.usage_day = 0
+        self._window_15 = self._window_day = -1
+
+    def _roll(self, now: float) -> None:
+        w15, wday = int(now // _WINDOW_S), int(now // _DAY_S)
+        if w15 != self._window_15:
+            self._window_15, self.usage_15 = w15, 0
+        if wday != self._window_day:
+            self._window_day, self.usage_day = wday, 0
+
+    def count(self, now: float) -> None:
+        """Count a call we're about to send (the next response corrects the numbers)."""
+        self._roll(now)
+        self.usage_15 += 1
+        self.usage_day += 1
+
+    def observe(self, headers: httpx.Headers, now: float) -> None:
+        self._roll(now)
+        seen = []
+        for prefix in ("X-RateLimit", "X-ReadRateLimit"):
+            limit, usage = _pair(headers.get(f"{prefix}-Limit")), _pair(headers.get(f"{prefix}-Usage"))
+            if limit and usage:
+                seen.append((limit, usage))
+        if seen:
+            (self.limit_15, _), (self.usage_15, _) = min(seen, key=lambda lu: lu[0][0] - lu[1][0])
+            (_, self.limit_day), (_, self.usage_day) = min(seen, key=lambda lu: lu[0][1] - lu[1][1])
+        self.export()
+
+    def exhaust_window(self, now: float) -> None:
+        """A 429 without usable headers: treat the 15-minute window as spent."""
+        self._roll(now)
+        self.usage_15 = max(self.usage_15, self.limit_15)
+        self.export()
+
+    def export(self) -> None:
+        RATE_LIMIT.labels(window="15min").set(self.limit_15)
+        RATE_LIMIT.labels(window="daily").set(self.limit_day)
+        RATE_USAGE.labels(window="15min").set(self.usage_15)
+        RATE_USAGE.labels(window="daily").set(self.usage_day)
+
+    def wait_time(self, priority: str, now: float) -> float:
+        """Seconds until this priority may spend budget again (0 = go)."""
+        self._roll(now)
+        share = 1.0 if priority == INTERACTIVE else 1.0 - config.STRAVA_RATE_BACKGROUND_RESERVE
+        if self.usage_day >= self.limit_day * share:
+            return (self._window_day + 1) * _DAY_S - now
+        if self.usage_15 >= self.limit_15 * share:
+            return (self._window_15 + 1) * _WINDOW_S - now
+        return 0.0
+
+    def refill_rate(self, now: float) -> float:
+        """Requests/second that spends what is left of this window evenly until it resets."""
+        self._roll(now)
+        left_s = max((self._window_15 + 1) * _WINDOW_S - now, 1.0)
+        remaining = max(self.limit_15 - self.usage_15, 0)
+        return max(self.limit_15 / _WINDOW_S, remaining / left_s)
+
+class _TokenBucket:
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def take(self, rate: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+class _CircuitBreaker:
+    def __init__(self):
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+
+    def check(self) -> None:
+        if self.opened_at is None:
+            return
+        left = config.STRAVA_BREAKER_COOLDOWN_SECONDS - (time.monotonic() - self.opened_at)
+        if left > 0 or self._trial:
+            raise StravaUnavailable("Strava circuit breaker is open", retry_after=max(left, 1.0))
+        self._trial = True   # half-open: let exactly one call through
+
+    def abandon_trial(self) -> None:
+        """The half-open trial ended without an answer (cancelled, no budget): let the next call try."""
+        self._trial = False
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        CIRCUIT_OPEN.set(0)
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= config.STRAVA_BREAKER_THRESHOLD:
+            if self.opened_at is None or self._trial:
+                logger.warning("Strava circuit breaker open after %s failures", self.failures)
+            self.opened_at = time.monotonic()
+            self._trial = False
+            CIRCUIT_OPEN.set(1)
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+_budget = _Budget()
+_bucket = _TokenBucket(config.STRAVA_RATE_BURST)
+_breaker = _CircuitBreaker()
+_interactive_waiting = 0
+
+async def _acquire(priority: str) -> None:
+    """Wait for budget + a bucket token; interactive callers go first and wait at most STRAVA_RATE_MAX_WAIT_SECONDS."""
+    global _interactive_waiting
+    interactive = priority == INTERACTIVE
+    waited = 0.0
+    if interactive:
+        _interactive_waiting += 1
+    try:
+        while True:
+            now = time.time()
+            wait = _budget.wait_time(priority, now)
+            if not wait:
+                if interactive or not _interactive_waiting:
+                    wait = _bucket.take(_budget.refill_rate(now))
+                    if not wait:
+                        _budget.count(now)
+                        return
+                else:
+                    wait = 0.05   # let the waiting page views go first
+            if interactive and waited + wait > config.STRAVA_RATE_MAX_WAIT_SECONDS:
+                REJECTED.labels(priority=priority).inc()
+                raise StravaRateLimited("Strava rate limit budget exhausted", retry_after=wait)
+            await asyncio.sleep(wait)
+            waited += wait
+    finally:
+        if interactive:
+            _interactive_waiting -= 1
+
+def _backoff(attempt: int, response: httpx.Response | None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    delay = min(config.STRAVA_RETRY_BASE_SECONDS * 2 ** (attempt - 1), config.STRAVA_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+async def request(
+    method: str,
+    path: str,
+    *,
+    access_token: str | None = None,
+    priority: str = INTERACTIVE,
+    params: dict | None = None,
+    data: dict | None = None,
+    timeout: float | None = None,
+) -> httpx.Response:
+    """
+    Send a Strava API call (path relative to STRAVA_API_BASE, or an absolute URL).
+
+    Returns the final response (which may still be a 5xx after the retries, for the
+    caller's raise_for_status). Raises StravaUnavailable while the breaker is open,
+    StravaRateLimited when out of budget, httpx.TransportError if every attempt failed
+    to connect.
+    """
+    url = path if path.startswith(("http://", "https://")) else f"{config.STRAVA_API_BASE}{path}"
+    headers = {"Authorization": f"Bearer {access_token}"} if access_token else None
+    kwargs = {"timeout": timeout} if timeout is not None else {}
+    attempt = 0
+    while True:
+        _breaker.check()
+        error: httpx.TransportError | None = None
+        response: httpx.Response | None = None
+        try:
+            await _acquire(priority)
+            response = await get_async_client().request(
+                method, url, headers=headers, params=params, data=data, **kwargs
+            )
+        except httpx.TransportError as e:
+            error = e
+        except BaseException:
+            _breaker.abandon_trial()
+            raise
+        else:
+            _budget.observe(response.headers, time.time())
+
+        if response is not None and response.status_code < 500:
+            _breaker.success()   # Strava is up (a 429 is a budget problem, not an outage)
+            if response.status_code != 429:
+                return response
+            reason = "429"
+            if not _pair(response.headers.get("X-RateLimit-Usage")):
+                _budget.exhaust_window(time.time())
+        else:
+            reason = "5xx" if response is not None else "transport"
+            _breaker.failure()
+
+        attempt += 1
+        if attempt > config.STRAVA_MAX_RETRIES or _breaker.is_open:
+            if error is not None:
+                raise error
+            if reason == "429":
+                REJECTED.labels(priority=priority).inc()
+                raise StravaRateLimited("Strava answered 429 Too Many Requests", retry_after=_backoff(attempt, response))
+            return response
+
+        delay = _backoff(attempt, response)
+        if priority == INTERACTIVE and delay > config.STRAVA_RATE_MAX_WAIT_SECONDS:
+            if error is not None:
+                raise error
+            raise StravaRateLimited(f"Strava asked us to back off for {delay:.0f}s", retry_after=delay)
+        RETRIES.labels(reason=reason).inc()
+        logger.info("Strava %s %s failed (%s), retry %s in %.2fs", method, path, reason, attempt, delay)
+        await asyncio.sleep(delay)
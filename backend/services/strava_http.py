@@ -0,0 +1,58 @@
+# backend/services/strava_http.py
+"""
+Process-wide, connection-pooled HTTP clients for talking to Strava.
+
+main.lifespan opens them on startup and closes them on shutdown, so every Strava
+call reuses warm keep-alive connections instead of paying a TLS handshake.
+The async client is for request handlers; the sync twin is for the few code
+paths that are still synchronous (OAuth code exchange, token refresh).
+"""
+import threading
+import httpx
+import backend.config as config
+
+_async_client: httpx.AsyncClient | None = None
+_sync_client: httpx.Client | None = None
+_lock = threading.Lock()
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.STRAVA_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.STRAVA_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.STRAVA_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(config.STRAVA_HTTP_TIMEOUT, connect=config.STRAVA_HTTP_CONNECT_TIMEOUT)
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared AsyncClient (created lazily if used outside the app lifespan, e.g. scripts)."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        with _lock:
+            if _async_client is None or _async_client.is_closed:
+                _async_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+    return _async_client
+
+def get_sync_client() -> httpx.Client:
+    """Shared blocking Client; httpx.Client is thread-safe, so threadpool handlers can share it."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(limits=_limits(), timeout=_timeout())
+    return _sync_client
+
+async def open_clients() -> None:
+    get_async_client()
+    get_sync_client()
+
+async def close_clients() -> None:
+    global _async_client, _sync_client
+    with _lock:
+        aclient, sclient = _async_client, _sync_client
+        _async_client = _sync_client = None
+    if aclient is not None:
+        await aclient.aclose()
+    if sclient is not None:
+        sclient.close()
@@ -0,0 +1,182 @@
+# backend/services/strava_webhook.py
+"""
+Background processing of Strava webhook events (routes/webhook_routes.py).
+
+Strava wants the POST answered within 2 seconds, so the route only enqueues the
+event; a single worker task started from main.lifespan applies it to the local
+store:
+  activity create/update -> fetch just that activity (detail, streams, laps) and store it
+  activity delete        -> drop it from the store once Strava answers 404 for it
+  athlete deauthorization (updates.authorized == "false")
+                         -> delete_tokens + unlink_strava_identity, once Strava
+                            rejects the stored token (401)
+Destructive events are confirmed with Strava first: the webhook POST only proves the
+sender knows the subscription id, and a forged event must not erase anything.
+Strava calls run at BACKGROUND priority, and store writes run in a worker thread
+(activity_store's a* functions) so the worker never stalls the event loop. An event
+that hits an unavailable Strava (circuit open) is re-queued a few times with a
+delay. Every step is idempotent, so Strava's own redeliveries are harmless.
+"""
+import asyncio
+import logging
+import httpx
+from prometheus_client import Counter, Gauge
+import backend.config as config
+from backend.services import activity_store, data_versions
+from backend.services.token_manager import aget_access_token, adelete_tokens
+from backend.services.identity_manager import auser_id_for_strava_athlete, aunlink_strava_identity
+from backend.services.strava_client import StravaUnavailable, BACKGROUND
+from backend.services.strava_api import StravaAuthError, fetch_activity_bundle, get_json
+
+logger = logging.getLogger(__name__)
+
+EVENTS = Counter(
+    "strava_webhook_events_total", "Strava webhook events processed",
+    ["object_type", "aspect_type", "result"],
+)
+QUEUE_DEPTH = Gauge("strava_webhook_queue_depth", "Strava webhook events waiting to be processed")
+
+_MAX_ATTEMPTS = 3
+
+_queue: asyncio.Queue | None = None
+_worker: asyncio.Task | None = None
+
+def enqueue(event: dict, attempt: int = 0) -> bool:
+    """Queue an event for the worker; False if the queue is full (or not running)."""
+    if _queue is None:
+        logger.warning("Strava webhook worker not running, rejecting event %s", event)
+        return False
+    try:
+        _queue.put_nowait((event, attempt))
+    except asyncio.QueueFull:
+        logger.warning("Strava webhook queue full, rejecting event %s", event)
+        EVENTS.labels(str(event.get("object_type")), str(event.get("aspect_type")), "rejected").inc()
+        return False
+    QUEUE_DEPTH.set(_queue.qsize())
+    return True
+
+async def _sync_activity(user_id: int, activity_id: int) -> str:
+    access_token = await aget_access_token(str(user_id))
+    if not access_token:
+        return "no_token"
+    activity, streams, laps = await fetch_activity_bundle(access_token, activity_id, priority=BACKGROUND)
+    if streams is None or laps is None:
+        # Keep what we got; the next page view fetches the rest on demand
+        await activity_store.asave_summary(user_id, activity)
+        return "partial"
+    await activity_store.asave_bundle(user_id, activity, streams, laps)
+    return "synced"
+
+async def _deauthorized(user_id: int) -> bool:
+    """True if Strava itself no longer accepts the user's token (/athlete answers 401)."""
+    access_token = await aget_access_token(str(user_id))
+    if not access_token:
+        return False   # nothing valid to check with (expired, refresh failed): leave the link alone
+    try:
+        await get_json(access_token, "/athlete", priority=BACKGROUND)
+    except StravaAuthError:
+        return True
+    return False
+
+async def _gone(user_id: int, activity_id: int) -> bool:
+    """True if Strava answers 404 for the activity (deleted, or no longer visible to us)."""
+    access_token = await aget_access_token(str(user_id))
+    if not access_token:
+        return False
+    try:
+        await get_json(access_token, f"/activities/{activity_id}", priority=BACKGROUND)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return True
+        raise
+    return False
+
+async def handle_event(event: dict) -> str:
+    """Apply one event to the local store; returns a short result label."""
+    object_type = event.get("object_type")
+    aspect_type = event.get("aspect_type")
+    user_id = await auser_id_for_strava_athlete(event.get("owner_id"))
+    if user_id is None:
+        return "unknown_athlete"
+
+    if object_type == "athlete":
+        if str((event.get("updates") or {}).get("authorized", "")).lower() == "false":
+            if not await _deauthorized(user_id):
+                logger.warning("Strava deauthorization for user %s not confirmed, ignoring", user_id)
+                return "unconfirmed"
+            await adelete_tokens(str(user_id))
+            await aunlink_strava_identity(user_id)
+            await data_versions.abump_now(user_id, data_versions.FEEDBACK)
+            logger.info("Strava deauthorized user %s via webhook", user_id)
+            return "deauthorized"
+        return "ignored"
+
+    if object_type != "activity":
+        return "ignored"
+    activity_id = int(event["object_id"])
+    if aspect_type == "delete":
+        try:
+            if not await _gone(user_id, activity_id):
+                return "unconfirmed"
+        except StravaAuthError:
+            return "auth_error"
+        await activity_store.adelete_activity(user_id, activity_id)
+        return "deleted"
+    if aspect_type == "update":
+        # Whatever happens next, page views must stop serving the old copy
+        await activity_store.amark_stale(user_id, activity_id, event.get("event_time"))
+    if aspect_type in ("create", "update"):
+        try:
+            return await _sync_activity(user_id, activity_id)
+        except StravaAuthError:
+            return "auth_error"
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:   # deleted or made private since the event
+                await activity_store.adelete_activity(user_id, activity_id)
+                return "not_found"
+            raise
+    return "ignored"
+
+async def _process(event: dict, attempt: int) -> None:
+    labels = (str(event.get("object_type")), str(event.get("aspect_type")))
+    try:
+        result = await handle_event(event)
+    except StravaUnavailable as e:
+        if attempt + 1 < _MAX_ATTEMPTS:
+            delay = max(e.retry_after or 0, 5.0) * (attempt + 1)
+            asyncio.get_running_loop().call_later(delay, enqueue, event, attempt + 1)
+            result = "retry"
+        else:
+            result = "failed"
+    except Exception:
+        logger.exception("Strava webhook event failed: %s", event)
+        result = "failed"
+    EVENTS.labels(*labels, result).inc()
+
+async def _run(queue: asyncio.Queue) -> None:
+    while True:
+        event, attempt = await queue.get()
+        QUEUE_DEPTH.set(queue.qsize())
+        try:
+            await _process(event, attempt)
+        finally:
+            queue.task_done()
+
+def start() -> None:
+    """Create the queue and start the worker on the running loop (called from main.lifespan)."""
+    global _queue, _worker
+    if _worker is not None and not _worker.done():
+        return
+    _queue = asyncio.Queue(maxsize=config.STRAVA_WEBHOOK_QUEUE_SIZE)
+    _worker = asyncio.create_task(_run(_queue), name="strava-webhook-worker")
+
+async def stop() -> None:
+    global _queue, _worker
+    worker, _worker, _queue = _worker, None, None
+    if worker is None:
+        return
+    worker.cancel()
+    try:
+        await worker
+    except asyncio.CancelledError:
+        pass
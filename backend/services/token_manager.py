@@ -2,11 +2,20 @@ import time
 import os
 import base64
 import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 import httpx
+from sqlalchemy import select, update, or_
 from sqlalchemy.orm import Session
-from backend.db.session import SessionLocal
+from backend.db.session import SessionLocal, AsyncSessionLocal
 from backend.db.models import StravaToken as ORMStravaToken
-from backend.config import STRAVA_CLIENT_ID, STRAVA_CLIENT_SECRET
+from backend.config import (
+    STRAVA_CLIENT_ID, STRAVA_CLIENT_SECRET, STRAVA_API_BASE,
+    TOKEN_CACHE_TTL_SECONDS, TOKEN_CACHE_MAX_ENTRIES,
+)
+from backend.services.strava_http import get_sync_client, get_async_client
 from cryptography.fernet import Fernet, InvalidToken
 
 def _build_key() -> bytes:
@@ -38,72 +47,347 @@ def _dec(s: str | None) -> str | None:
     except InvalidToken:
         return s
 
-def save_tokens(user_id: str, tokens: dict) -> None:
-    """
-    Insert or update Strava tokens for a user, storing them encrypted at rest.
-    """
+# Decrypted access tokens, so the hot path skips both the DB and Fernet.
+# user_id -> (access_token, expires_at, cached_at); LRU-bounded, per process.
+# save_tokens/delete_tokens keep it in sync; the TTL bounds how long another
+# worker process can serve a token that was deleted or replaced elsewhere.
+_token_cache: "OrderedDict[str, tuple[str, int, float]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+def _cache_get(user_id: str) -> str | None:
+    now = time.time()
+    with _token_cache_lock:
+        entry = _token_cache.get(user_id)
+        if entry is None:
+            return None
+        access_token, expires_at, cached_at = entry
+        if now > expires_at or now - cached_at > TOKEN_CACHE_TTL_SECONDS:
+            del _token_cache[user_id]
+            return None
+        _token_cache.move_to_end(user_id)
+        return access_token
+
+def _cache_put(user_id: str, access_token: str | None, expires_at: int) -> None:
+    with _token_cache_lock:
+        if not access_token or time.time() > expires_at:
+            _token_cache.pop(user_id, None)
+            return
+        _token_cache[user_id] = (access_token, expires_at, time.time())
+        _token_cache.move_to_end(user_id)
+        while len(_token_cache) > TOKEN_CACHE_MAX_ENTRIES:
+            _token_cache.popitem(last=False)
+
+def invalidate_cached_token(user_id: str) -> None:
+    with _token_cache_lock:
+        _token_cache.pop(str(user_id), None)
+
+def _apply_tokens(orm_token: ORMStravaToken | None, user_id: str, tokens: dict) -> ORMStravaToken:
+    """Encrypt `tokens` into the row (a new one if `orm_token` is None); caller adds/commits."""
     expires_at    = tokens.get("expires_at", int(time.time()) + 2100)
     access_token  = _enc(tokens.get("access_token"))
     refresh_token = _enc(tokens.get("refresh_token"))
+    if not orm_token:
+        return ORMStravaToken(
+            user_id=user_id,
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_at=expires_at,
+        )
+    # Always take newest values
+    if access_token:
+        orm_token.access_token = access_token
+    if refresh_token:
+        orm_token.refresh_token = refresh_token
+    orm_token.expires_at = expires_at
+    # New pair is in: release any refresh claim on the row
+    orm_token.refresh_claimed_until = None
+    return orm_token
 
+def save_tokens(user_id: str, tokens: dict) -> None:
+    """
+    Insert or update Strava tokens for a user, storing them encrypted at rest.
+    """
     db: Session = SessionLocal()
     try:
-        orm_token = db.get(ORMStravaToken, user_id)
-        if not orm_token:
-            orm_token = ORMStravaToken(
-                user_id=user_id,
-                access_token=access_token,
-                refresh_token=refresh_token,
-                expires_at=expires_at,
-            )
+        orm_token = _apply_tokens(db.get(ORMStravaToken, user_id), user_id, tokens)
+        db.add(orm_token)
+        db.commit()
+        _cache_put(str(user_id), tokens.get("access_token") or _dec(orm_token.access_token), orm_token.expires_at)
+    except Exception:
+        invalidate_cached_token(user_id)
+        raise
+    finally:
+        db.close()
+
+async def asave_tokens(user_id: str, tokens: dict) -> None:
+    """save_tokens for async callers."""
+    try:
+        async with AsyncSessionLocal() as db:
+            orm_token = _apply_tokens(await db.get(ORMStravaToken, user_id), user_id, tokens)
             db.add(orm_token)
-        else:
-            # Always take newest values
-            if access_token:
-                orm_token.access_token = access_token
-            if refresh_token:
-                orm_token.refresh_token = refresh_token
-            orm_token.expires_at = expires_at
+            await db.commit()
+        _cache_put(str(user_id), tokens.get("access_token") or _dec(orm_token.access_token), orm_token.expires_at)
+    except Exception:
+        invalidate_cached_token(user_id)
+        raise
+
+def _load_token(user_id: str) -> ORMStravaToken | None:
+    db: Session = SessionLocal()
+    try:
+        return db.get(ORMStravaToken, user_id)
+    finally:
+        db.close()
+
+async def _aload_token(user_id: str) -> ORMStravaToken | None:
+    async with AsyncSessionLocal() as db:
+        return await db.get(ORMStravaToken, user_id)
+
+# Single-flight load/refresh: user_id -> Future of the cache-miss lookup in progress.
+# Strava rotates the refresh token on every refresh, so concurrent refreshes for the
+# same user would race each other (duplicate POSTs, and the losing save_tokens can
+# store a refresh token that is already dead). The first caller reads the row and
+# refreshes if needed; everyone else (threads or coroutines) waits on its Future.
+# That only covers one process: across worker processes (each runs its own
+# token_refresher) the leader also claims the row in the DB before refreshing, see
+# _claim_refresh.
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+def _join_refresh(user_id: str) -> tuple[Future, bool]:
+    """(future, leader): leader=True means the caller must run _lead_refresh."""
+    with _inflight_lock:
+        fut = _inflight.get(user_id)
+        if fut is not None:
+            return fut, False
+        fut = _inflight[user_id] = Future()
+        # Running futures can't be cancelled: a waiter that gives up (e.g. a coroutine
+        # cancelled while awaiting wrap_future) must not cancel the result for the rest
+        fut.set_running_or_notify_cancel()
+        return fut, True
+
+# Cross-process claim: a conditional UPDATE on the expires_at the leader read, so
+# exactly one process sends the (single-use) refresh token. The claim is a lease:
+# the new tokens or a failed refresh clear it, a crashed process's claim lapses.
+_CLAIM_SECONDS = 30
+_CLAIM_POLL_SECONDS = 0.2
+
+def _claim_stmt(user_id: str, seen_expires_at: int, now: int):
+    return (
+        update(ORMStravaToken)
+        .where(
+            ORMStravaToken.user_id == user_id,
+            ORMStravaToken.expires_at == seen_expires_at,
+            or_(
+                ORMStravaToken.refresh_claimed_until.is_(None),
+                ORMStravaToken.refresh_claimed_until < now,
+            ),
+        )
+        .values(refresh_claimed_until=now + _CLAIM_SECONDS)
+    )
+
+def _release_stmt(user_id: str, until: int):
+    return (
+        update(ORMStravaToken)
+        .where(ORMStravaToken.user_id == user_id, ORMStravaToken.refresh_claimed_until == until)
+        .values(refresh_claimed_until=None)
+    )
+
+def _claim_refresh(user_id: str, seen_expires_at: int) -> int | None:
+    """Claim the refresh of the row we read; returns the claim (to release) or None if another process holds it."""
+    now = int(time.time())
+    db: Session = SessionLocal()
+    try:
+        claimed = db.execute(_claim_stmt(user_id, seen_expires_at, now)).rowcount == 1
+        db.commit()
+        return now + _CLAIM_SECONDS if claimed else None
+    finally:
+        db.close()
+
+async def _aclaim_refresh(user_id: str, seen_expires_at: int) -> int | None:
+    now = int(time.time())
+    async with AsyncSessionLocal() as db:
+        claimed = (await db.execute(_claim_stmt(user_id, seen_expires_at, now))).rowcount == 1
+        await db.commit()
+    return now + _CLAIM_SECONDS if claimed else None
+
+def _release_claim(user_id: str, until: int) -> None:
+    # No-op once save_tokens has cleared it
+    db: Session = SessionLocal()
+    try:
+        db.execute(_release_stmt(user_id, until))
         db.commit()
     finally:
         db.close()
 
+async def _arelease_claim(user_id: str, until: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(_release_stmt(user_id, until))
+        await db.commit()
+
+def _claim_settled(orm_token: ORMStravaToken | None, seen_expires_at: int) -> bool:
+    """The other process's refresh landed (new expires_at), failed (claim cleared) or lapsed."""
+    return (
+        orm_token is None
+        or orm_token.expires_at != seen_expires_at
+        or orm_token.refresh_claimed_until is None
+        or orm_token.refresh_claimed_until < time.time()
+    )
+
+def _usable_token(user_id: str, orm_token: ORMStravaToken | None) -> str | None:
+    if not orm_token or time.time() > orm_token.expires_at:
+        return None
+    access_token = _dec(orm_token.access_token)
+    _cache_put(user_id, access_token, orm_token.expires_at)
+    return access_token
+
+def _refresh_claimed(user_id: str, orm_token: ORMStravaToken) -> str | None:
+    seen = orm_token.expires_at
+    claim = _claim_refresh(user_id, seen)
+    if claim is None:
+        # Another process is refreshing: wait for its row instead of spending the old token
+        orm_token = _load_token(user_id)
+        while not _claim_settled(orm_token, seen):
+            time.sleep(_CLAIM_POLL_SECONDS)
+            orm_token = _load_token(user_id)
+        return _usable_token(user_id, orm_token)
+    try:
+        # Decrypt refresh token before use
+        return refresh_tokens(user_id, _dec(orm_token.refresh_token))
+    finally:
+        _release_claim(user_id, claim)
+
+async def _arefresh_claimed(user_id: str, orm_token: ORMStravaToken) -> str | None:
+    seen = orm_token.expires_at
+    claim = await _aclaim_refresh(user_id, seen)
+    if claim is None:
+        orm_token = await _aload_token(user_id)
+        while not _claim_settled(orm_token, seen):
+            await asyncio.sleep(_CLAIM_POLL_SECONDS)
+            orm_token = await _aload_token(user_id)
+        return _usable_token(user_id, orm_token)
+    try:
+        return await arefresh_tokens(user_id, _dec(orm_token.refresh_token))
+    finally:
+        await _arelease_claim(user_id, claim)
+
+def _lead_refresh(user_id: str, fut: Future, min_ttl: float = 0) -> str | None:
+    """Load the row and refresh if it expires within `min_ttl` seconds; resolves `fut`."""
+    try:
+        orm_token = _load_token(user_id)
+        if not orm_token:
+            print(f"[TOKENS] no row for user_id={user_id!r}")
+            access_token = None
+        elif time.time() + min_ttl <= orm_token.expires_at:
+            # Also the case right after another caller's refresh saved new tokens
+            access_token = _usable_token(user_id, orm_token)
+        else:
+            access_token = _refresh_claimed(user_id, orm_token)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(access_token)
+        return access_token
+    finally:
+        with _inflight_lock:
+            _inflight.pop(user_id, None)
+
+async def _alead_refresh(user_id: str, fut: Future) -> None:
+    """_lead_refresh on the event loop (async DB session + async HTTP client); resolves `fut`."""
+    try:
+        orm_token = await _aload_token(user_id)
+        if not orm_token:
+            print(f"[TOKENS] no row for user_id={user_id!r}")
+            access_token = None
+        elif time.time() <= orm_token.expires_at:
+            access_token = _usable_token(user_id, orm_token)
+        else:
+            access_token = await _arefresh_claimed(user_id, orm_token)
+    except BaseException as e:
+        fut.set_exception(e)
+    else:
+        fut.set_result(access_token)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(user_id, None)
+
+# Leader tasks of aget_access_token (a reference keeps them from being garbage-collected)
+_leader_tasks: set[asyncio.Task] = set()
+
 def get_access_token(user_id: str) -> str | None:
     """
     Return a valid access token (decrypting as needed). Refresh if expired.
     """
+    user_id = str(user_id)
+    cached = _cache_get(user_id)
+    if cached is not None:
+        return cached
+
+    fut, leader = _join_refresh(user_id)
+    if leader:
+        return _lead_refresh(user_id, fut)
+    return fut.result()
+
+async def aget_access_token(user_id: str) -> str | None:
+    """
+    get_access_token for async handlers: the lookup and refresh run on the event loop
+    (no worker thread), and coroutines waiting on another caller's refresh don't hold
+    a thread or the loop. The leader runs as its own task, so a caller that goes away
+    mid-refresh can't lose the rotated refresh token.
+    """
+    user_id = str(user_id)
+    cached = _cache_get(user_id)
+    if cached is not None:
+        return cached
+
+    fut, leader = _join_refresh(user_id)
+    if leader:
+        task = asyncio.create_task(_alead_refresh(user_id, fut))
+        _leader_tasks.add(task)
+        task.add_done_callback(_leader_tasks.discard)
+    return await asyncio.wrap_future(fut)
+
+def refresh_if_expiring(user_id: str, within_s: float) -> str | None:
+    """
+    Proactive refresh (services/token_refresher.py): refresh now if the token expires
+    within `within_s` seconds. Shares the single-flight slot with get_access_token,
+    so a page view racing the scheduler doesn't trigger a second refresh.
+    """
+    user_id = str(user_id)
+    fut, leader = _join_refresh(user_id)
+    if leader:
+        return _lead_refresh(user_id, fut, min_ttl=within_s)
+    return fut.result()
+
+def expiring_tokens(before_ts: int) -> list[tuple[str, int]]:
+    """(user_id, expires_at) for every token expiring at or before `before_ts`, soonest first."""
     db: Session = SessionLocal()
     try:
-        orm_token = db.get(ORMStravaToken, user_id)
-        if not orm_token:
-            print(f"[TOKENS] no row for user_id={user_id!r}")
-            return None
-
-        if time.time() > orm_token.expires_at:
-            # Decrypt refresh token before use
-            rtok = _dec(orm_token.refresh_token)
-            return refresh_tokens(user_id, rtok)
-        
-        return _dec(orm_token.access_token)
+        rows = db.execute(
+            select(ORMStravaToken.user_id, ORMStravaToken.expires_at)
+            .where(ORMStravaToken.expires_at <= before_ts)
+            .order_by(ORMStravaToken.expires_at)
+        ).all()
+        return [(r.user_id, r.expires_at) for r in rows]
     finally:
         db.close()
 
-def refresh_tokens(user_id: str, refresh_token: str | None) -> str | None:
-    if not refresh_token:
-        print(f"❌ No refresh token available for {user_id}")
-        return None
-
-    payload = {
+def _refresh_payload(refresh_token: str) -> dict:
+    return {
         "client_id": STRAVA_CLIENT_ID,
         "client_secret": STRAVA_CLIENT_SECRET,
         "grant_type": "refresh_token",
         "refresh_token": refresh_token,
     }
 
+def refresh_tokens(user_id: str, refresh_token: str | None) -> str | None:
+    if not refresh_token:
+        print(f"❌ No refresh token available for {user_id}")
+        return None
+
     try:
-        with httpx.Client(timeout=20.0) as client:
-            resp = client.post("https://www.strava.com/api/v3/oauth/token", data=payload)
-            resp.raise_for_status()
+        resp = get_sync_client().post(f"{STRAVA_API_BASE}/oauth/token", data=_refresh_payload(refresh_token))
+        resp.raise_for_status()
         new_tokens = resp.json()
         save_tokens(user_id, new_tokens)
         return new_tokens.get("access_token")
@@ -111,7 +395,23 @@ def refresh_tokens(user_id: str, refresh_token: str | None) -> str | None:
         print(f"❌ Failed to refresh token for {user_id}: {e}")
         return None
 
+async def arefresh_tokens(user_id: str, refresh_token: str | None) -> str | None:
+    if not refresh_token:
+        print(f"❌ No refresh token available for {user_id}")
+        return None
+
+    try:
+        resp = await get_async_client().post(f"{STRAVA_API_BASE}/oauth/token", data=_refresh_payload(refresh_token))
+        resp.raise_for_status()
+        new_tokens = resp.json()
+        await asave_tokens(user_id, new_tokens)
+        return new_tokens.get("access_token")
+    except httpx.HTTPError as e:
+        print(f"❌ Failed to refresh token for {user_id}: {e}")
+        return None
+
 def delete_tokens(user_id: str) -> None:
+    invalidate_cached_token(user_id)
     db: Session = SessionLocal()
     try:
         orm = db.get(ORMStravaToken, user_id)
@@ -119,4 +419,12 @@ def delete_tokens(user_id: str) -> None:
             db.delete(orm)
             db.commit()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def adelete_tokens(user_id: str) -> None:
+    invalidate_cached_token(user_id)
+    async with AsyncSessionLocal() as db:
+        orm = await db.get(ORMStravaToken, user_id)
+        if orm:
+            await db.delete(orm)
+            await db.commit()
\ No newline at end of file
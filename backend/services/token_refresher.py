@@ -0,0 +1,98 @@
+# backend/services/token_refresher.py
+"""
+Background refresh of Strava tokens before they expire.
+
+Without it the first page view after expiry pays for the /oauth/token round trip.
+Every TOKEN_REFRESH_INTERVAL_SECONDS the scheduler scans strava_tokens for rows
+expiring within TOKEN_REFRESH_WINDOW_SECONDS and refreshes them, at most
+TOKEN_REFRESH_CONCURRENCY at a time, each after a small random delay so a batch
+doesn't hit Strava in one burst. Refreshes go through
+token_manager.refresh_if_expiring, which shares the single-flight slot with
+request-time refreshes. Every worker process runs its own scheduler; the row claim
+in token_manager makes sure only one of them spends a given refresh token.
+
+Users whose refresh fails (revoked access, Strava down) are retried with an
+exponential backoff instead of on every scan.
+"""
+import time
+import random
+import asyncio
+import logging
+from prometheus_client import Counter, Gauge
+import backend.config as config
+from backend.services.token_manager import expiring_tokens, refresh_if_expiring
+
+logger = logging.getLogger(__name__)
+
+REFRESHES = Counter("strava_token_refresh_total", "Background Strava token refreshes", ["result"])
+UPCOMING = Gauge("strava_token_refresh_upcoming", "Tokens expiring within the refresh window at the last scan")
+LAST_RUN = Gauge("strava_token_refresh_last_run_timestamp", "Unix time of the last completed scan")
+
+_MAX_BACKOFF_SECONDS = 3600
+
+_task: asyncio.Task | None = None
+_stop: asyncio.Event | None = None
+_failures: dict[str, tuple[int, float]] = {}   # user_id -> (consecutive failures, retry not before)
+
+async def _refresh_one(user_id: str, sem: asyncio.Semaphore) -> None:
+    async with sem:
+        await asyncio.sleep(random.uniform(0, config.TOKEN_REFRESH_JITTER_SECONDS))
+        try:
+            token = await asyncio.to_thread(refresh_if_expiring, user_id, config.TOKEN_REFRESH_WINDOW_SECONDS)
+        except Exception as e:
+            logger.warning("Token refresh for user %s raised: %s", user_id, e)
+            token = None
+
+    if token:
+        REFRESHES.labels(result="done").inc()
+        _failures.pop(user_id, None)
+    else:
+        REFRESHES.labels(result="failed").inc()
+        fails = _failures.get(user_id, (0, 0.0))[0] + 1
+        delay = min(config.TOKEN_REFRESH_INTERVAL_SECONDS * 2 ** fails, _MAX_BACKOFF_SECONDS)
+        _failures[user_id] = (fails, time.time() + delay)
+
+async def run_once() -> int:
+    """One scan + refresh pass; returns how many refreshes were attempted."""
+    now = time.time()
+    due = await asyncio.to_thread(expiring_tokens, int(now + config.TOKEN_REFRESH_WINDOW_SECONDS))
+    UPCOMING.set(len(due))
+    user_ids = [uid for uid, _ in due if _failures.get(uid, (0, 0.0))[1] <= now]
+    if user_ids:
+        sem = asyncio.Semaphore(config.TOKEN_REFRESH_CONCURRENCY)
+        await asyncio.gather(*(_refresh_one(uid, sem) for uid in user_ids))
+    LAST_RUN.set(time.time())
+    return len(user_ids)
+
+async def _loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await run_once()
+        except Exception:
+            logger.exception("Token refresher scan failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=config.TOKEN_REFRESH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+def start() -> None:
+    """Start the scheduler on the running loop (called from main.lifespan)."""
+    global _task, _stop
+    if _task is not None and not _task.done():
+        return
+    _stop = asyncio.Event()
+    _task = asyncio.create_task(_loop(_stop), name="strava-token-refresher")
+
+async def stop() -> None:
+    """Stop the scheduler; an in-flight refresh is cancelled at its next await."""
+    global _task, _stop
+    task, event = _task, _stop
+    _task = _stop = None
+    if task is None:
+        return
+    event.set()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -0,0 +1,87 @@
+# backend/utils/downsample.py
+"""
+Stream decimation for plots: reduce (x, y) series to about `n_out` points.
+
+lttb    Largest-Triangle-Three-Buckets (Steinarsson 2013): per bucket, the point that
+        spans the largest triangle with the previously kept point and the next
+        bucket's average. Keeps the visual shape, including HR spikes and drops.
+        Bucket averages and areas are NumPy ops; only the walk from bucket to bucket
+        (each pick depends on the previous one) is a Python loop.
+minmax  The lowest and highest point of every bucket, in x order. Keeps every
+        bucket's extremes exactly (no peak is ever lost), at the cost of a more
+        jagged line.
+
+Both always keep the first and last point, drop non-finite samples, and return the
+input unchanged when it is already small enough. Buckets are index ranges, so `x`
+only needs to be sorted (distance/time streams are).
+"""
+import numpy as np
+
+def _finite(x, y) -> tuple[np.ndarray, np.ndarray]:
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = min(len(x), len(y))
+    x, y = x[:n], y[:n]
+    ok = np.isfinite(x) & np.isfinite(y)
+    if not ok.all():
+        x, y = x[ok], y[ok]
+    return x, y
+
+def lttb(x, y, n_out: int) -> tuple[np.ndarray, np.ndarray]:
+    x, y = _finite(x, y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # n_out - 2 buckets over the inner points; the first and last points are kept as is
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    starts, ends = edges[:-1], edges[1:]
+    # Average point of every bucket (plus the last point, the "next bucket" of the final one)
+    counts = ends - starts
+    avg_x = np.append(np.add.reduceat(x[: n - 1], starts) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[: n - 1], starts) / counts, y[-1])
+
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i, (lo, hi) in enumerate(zip(starts.tolist(), ends.tolist())):
+        ax, ay = x[a], y[a]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+        # Twice the triangle area (a, point, c); the constant factor doesn't change argmax
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+def minmax(x, y, n_out: int) -> tuple[np.ndarray, np.ndarray]:
+    x, y = _finite(x, y)
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return x, y
+
+    # Fully vectorized: pad the inner points to a (buckets, width) matrix and take the
+    # per-row argmin/argmax, ignoring the padding
+    inner = n - 2
+    buckets = (n_out - 2) // 2
+    width = -(-inner // buckets)
+    padded = np.full(buckets * width, np.nan)
+    padded[:inner] = y[1:-1]
+    rows = padded.reshape(buckets, width)
+    valid = ~np.isnan(rows).all(axis=1)
+    lo = np.nanargmin(rows[valid], axis=1)
+    hi = np.nanargmax(rows[valid], axis=1)
+    base = np.flatnonzero(valid) * width + 1
+    picked = np.unique(np.concatenate(([0], base + lo, base + hi, [n - 1])))
+    return x[picked], y[picked]
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+def downsample(x, y, n_out: int, method: str = "lttb") -> tuple[np.ndarray, np.ndarray]:
+    """Decimate with `method` ("lttb" | "minmax"); n_out <= 0 disables decimation."""
+    if n_out <= 0:
+        return _finite(x, y)
+    try:
+        fn = METHODS[method]
+    except KeyError:
+        raise ValueError(f"Unknown downsampling method {method!r} (expected one of {sorted(METHODS)})")
+    return fn(x, y, n_out)
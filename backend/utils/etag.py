@@ -0,0 +1,22 @@
+# backend/utils/etag.py
+"""Strong ETags from version counters, and If-None-Match matching (RFC 9110 §13.1.2)."""
+import hashlib
+
+def make_etag(*parts) -> str:
+    """Quoted strong ETag over `parts` (versions, user id, query parameters...)."""
+    raw = "\x1f".join("" if p is None else str(p) for p in parts)
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" matches "x"; "*" matches anything."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
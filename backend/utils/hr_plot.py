@@ -1,32 +1,73 @@
 # backend/utils/hr_plot.py
-import os
-import plotly.graph_objs as go
-import plotly.io as pio
+import hashlib
+import numpy as np
 from pathlib import Path
+import backend.config as config
+from backend.utils import plot_cache, plotly_asset
+from backend.utils.downsample import downsample
 
-filename = os.path.join(os.path.dirname(__file__), "..", "static", "hr_plot.html")
+# HR zones shaded behind the trace: label -> (low bpm, high bpm, fill colour)
+HR_ZONES = {
+    "Z1 (Recovery)": (0, 130, 'rgba(173,216,230,0.2)'),    # light blue
+    "Z2 (Easy)": (130, 144, 'rgba(144,238,144,0.2)'),       # light green
+    "Z3 (Moderate)": (145, 159, 'rgba(255,255,102,0.2)'),   # yellow
+    "Z4 (Threshold)": (160, 173, 'rgba(255,165,0,0.2)'),    # orange
+    "Z5 (VO2max)": (174, 189, 'rgba(255,99,71,0.2)')        # tomato red
+}
 
-def save_hr_plot_plotly(dist_data, hr_data, distance_km_total, filename=filename):
+# Part of every cache key: bump when the figure below changes so old plots are re-rendered
+PLOT_REVISION = 3
+
+def plot_key(dist_km: np.ndarray, hr_data: np.ndarray, distance_km_total, max_points: int, method: str) -> str:
+    """Hash of everything the plot is drawn from (streams, zones, axis range, decimation, revision)."""
+    h = hashlib.sha256()
+    h.update(f"{PLOT_REVISION}|{HR_ZONES!r}|{round(distance_km_total, 2)}|{max_points}|{method}|{len(dist_km)}|".encode())
+    h.update(np.ascontiguousarray(dist_km).tobytes())
+    h.update(np.ascontiguousarray(hr_data).tobytes())
+    return h.hexdigest()
+
+def save_hr_plot_plotly(dist_data, hr_data, distance_km_total, activity_id=None, filename=None,
+                        max_points=None, method=None):
     """
-    Saves a heart rate vs. distance plot with HR zones shaded in the background.
+    Saves a heart rate vs. distance plot with HR zones shaded in the background and
+    returns its /static URL.
+
+    Plots are cached per (activity id, streams, zone config) under static/plots/ (see
+    utils/plot_cache.py); a cache hit returns the existing file without touching
+    Plotly. An explicit `filename` bypasses the cache and always renders.
+
+    The trace is decimated to `max_points` (default PLOT_MAX_POINTS, 0 = every sample)
+    with `method` (default PLOT_DOWNSAMPLE, see utils/downsample.py).
     """
+    max_points = config.PLOT_MAX_POINTS if max_points is None else max_points
+    method = method or config.PLOT_DOWNSAMPLE
 
-    # Convert distance to km
-    dist_km = [d / 1000 for d in dist_data]
+    # Convert distance to km (streams may arrive as lists or compact NumPy arrays)
+    dist_km = np.asarray(dist_data, dtype=float) / 1000
+    hr_data = np.asarray(hr_data, dtype=float)
 
-    # Define HR zones
-    hr_zones = {
-        "Z1 (Recovery)": (0, 130, 'rgba(173,216,230,0.2)'),    # light blue
-        "Z2 (Easy)": (130, 144, 'rgba(144,238,144,0.2)'),       # light green
-        "Z3 (Moderate)": (145, 159, 'rgba(255,255,102,0.2)'),   # yellow
-        "Z4 (Threshold)": (160, 173, 'rgba(255,165,0,0.2)'),    # orange
-        "Z5 (VO2max)": (174, 189, 'rgba(255,99,71,0.2)')        # tomato red
-    }
+    if filename is None:
+        key = plot_key(dist_km, hr_data, distance_km_total, max_points, method)
+        name = f"{'plot' if activity_id is None else int(activity_id)}-{key[:24]}.html"
+        output_path = plot_cache.path_for(name)
+        url = plot_cache.lookup(output_path)
+        if url:
+            return url
+    else:
+        output_path = Path(filename)
+
+    # Plotly is only imported (a second or so, once per process) when something is drawn
+    import plotly.graph_objs as go
+    import plotly.io as pio
+
+    # Axis range from every sample; the trace gets the decimated stream
+    hr_min, hr_max = np.nanmin(hr_data), np.nanmax(hr_data)
+    plot_x, plot_y = downsample(dist_km, hr_data, max_points, method)
 
     # Heart rate trace
     hr_trace = go.Scatter(
-        x=dist_km,
-        y=hr_data,
+        x=plot_x,
+        y=plot_y,
         mode='lines',
         name='Heart Rate',
         line=dict(color='crimson', width=1.5, shape='spline', smoothing=1.3),
@@ -36,7 +77,7 @@ def save_hr_plot_plotly(dist_data, hr_data, distance_km_total, filename=filename
     # Add shaded zone backgrounds and fake traces for legends
     zone_shapes = []
     zone_legend_traces = []
-    for label, (y0, y1, color) in hr_zones.items():
+    for label, (y0, y1, color) in HR_ZONES.items():
         zone_shapes.append({
             "type": "rect",
             "xref": "paper",
@@ -63,7 +104,7 @@ def save_hr_plot_plotly(dist_data, hr_data, distance_km_total, filename=filename
     layout = go.Layout(
         title="Heart Rate vs Distance",
         xaxis=dict(title="Distance (km)", range=[0, round(distance_km_total, 2)]),
-        yaxis=dict(title="Heart Rate (bpm)", range=[min(hr_data)-5, max(hr_data)+10]),
+        yaxis=dict(title="Heart Rate (bpm)", range=[hr_min-5, hr_max+10]),
         shapes=zone_shapes,
         hovermode="closest",
         legend=dict(orientation="h", yanchor="bottom", y=-0.4),
@@ -75,27 +116,14 @@ def save_hr_plot_plotly(dist_data, hr_data, distance_km_total, filename=filename
 
     # Build figure
     fig = go.Figure(data=[hr_trace] + zone_legend_traces, layout=layout)
-   
-    output_path = Path(filename)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # plotly.js is referenced, not inlined: one shared, cacheable asset (utils/plotly_asset.py)
+    html = pio.to_html(fig, full_html=True, include_plotlyjs=plotly_asset.plotly_js_url())
 
-    # Save plot to HTML
-    pio.write_html(fig, file=filename, auto_open=False)
-
-    # Return the URL path under the FastAPI /static mount
-    # Map backend/static/... -> /static/...
-    static_root = (Path(__file__).resolve().parent.parent / "static")
+    if filename is None:
+        return plot_cache.store(output_path, html)
+    plot_cache.write_atomic(output_path, html)
     try:
-        rel = output_path.resolve().relative_to(static_root)
-        return f"/static/{rel.as_posix()}"
+        return plot_cache.url_for(output_path)
     except ValueError:
-        # Fallbacks: handle "static/..." or anything else by ensuring a leading slash
-        p = output_path.as_posix()
-        if p.startswith("static/"):
-            return "/" + p
-        return "/" + p.lstrip("/")
-
-    # NEW: return URL path for embedding
-    # convert "static/..." -> "/static/..."
-    # web_path = "/" + str(output_path).replace("\\", "/")
-    # return web_path
\ No newline at end of file
+        # Outside backend/static: best effort, ensure a leading slash
+        return "/" + output_path.as_posix().lstrip("/")
@@ -0,0 +1,120 @@
+# backend/utils/hr_svg.py
+"""
+Plotly-free HR vs distance chart: an inline <svg> string built with NumPy and string
+formatting, in a few milliseconds and without importing Plotly.
+
+Same picture as utils/hr_plot.py (HR_ZONES shaded behind a crimson HR line, same axis
+ranges and margins) minus the interactivity: no hover, zoom or pan. The trace is
+decimated to about two points per horizontal pixel (min/max, so spikes survive),
+which is all an 800 px wide chart can show. Selected with ?chart=svg or HR_CHART=svg.
+"""
+import math
+import numpy as np
+from backend.utils.downsample import minmax
+from backend.utils.hr_plot import HR_ZONES
+
+WIDTH, HEIGHT = 800, 300
+MARGIN_L, MARGIN_R, MARGIN_T, MARGIN_B = 40, 20, 40, 40
+LEGEND_H = 28
+
+_FAMILY = "font-family='ui-sans-serif, system-ui, -apple-system, Segoe UI, Roboto, Arial'"
+_FONT = f"{_FAMILY} font-size='11' fill='#444'"
+
+def _ticks(lo: float, hi: float, target: int = 6) -> np.ndarray:
+    """"Nice" tick values (1/2/5 x 10^n steps) inside [lo, hi]."""
+    span = hi - lo
+    if span <= 0:
+        return np.array([lo])
+    step = 10 ** math.floor(math.log10(span / target))
+    for m in (1, 2, 5, 10):
+        if span / (step * m) <= target:
+            step *= m
+            break
+    return np.arange(math.ceil(lo / step) * step, hi + step * 1e-9, step)
+
+def _fmt(v: float) -> str:
+    return f"{v:.0f}" if float(v).is_integer() else f"{v:g}"
+
+def render_hr_svg(dist_data, hr_data, distance_km_total, width: int = WIDTH, height: int = HEIGHT) -> str:
+    """Inline SVG of the HR plot ("" if there is nothing to draw)."""
+    dist_km = np.asarray(dist_data, dtype=float) / 1000
+    hr = np.asarray(hr_data, dtype=float)
+    n = min(len(dist_km), len(hr))
+    dist_km, hr = dist_km[:n], hr[:n]
+    ok = np.isfinite(dist_km) & np.isfinite(hr)
+    if not ok.any():
+        return ""
+    hr_min, hr_max = float(hr[ok].min()), float(hr[ok].max())
+
+    # Data -> pixel transforms, ranges as in hr_plot: x [0, total km], y [min - 5, max + 10]
+    x0, x1 = 0.0, round(float(distance_km_total), 2) or float(dist_km[ok].max()) or 1.0
+    y0, y1 = hr_min - 5, hr_max + 10
+    pw, ph = width - MARGIN_L - MARGIN_R, height - MARGIN_T - MARGIN_B
+    sx = pw / (x1 - x0)
+    sy = ph / (y1 - y0)
+
+    def px(x):
+        return MARGIN_L + (x - x0) * sx
+
+    def py(y):
+        return MARGIN_T + (y1 - y) * sy
+
+    out = [
+        f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {width} {height + LEGEND_H}' "
+        f"style='width:100%;max-width:{width}px;height:auto' role='img' aria-label='Heart rate vs distance'>",
+        f"<text x='{width / 2:.0f}' y='22' text-anchor='middle' {_FAMILY} font-size='15' fill='#222'>Heart Rate vs Distance</text>",
+        f"<clipPath id='hr-plot-area'><rect x='{MARGIN_L}' y='{MARGIN_T}' width='{pw}' height='{ph}'/></clipPath>",
+        "<g clip-path='url(#hr-plot-area)'>",
+    ]
+
+    # Plot background (Plotly's default template colour), then zone bands clipped to the y range
+    out.append(f"<rect x='{MARGIN_L}' y='{MARGIN_T}' width='{pw}' height='{ph}' fill='#e5ecf6'/>")
+    for _, (z0, z1, color) in HR_ZONES.items():
+        lo, hi = max(z0, y0), min(z1, y1)
+        if hi > lo:
+            out.append(
+                f"<rect x='{MARGIN_L}' y='{py(hi):.1f}' width='{pw}' height='{(hi - lo) * sy:.1f}' fill='{color}'/>"
+            )
+
+    # Grid
+    xt, yt = _ticks(x0, x1), _ticks(y0, y1)
+    grid = " ".join(f"M{px(v):.1f} {MARGIN_T}V{MARGIN_T + ph}" for v in xt)
+    grid += " " + " ".join(f"M{MARGIN_L} {py(v):.1f}H{MARGIN_L + pw}" for v in yt)
+    out.append(f"<path d='{grid}' stroke='#fff' stroke-width='1' fill='none' opacity='0.8'/>")
+
+    # HR trace: about two points per pixel column keeps every visible spike
+    xs, ys = minmax(dist_km[ok], hr[ok], 2 * pw)
+    coords = np.column_stack((px(xs), py(ys))).round(1)
+    points = " ".join(f"{x:g},{y:g}" for x, y in coords.tolist())
+    out.append(
+        f"<polyline points='{points}' fill='none' stroke='crimson' stroke-width='1.5' "
+        f"stroke-linejoin='round' stroke-linecap='round'/>"
+    )
+    out.append("</g>")
+
+    # Axes, tick labels and titles
+    out.append(
+        f"<path d='M{MARGIN_L} {MARGIN_T}V{MARGIN_T + ph}H{MARGIN_L + pw}' stroke='#888' fill='none'/>"
+    )
+    for v in xt:
+        out.append(f"<text x='{px(v):.1f}' y='{MARGIN_T + ph + 14}' text-anchor='middle' {_FONT}>{_fmt(v)}</text>")
+    for v in yt:
+        out.append(f"<text x='{MARGIN_L - 4}' y='{py(v) + 4:.1f}' text-anchor='end' {_FONT}>{_fmt(v)}</text>")
+    out.append(
+        f"<text x='{MARGIN_L + pw / 2:.0f}' y='{MARGIN_T + ph + 32}' text-anchor='middle' {_FONT}>Distance (km)</text>"
+    )
+    out.append(
+        f"<text transform='translate(11 {MARGIN_T + ph / 2:.0f}) rotate(-90)' text-anchor='middle' {_FONT}>Heart Rate (bpm)</text>"
+    )
+
+    # Legend row under the chart, like hr_plot's horizontal legend
+    lx, ly = MARGIN_L, height + LEGEND_H / 2
+    out.append(f"<line x1='{lx}' y1='{ly}' x2='{lx + 16}' y2='{ly}' stroke='crimson' stroke-width='2'/>")
+    out.append(f"<text x='{lx + 20}' y='{ly + 4}' {_FONT}>Heart Rate</text>")
+    lx += 100
+    for label, (_, _, color) in HR_ZONES.items():
+        out.append(f"<rect x='{lx}' y='{ly - 5}' width='10' height='10' fill='{color}' stroke='#bbb' stroke-width='0.5'/>")
+        out.append(f"<text x='{lx + 14}' y='{ly + 4}' {_FONT}>{label}</text>")
+        lx += 14 + 7 * len(label) + 12
+    out.append("</svg>")
+    return "".join(out)
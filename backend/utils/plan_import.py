@@ -0,0 +1,164 @@
+# backend/utils/plan_import.py
+"""
+Incremental parsers for training-plan imports (POST /plans/import).
+
+Both parsers take decoded text in arbitrary chunks (as it arrives from the request
+stream) and return the complete records seen so far as (line, fields) pairs, where
+`line` is the 1-based line the record starts on and `fields` maps TrainingPlan field
+names to raw strings. Validation against schemas.TrainingPlan is the caller's job.
+
+CSV: a header row naming TrainingPlan fields (case-insensitive, `date` required);
+     unknown columns, `id` and `version` are ignored, empty cells become None.
+ICS: one plan per VEVENT; DTSTART's date -> date, SUMMARY -> description,
+     DESCRIPTION -> notes. Folded lines are unfolded, text escapes undone.
+"""
+import csv
+from backend.schemas import TrainingPlan, PLAN_READONLY_FIELDS
+
+IMPORT_FIELDS = frozenset(TrainingPlan.model_fields) - PLAN_READONLY_FIELDS
+
+class ImportFormatError(ValueError):
+    """The upload as a whole can't be parsed (bad header, not an iCalendar file)."""
+
+class _LineSplitter:
+    """Chunks of text -> complete physical lines (without line endings)."""
+    def __init__(self):
+        self._tail = ""
+
+    def feed(self, text: str) -> list[str]:
+        lines = (self._tail + text).split("\n")
+        self._tail = lines.pop()
+        return [line.rstrip("\r") for line in lines]
+
+    def close(self) -> list[str]:
+        tail, self._tail = self._tail.rstrip("\r"), ""
+        return [tail] if tail else []
+
+class CsvPlanParser:
+    def __init__(self):
+        self._lines = _LineSplitter()
+        self._line_no = 0
+        self._record: list[str] = []   # physical lines of a record with an open quoted field
+        self._record_line = 0
+        self._quotes = 0
+        self._header: list[str | None] | None = None
+
+    def feed(self, text: str) -> list[tuple[int, dict]]:
+        return self._parse(self._lines.feed(text))
+
+    def close(self) -> list[tuple[int, dict]]:
+        out = self._parse(self._lines.close())
+        if self._record:   # unterminated quote: let csv make what it can of it
+            out += self._emit()
+        return out
+
+    def _parse(self, lines: list[str]) -> list[tuple[int, dict]]:
+        out = []
+        for line in lines:
+            self._line_no += 1
+            if not self._record:
+                self._record_line = self._line_no
+            self._record.append(line)
+            # A record is complete once its quotes balance (a quoted field may span lines)
+            self._quotes += line.count('"')
+            if self._quotes % 2 == 0:
+                out += self._emit()
+        return out
+
+    def _emit(self) -> list[tuple[int, dict]]:
+        text, line = "\n".join(self._record), self._record_line
+        self._record, self._quotes = [], 0
+        if not text.strip():
+            return []
+        cells = next(csv.reader([text]), [])
+        if self._header is None:
+            names = [c.strip().lower() for c in cells]
+            if "date" not in names:
+                raise ImportFormatError("CSV header must include a 'date' column")
+            self._header = [n if n in IMPORT_FIELDS else None for n in names]
+            return []
+        row = {}
+        for name, value in zip(self._header, cells):
+            if name is not None:
+                value = value.strip()
+                row[name] = value or None
+        return [(line, row)]
+
+_ICS_FIELDS = {"SUMMARY": "description", "DESCRIPTION": "notes"}
+
+def _ics_unescape(value: str) -> str:
+    out, i = [], 0
+    while i < len(value):
+        ch = value[i]
+        if ch == "\\" and i + 1 < len(value):
+            nxt = value[i + 1]
+            out.append("\n" if nxt in "nN" else nxt)
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+class IcsPlanParser:
+    def __init__(self):
+        self._lines = _LineSplitter()
+        self._line_no = 0
+        self._pending: str | None = None   # logical line still open to folded continuations
+        self._pending_line = 0
+        self._seen_calendar = False
+        self._event: dict | None = None
+        self._event_line = 0
+
+    def feed(self, text: str) -> list[tuple[int, dict]]:
+        return self._parse(self._lines.feed(text))
+
+    def close(self) -> list[tuple[int, dict]]:
+        out = self._parse(self._lines.close())
+        if self._pending is not None:
+            out += self._logical(self._pending, self._pending_line)
+            self._pending = None
+        if not self._seen_calendar:
+            raise ImportFormatError("Not an iCalendar file (no BEGIN:VCALENDAR)")
+        return out
+
+    def _parse(self, lines: list[str]) -> list[tuple[int, dict]]:
+        out = []
+        for line in lines:
+            self._line_no += 1
+            if line[:1] in (" ", "\t") and self._pending is not None:
+                self._pending += line[1:]   # RFC 5545 folding
+                continue
+            if self._pending is not None:
+                out += self._logical(self._pending, self._pending_line)
+            self._pending, self._pending_line = line, self._line_no
+        return out
+
+    def _logical(self, line: str, line_no: int) -> list[tuple[int, dict]]:
+        head, _, value = line.partition(":")
+        name = head.split(";", 1)[0].strip().upper()
+        if name == "BEGIN" and value.strip().upper() == "VCALENDAR":
+            self._seen_calendar = True
+        elif name == "BEGIN" and value.strip().upper() == "VEVENT":
+            self._event, self._event_line = {}, line_no
+        elif name == "END" and value.strip().upper() == "VEVENT" and self._event is not None:
+            event, self._event = self._event, None
+            return [(self._event_line, event)]
+        elif self._event is not None:
+            if name == "DTSTART":
+                d = value.strip()[:8]   # DATE or DATE-TIME; the plan keeps the calendar day
+                self._event["date"] = f"{d[:4]}-{d[4:6]}-{d[6:8]}" if len(d) == 8 and d.isdigit() else value.strip()
+            elif name in _ICS_FIELDS:
+                self._event[_ICS_FIELDS[name]] = _ics_unescape(value).strip() or None
+        return []
+
+def parser_for(fmt: str) -> CsvPlanParser | IcsPlanParser:
+    return IcsPlanParser() if fmt == "ics" else CsvPlanParser()
+
+def sniff_format(content_type: str | None, first_text: str) -> str:
+    """'csv' | 'ics' from the Content-Type, else from the first bytes of the upload."""
+    ctype = (content_type or "").split(";", 1)[0].strip().lower()
+    if ctype == "text/calendar":
+        return "ics"
+    if ctype in ("text/csv", "application/csv"):
+        return "csv"
+    return "ics" if first_text.lstrip().upper().startswith("BEGIN:VCALENDAR") else "csv"
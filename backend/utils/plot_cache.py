@@ -0,0 +1,114 @@
+# backend/utils/plot_cache.py
+"""
+Content-addressed cache of rendered plots under backend/static/plots/.
+
+A plot's file name is derived from everything that goes into it (activity id plus a
+hash of the streams, zone config and renderer revision, see utils/hr_plot.py), so a
+cached file never changes: a hit is a stat() instead of a render, and the /static URL
+can be served with immutable cache headers (utils/static_files.py).
+
+Writes go to a temp file in the same directory and are os.replace()d into place, so
+concurrent renders of the same plot never expose a half-written file. After each write
+files unused for PLOT_CACHE_MAX_AGE_DAYS are removed, then the least recently used
+ones until the directory is under PLOT_CACHE_MAX_MB (hits refresh a file's mtime).
+"""
+import os
+import time
+import logging
+import tempfile
+import threading
+from pathlib import Path
+import backend.config as config
+
+logger = logging.getLogger(__name__)
+
+STATIC_ROOT = Path(__file__).resolve().parent.parent / "static"
+CACHE_DIR = STATIC_ROOT / "plots"
+
+_TMP_SUFFIX = ".tmp"
+_evict_lock = threading.Lock()
+
+def path_for(name: str) -> Path:
+    return CACHE_DIR / name
+
+def url_for(path: Path) -> str:
+    """/static/... URL of a file under backend/static."""
+    return f"/static/{path.resolve().relative_to(STATIC_ROOT).as_posix()}"
+
+def lookup(path: Path) -> str | None:
+    """URL of the cached file, or None on a miss. Hits count as a use for eviction."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return url_for(path)
+
+def write_atomic(path: Path, data: str | bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=_TMP_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def store(path: Path, data: str | bytes) -> str:
+    """Write a plot into the cache, trim the cache, and return the plot's URL."""
+    write_atomic(path, data)
+    evict()
+    return url_for(path)
+
+def evict(now: float | None = None) -> int:
+    """Apply the age and size limits; returns how many files were removed."""
+    if not _evict_lock.acquire(blocking=False):
+        return 0   # another thread is already trimming
+    try:
+        now = time.time() if now is None else now
+        max_age = config.PLOT_CACHE_MAX_AGE_DAYS * 24 * 3600
+        max_bytes = config.PLOT_CACHE_MAX_MB * 1024 * 1024
+        files = []
+        try:
+            entries = list(os.scandir(CACHE_DIR))
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            if not entry.is_file():
+                continue
+            # Leftover temp files (a render that crashed mid-write) go after a minute
+            stale = now - st.st_mtime > (60 if entry.name.endswith(_TMP_SUFFIX) else max_age)
+            if stale and _unlink(entry.path):
+                removed += 1
+            elif not stale and not entry.name.endswith(_TMP_SUFFIX):
+                files.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, file_path in sorted(files):
+            if total <= max_bytes:
+                break
+            if _unlink(file_path):
+                removed += 1
+            total -= size
+        return removed
+    finally:
+        _evict_lock.release()
+
+def _unlink(path: str) -> bool:
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning("Plot cache: could not remove %s: %s", path, e)
+        return False
@@ -0,0 +1,55 @@
+# backend/utils/plotly_asset.py
+"""
+The plotly.js bundle as one shared static asset, instead of inlined into every plot.
+
+On the first plot render of a process the bundle shipped with the installed plotly
+package is written to static/vendor/plotly-<plotly version>-<hash>.min.js, next to
+.gz (always) and .br (when the optional `brotli` package is installed) variants.
+The name changes with the content, so /static serves it immutable and picks a
+precompressed variant per Accept-Encoding (utils/static_files.py). Plot files then
+just reference it (include_plotlyjs=<url>) and shrink from megabytes to kilobytes.
+"""
+import gzip
+import hashlib
+import threading
+from backend.utils import plot_cache
+
+try:
+    import brotli
+except ImportError:   # optional: gzip-only
+    brotli = None
+
+VENDOR_DIR = plot_cache.STATIC_ROOT / "vendor"
+
+_lock = threading.Lock()
+_url: str | None = None
+
+def plotly_js_url() -> str:
+    """/static URL of the plotly.js bundle, writing it (and its variants) if needed."""
+    global _url
+    if _url is not None:
+        return _url
+    with _lock:
+        if _url is None:
+            _url = _ensure_bundle()
+    return _url
+
+def _ensure_bundle() -> str:
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    data = get_plotlyjs().encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    path = VENDOR_DIR / f"plotly-{plotly.__version__}-{digest}.min.js"
+    # Variants first: whoever sees the .js also finds them
+    variants = [(".gz", lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        # Quality 9: ~0.6 s once per plotly version; 11 saves 10% more but takes ~15 s on a page view
+        variants.append((".br", lambda: brotli.compress(data, mode=brotli.MODE_TEXT, quality=9)))
+    for suffix, compress in variants:
+        variant = path.with_name(path.name + suffix)
+        if not variant.exists():
+            plot_cache.write_atomic(variant, compress())
+    if not path.exists():
+        plot_cache.write_atomic(path, data)
+    return plot_cache.url_for(path)
@@ -0,0 +1,92 @@
+# backend/utils/splits.py
+"""
+Vectorized per-split heart-rate statistics over the distance stream.
+
+Samples are bucketed by floor(distance / split_length); bucket boundaries come from
+np.searchsorted on the (monotonic) bucket index, and max / sum / weighted sum per
+split from ufunc.reduceat, so the whole thing is a handful of O(n) NumPy passes.
+"""
+from typing import NamedTuple
+import numpy as np
+
+SPLIT_LENGTHS_M = {
+    "km": 1000.0,
+    "mile": 1609.344,
+    "5k": 5000.0,
+}
+
+class SplitHR(NamedTuple):
+    max: np.ndarray            # per split; NaN where the split has no samples
+    mean: np.ndarray           # plain sample mean
+    time_weighted: np.ndarray  # weighted by the time each sample covers (= mean without a time stream)
+    count: np.ndarray          # samples per split
+
+def split_length_m(split: str | float) -> float:
+    """'km' | 'mile' | '5k' | a number of meters."""
+    if isinstance(split, str) and split in SPLIT_LENGTHS_M:
+        return SPLIT_LENGTHS_M[split]
+    length = float(split)
+    if length <= 0:
+        raise ValueError(f"Split length must be positive, got {split!r}")
+    return length
+
+def split_hr_stats(
+    dist_m,
+    hr,
+    *,
+    split_m: float = 1000.0,
+    time_s=None,
+    n_splits: int | None = None,
+    max_gap_s: float | None = 30.0,
+) -> SplitHR:
+    """
+    HR statistics per split of `split_m` meters.
+
+    `n_splits` fixes the number of splits returned (e.g. len(splits_metric));
+    samples past the last split are ignored. By default it covers the whole stream.
+    With a `time_s` stream, each sample is weighted by the seconds until the next
+    sample, capped at `max_gap_s` so auto-pauses don't dominate the average.
+    """
+    n = min(len(dist_m), len(hr))
+    dist = np.asarray(dist_m, dtype=np.float64)[:n]
+    hr = np.asarray(hr, dtype=np.float64)[:n]
+
+    # Bucket index per sample; distance should never decrease, but GPS glitches happen
+    idx = np.maximum.accumulate(np.floor(dist / split_m).astype(np.int64)) if n else np.zeros(0, np.int64)
+    np.maximum(idx, 0, out=idx)
+    if n_splits is None:
+        n_splits = int(idx[-1]) + 1 if n else 0
+
+    buckets = np.arange(n_splits)
+    starts = np.searchsorted(idx, buckets, side="left")
+    ends = np.searchsorted(idx, buckets, side="right")
+    count = ends - starts
+    nonempty = count > 0
+    seg_starts = starts[nonempty]
+    limit = int(ends[-1]) if n_splits else 0   # drop samples beyond the last split
+
+    max_ = np.full(n_splits, np.nan)
+    mean = np.full(n_splits, np.nan)
+    weighted = np.full(n_splits, np.nan)
+    if seg_starts.size:
+        hr_in = hr[:limit]
+        max_[nonempty] = np.maximum.reduceat(hr_in, seg_starts)
+        sums = np.add.reduceat(hr_in, seg_starts)
+        mean[nonempty] = sums / count[nonempty]
+
+        if time_s is not None and len(time_s) >= n:
+            t = np.asarray(time_s, dtype=np.float64)[:n]
+            dt = np.diff(t, append=t[-1])
+            if n > 1:
+                dt[-1] = dt[-2]
+            if max_gap_s is not None:
+                np.clip(dt, 0.0, max_gap_s, out=dt)
+            dt = dt[:limit]
+            w_sum = np.add.reduceat(dt, seg_starts)
+            hw_sum = np.add.reduceat(hr_in * dt, seg_starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                weighted[nonempty] = np.where(w_sum > 0, hw_sum / w_sum, mean[nonempty])
+        else:
+            weighted[nonempty] = mean[nonempty]
+
+    return SplitHR(max=max_, mean=mean, time_weighted=weighted, count=count)
@@ -0,0 +1,56 @@
+# backend/utils/static_files.py
+"""
+StaticFiles that marks content-addressed subtrees (file names change with content)
+immutable, and serves precompressed `<file>.br` / `<file>.gz` siblings to clients
+that accept them (see utils/plotly_asset.py).
+"""
+import os
+import anyio
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Preference order when the client accepts several
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+class CachedStaticFiles(StaticFiles):
+    def __init__(self, *args, immutable_prefixes: tuple[str, ...] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable_prefixes = tuple(p.strip("/") + "/" for p in immutable_prefixes)
+
+    async def get_response(self, path: str, scope):
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304) and path.replace("\\", "/").startswith(self.immutable_prefixes):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    async def _precompressed_response(self, path: str, scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            return None
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, suffix in _PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None or not os.path.isfile(full_path):
+                continue
+            # Content-Type comes out right: guess_type("x.js.br") is ("text/javascript", "br")
+            response = self.file_response(full_path, stat_result, scope)
+            if response.status_code == 200:
+                response.headers["Content-Encoding"] = encoding
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+        return None
+
+def _accepted_encodings(header: str) -> set[str]:
+    out = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            out.add(name.strip().lower())
+    return out
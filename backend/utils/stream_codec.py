@@ -0,0 +1,85 @@
+# backend/utils/stream_codec.py
+"""
+Compact binary encoding for activity streams stored in activity_streams.payload.
+
+Each stream type gets a fixed little-endian NumPy dtype, optionally delta-encoded:
+  heartrate -> uint8                 (1 byte/sample)
+  distance  -> float32 deltas        (4 bytes/sample, monotonic so deltas are small)
+  time      -> uint32 deltas         (seconds)
+Anything unknown falls back to float32.
+
+decode() wraps the stored bytes with np.frombuffer, so plain (non-delta) streams are
+zero-copy views over the BLOB; delta streams need one cumulative sum.
+"""
+import numpy as np
+
+# stream_type -> (storage dtype, delta-encoded)
+CODECS: dict[str, tuple[str, bool]] = {
+    "heartrate": ("<u1", False),
+    "cadence": ("<u1", False),
+    "distance": ("<f4", True),
+    "time": ("<u4", True),
+    "altitude": ("<f4", False),
+    "velocity_smooth": ("<f4", False),
+    "watts": ("<u2", False),
+    "temp": ("<i1", False),
+}
+_DEFAULT = ("<f4", False)
+
+def _codec(stream_type: str) -> tuple[str, bool]:
+    return CODECS.get(stream_type, _DEFAULT)
+
+def to_array(stream_type: str, data) -> np.ndarray:
+    """In-memory representation used by the app (same values decode() returns)."""
+    dtype, delta = _codec(stream_type)
+    if delta:
+        return np.asarray(data if data is not None else [], dtype=np.float64)
+    info = np.iinfo(dtype) if np.dtype(dtype).kind in "iu" else None
+    arr = np.asarray(data if data is not None else [], dtype=np.float64)
+    if info is not None:
+        arr = np.clip(np.rint(arr), info.min, info.max)
+    return arr.astype(dtype)
+
+def encode(stream_type: str, data) -> tuple[bytes, str]:
+    """Return (payload, encoding) for a stream given as a list or array."""
+    dtype, delta = _codec(stream_type)
+    arr = np.asarray(data if data is not None else [], dtype=np.float64)
+    if delta:
+        arr = np.diff(arr, prepend=0.0)
+        if np.dtype(dtype).kind == "u":
+            arr = np.clip(np.rint(arr), 0, None)
+        return arr.astype(dtype).tobytes(), f"{dtype}+delta"
+    return to_array(stream_type, arr).tobytes(), dtype
+
+def decode(payload: bytes, encoding: str) -> np.ndarray:
+    """Inverse of encode(); zero-copy for non-delta encodings (read-only view)."""
+    dtype, _, transform = encoding.partition("+")
+    arr = np.frombuffer(memoryview(payload), dtype=dtype)
+    if transform == "delta":
+        return np.cumsum(arr, dtype=np.float64)
+    return arr
+
+def decode_range(payload: bytes, encoding: str, start: int, stop: int, anchors=None, base: int = 1) -> np.ndarray:
+    """
+    decode(payload, encoding)[start:stop] without decoding the rest: a zero-copy slice for
+    plain encodings; delta streams are summed from the nearest anchor at or before
+    `start` (anchors[i] = value at sample i * base, see utils/stream_pyramid.py).
+    """
+    dtype, _, transform = encoding.partition("+")
+    itemsize = np.dtype(dtype).itemsize
+    length = len(payload) // itemsize
+    start, stop = max(start, 0), min(stop, length)
+    if stop <= start:
+        return np.empty(0, dtype=np.float64 if transform == "delta" else dtype)
+    buf = memoryview(payload)
+    if transform != "delta":
+        return np.frombuffer(buf, dtype=dtype, count=stop - start, offset=start * itemsize)
+    if anchors is None:
+        return decode(payload, encoding)[start:stop]
+    first = (start // base) * base
+    deltas = np.frombuffer(buf, dtype=dtype, count=stop - first - 1, offset=(first + 1) * itemsize)
+    values = np.empty(stop - first, dtype=np.float64)
+    values[0] = anchors[start // base]
+    np.cumsum(deltas, dtype=np.float64, out=values[1:])
+    values[1:] += values[0]
+    return values[start - first:]
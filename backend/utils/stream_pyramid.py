@@ -0,0 +1,167 @@
+# backend/utils/stream_pyramid.py
+"""
+Min/max pyramids over activity streams, for zoomable charts (GET /activities/{id}/streams).
+
+Level 0 splits a stream into buckets of BASE samples and keeps each bucket's min and
+max; every next level merges FANOUT buckets of the previous one, up to a single
+bucket. A view of any sample range at any point budget is then a slice of one level
+(or of the raw stream when the range is small enough), so a zoom request costs
+O(points returned) instead of a pass over the whole stream.
+
+Blob layout (little-endian), stored in activity_streams.pyramid:
+    header  "PYR1", uint32 length, uint16 base, uint16 fanout, uint16 levels, uint16 flags
+    anchors float64[ceil(length / base)]   (flags & ANCHORS) value at every level-0
+                                           bucket start, so delta-encoded streams can be
+                                           decoded from the nearest bucket (decode_range)
+    levels  float32 min[n_l], float32 max[n_l] for l = 0 .. levels - 1
+For a monotonic stream (distance, time) min/max are a bucket's first/last value, which
+is what maps an x range to sample indices (index_range).
+"""
+import struct
+import numpy as np
+from backend.utils import stream_codec
+
+BASE = 16
+FANOUT = 4
+ANCHORS = 0x1
+
+_MAGIC = b"PYR1"
+_HEADER = struct.Struct("<4sIHHHH")
+
+class Pyramid:
+    def __init__(self, length: int, base: int, fanout: int, mins: list, maxs: list, anchors=None):
+        self.length = length
+        self.base = base
+        self.fanout = fanout
+        self.mins = mins          # per level, float32 arrays
+        self.maxs = maxs
+        self.anchors = anchors    # float64 array or None
+
+    def bucket_size(self, level: int) -> int:
+        return self.base * self.fanout ** level
+
+def _reduce(values: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Per-bucket (min, max) of `values` in buckets of `size`, last bucket padded with its edge."""
+    buckets = -(-len(values) // size)
+    padded = np.pad(values, (0, buckets * size - len(values)), mode="edge")
+    rows = padded.reshape(buckets, size)
+    return rows.min(axis=1), rows.max(axis=1)
+
+def build(values, anchors: bool = False) -> Pyramid:
+    """Pyramid of a decoded stream (what stream_codec.decode returns)."""
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    mins, maxs = [], []
+    if n:
+        lo, hi = _reduce(values, BASE)
+        mins.append(lo.astype(np.float32))
+        maxs.append(hi.astype(np.float32))
+        while len(lo) > 1:
+            lo, _ = _reduce(lo, FANOUT)
+            _, hi = _reduce(hi, FANOUT)
+            mins.append(lo.astype(np.float32))
+            maxs.append(hi.astype(np.float32))
+    return Pyramid(n, BASE, FANOUT, mins, maxs, values[::BASE].copy() if anchors and n else None)
+
+def dumps(pyr: Pyramid) -> bytes:
+    flags = ANCHORS if pyr.anchors is not None else 0
+    parts = [_HEADER.pack(_MAGIC, pyr.length, pyr.base, pyr.fanout, len(pyr.mins), flags)]
+    if pyr.anchors is not None:
+        parts.append(pyr.anchors.astype("<f8").tobytes())
+    for lo, hi in zip(pyr.mins, pyr.maxs):
+        parts.append(lo.astype("<f4").tobytes())
+        parts.append(hi.astype("<f4").tobytes())
+    return b"".join(parts)
+
+def loads(blob: bytes) -> Pyramid:
+    """Parse a stored pyramid; the level arrays are zero-copy views over the blob."""
+    buf = memoryview(blob)
+    magic, n, base, fanout, levels, flags = _HEADER.unpack_from(buf)
+    if magic != _MAGIC:
+        raise ValueError("not a stream pyramid")
+    offset = _HEADER.size
+    anchors = None
+    if flags & ANCHORS:
+        count = -(-n // base)
+        anchors = np.frombuffer(buf, dtype="<f8", count=count, offset=offset)
+        offset += count * 8
+    mins, maxs = [], []
+    size = base
+    for _ in range(levels):
+        count = -(-n // size)
+        mins.append(np.frombuffer(buf, dtype="<f4", count=count, offset=offset))
+        offset += count * 4
+        maxs.append(np.frombuffer(buf, dtype="<f4", count=count, offset=offset))
+        offset += count * 4
+        size *= fanout
+    return Pyramid(n, base, fanout, mins, maxs, anchors)
+
+def index_range(x: Pyramid, x_from: float | None, x_to: float | None) -> tuple[int, int]:
+    """
+    Sample range [start, stop) of a monotonic x stream covering [x_from, x_to], widened
+    to level-0 bucket edges (O(log n)). Trim exactly once the samples are decoded.
+    """
+    if not x.length:
+        return 0, 0
+    firsts = x.anchors if x.anchors is not None else x.mins[0]
+    start, stop = 0, x.length
+    if x_from is not None:
+        start = max(int(np.searchsorted(firsts, x_from, side="right")) - 1, 0) * x.base
+    if x_to is not None:
+        stop = min(int(np.searchsorted(firsts, x_to, side="right")) * x.base, x.length)
+    return start, max(start, stop)
+
+def choose_level(pyr: Pyramid, start: int, stop: int, max_points: int) -> int | None:
+    """
+    Coarsest detail that fits: None when the raw samples fit in `max_points`, else the
+    finest level whose buckets in range, as min/max pairs, fit.
+    """
+    if stop - start <= max_points:
+        return None
+    for level in range(len(pyr.mins)):
+        size = pyr.bucket_size(level)
+        if 2 * (-(-stop // size) - start // size) <= max_points:
+            return level
+    return len(pyr.mins) - 1
+
+def bucket_slice(pyr: Pyramid, level: int, start: int, stop: int) -> tuple[np.ndarray, np.ndarray]:
+    """(mins, maxs) of the level-`level` buckets overlapping samples [start, stop)."""
+    size = pyr.bucket_size(level)
+    lo, hi = start // size, -(-stop // size)
+    return pyr.mins[level][lo:hi], pyr.maxs[level][lo:hi]
+
+def window(streams: dict[str, dict], x_type: str, x_from: float | None, x_to: float | None,
+           max_points: int) -> tuple[int, dict[str, np.ndarray]]:
+    """
+    The view of `streams` (activity_store.load_streams output, must include `x_type`)
+    over [x_from, x_to] in at most `max_points` points: (resolution, columns).
+
+    resolution 1: raw samples trimmed exactly to the range, columns {type: values}.
+    resolution s: level buckets of s samples, columns {"type.min": ..., "type.max": ...};
+                  for the x stream these are each bucket's first and last x.
+    """
+    x = streams[x_type]["pyramid"]
+    n = min(s["length"] for s in streams.values())
+    start, stop = index_range(x, x_from, x_to)
+    stop = min(stop, n)
+    level = choose_level(x, start, stop, max_points)
+    columns = {}
+    if level is None:
+        xs = stream_codec.decode_range(
+            streams[x_type]["payload"], streams[x_type]["encoding"], start, stop, x.anchors, x.base
+        )
+        lo = int(np.searchsorted(xs, x_from, side="left")) if x_from is not None else 0
+        hi = int(np.searchsorted(xs, x_to, side="right")) if x_to is not None else len(xs)
+        columns[x_type] = xs[lo:hi]
+        for stype, s in streams.items():
+            if stype != x_type:
+                pyr = s["pyramid"]
+                columns[stype] = stream_codec.decode_range(
+                    s["payload"], s["encoding"], start + lo, start + hi, pyr.anchors, pyr.base
+                )
+        return 1, columns
+    for stype in [x_type] + [t for t in streams if t != x_type]:
+        mins, maxs = bucket_slice(streams[stype]["pyramid"], level, start, stop)
+        columns[f"{stype}.min"], columns[f"{stype}.max"] = mins, maxs
+    count = min(len(c) for c in columns.values())   # streams of unequal length: common prefix
+    return x.bucket_size(level), {name: c[:count] for name, c in columns.items()}
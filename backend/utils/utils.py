@@ -54,6 +54,13 @@ def format_date(date_str, fmt="%a, %d %b %Y – %H:%M", default="N/A"):
     except (TypeError, ValueError):
         return default
     
+def iso_to_epoch(date_str, default=None):
+    """'2025-07-27T08:34:12Z' -> Unix seconds (default on failure)."""
+    try:
+        return int(datetime.fromisoformat(date_str.replace("Z", "+00:00")).timestamp())
+    except (AttributeError, TypeError, ValueError):
+        return default
+
 def format_pace(time_seconds, distance_km, default="N/A"):
     """
     Returns a formatted pace string (min:sec per km) given total time in seconds and distance in km.
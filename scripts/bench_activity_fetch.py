@@ -0,0 +1,96 @@
+"""
+Benchmark: sequential vs concurrent Strava fetches for /activity_feedback.
+
+Starts a local Strava stub (stdlib HTTP server, fixed latency per call) and times
+the old one-after-another detail/streams/laps fetches against
+strava_api.fetch_activity_bundle.
+
+    python scripts/bench_activity_fetch.py [--latency 0.15] [--rounds 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+LATENCY = 0.15
+
+
+class StravaStub(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/streams"):
+            body = {"heartrate": {"data": [140] * 5000}, "distance": {"data": [i * 2.0 for i in range(5000)]}}
+        elif path.endswith("/laps"):
+            body = [{"distance": 1000.0, "moving_time": 300}]
+        else:
+            body = {"id": 1, "name": "Stub run", "distance": 10000.0, "splits_metric": []}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+async def sequential(access_token, activity_id):
+    from backend.services.strava_api import get_json, STREAM_KEYS
+    activity = await get_json(access_token, f"/activities/{activity_id}")
+    streams = await get_json(
+        access_token, f"/activities/{activity_id}/streams",
+        params={"keys": STREAM_KEYS, "key_by_type": True},
+    )
+    laps = await get_json(access_token, f"/activities/{activity_id}/laps")
+    return activity, streams, laps
+
+
+async def bench(fn, rounds):
+    from backend.services.strava_http import open_clients, close_clients
+    await open_clients()
+    times = []
+    try:
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            await fn("stub-token", 1)
+            times.append(time.perf_counter() - t0)
+    finally:
+        await close_clients()
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    global LATENCY
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=LATENCY, help="stub latency per call, seconds")
+    ap.add_argument("--rounds", type=int, default=10)
+    args = ap.parse_args()
+    LATENCY = args.latency
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StravaStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["STRAVA_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    from backend.services.strava_api import fetch_activity_bundle
+
+    seq = asyncio.run(bench(sequential, args.rounds))
+    con = asyncio.run(bench(fetch_activity_bundle, args.rounds))
+    server.shutdown()
+
+    print(f"stub latency per call : {LATENCY * 1000:.0f} ms")
+    print(f"sequential (median)   : {seq * 1000:.0f} ms")
+    print(f"concurrent (median)   : {con * 1000:.0f} ms")
+    print(f"speed-up              : {seq / con:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
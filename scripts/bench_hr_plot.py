@@ -0,0 +1,116 @@
+"""
+Render-time and file-size benchmark for the HR plot (utils/hr_plot.py) with and without
+stream decimation (utils/downsample.py), and against the Plotly-free SVG renderer
+(utils/hr_svg.py).
+
+Builds a synthetic marathon stream (default 40k samples: ~1 Hz over 42.2 km, with
+cardiac drift, surges and sensor noise), then renders it with every decimation method
+and point budget, bypassing the plot cache. Reports the decimation time, the full
+render time (median of --repeat runs) and the size of the written HTML file. The last
+section compares the default Plotly path with the SVG one, including what the first
+chart costs in a fresh worker (imports, Plotly's lazy validators).
+
+    python scripts/bench_hr_plot.py [--samples 40000] [--points 0,5000,2000,1000] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np  # noqa: E402
+
+from backend.utils.downsample import METHODS, downsample  # noqa: E402
+from backend.utils.hr_plot import save_hr_plot_plotly  # noqa: E402
+from backend.utils.hr_svg import render_hr_svg  # noqa: E402
+
+
+def marathon_stream(samples, distance_m=42195.0, seed=0):
+    """(distance m, HR bpm) arrays shaped like a real run, stored the way the store decodes them."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, samples)
+    dist = np.cumsum(rng.uniform(0.8, 1.2, samples))
+    dist *= distance_m / dist[-1]
+    hr = 135 + 25 * t                                   # cardiac drift
+    hr += 6 * np.sin(t * 60 * np.pi)                    # rolling terrain
+    hr += 12 * ((t * 40) % 1 < 0.03)                    # surges
+    hr += rng.normal(0, 2.5, samples)                   # sensor noise
+    hr[: samples // 50] -= np.linspace(40, 0, samples // 50)   # warm-up
+    return dist, np.clip(hr, 60, 205).astype(np.uint8)
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        runs.append(time.perf_counter() - t0)
+    return out, statistics.median(runs) * 1000
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+COLD_RENDER = {
+    "plotly": "from backend.utils.hr_plot import save_hr_plot_plotly as f; "
+              "f(np.arange(100.0), np.full(100, 140.0), 0.1, filename=sys.argv[1])",
+    "svg": "from backend.utils.hr_svg import render_hr_svg as f; f(np.arange(100.0), np.full(100, 140.0), 0.1)",
+}
+
+
+def cold_render_ms(renderer, tmp):
+    """First (tiny) chart in a fresh interpreter: imports included, what a new worker pays once."""
+    code = (f"import sys, time; sys.path.insert(0, {ROOT!r}); import numpy as np; t = time.perf_counter(); "
+            f"{COLD_RENDER[renderer]}; print((time.perf_counter() - t) * 1000)")
+    out = subprocess.run([sys.executable, "-c", code, os.path.join(tmp, "cold.html")],
+                         capture_output=True, text=True, check=True).stdout
+    return float(out)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--samples", type=int, default=40000)
+    ap.add_argument("--points", default="0,5000,2000,1000", help="point budgets to compare (0 = every sample)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    budgets = [int(p) for p in args.points.split(",")]
+
+    dist, hr = marathon_stream(args.samples)
+    distance_km = dist[-1] / 1000
+    print(f"{args.samples} samples, {distance_km:.1f} km, HR {hr.min()}-{hr.max()} bpm")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm-up: imports Plotly and writes the shared plotly.js bundle once
+        save_hr_plot_plotly(dist[:100], hr[:100], 0.1, filename=os.path.join(tmp, "warmup.html"))
+
+        print(f"\n{'method':8} {'points':>7} {'kept':>7} {'peak':>5} {'decimate':>10} {'render':>10} {'file':>10}")
+        for method in METHODS:
+            for budget in budgets:
+                if budget == 0 and method != next(iter(METHODS)):
+                    continue   # "every sample" is the same for all methods
+                (xs, ys), dec_ms = timed(lambda: downsample(dist / 1000, hr, budget, method), args.repeat)
+                path = os.path.join(tmp, f"{method}-{budget}.html")
+                _, render_ms = timed(
+                    lambda: save_hr_plot_plotly(dist, hr, distance_km, filename=path, max_points=budget, method=method),
+                    args.repeat,
+                )
+                label = method if budget else "raw"
+                print(f"{label:8} {budget or args.samples:7} {len(xs):7} {int(ys.max()):5} "
+                      f"{dec_ms:8.2f}ms {render_ms:8.1f}ms {os.path.getsize(path) / 1024:8.0f}KB")
+
+        # Default settings, Plotly vs SVG
+        path = os.path.join(tmp, "default.html")
+        _, plotly_ms = timed(lambda: save_hr_plot_plotly(dist, hr, distance_km, filename=path), args.repeat)
+        svg, svg_ms = timed(lambda: render_hr_svg(dist, hr, distance_km), args.repeat)
+        print(f"\n{'renderer':8} {'render':>9} {'output':>14} {'cold start':>11}")
+        print(f"{'plotly':8} {plotly_ms:7.1f}ms {os.path.getsize(path) / 1024:7.0f}KB file "
+              f"{cold_render_ms('plotly', tmp):9.0f}ms   (+ shared plotly.js, once per browser)")
+        print(f"{'svg':8} {svg_ms:7.1f}ms {len(svg.encode()) / 1024:5.0f}KB inline "
+              f"{cold_render_ms('svg', tmp):9.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: JSON-list vs compact binary storage of HR/distance streams.
+
+Builds a synthetic marathon (one sample per second, ~4 h) and reports
+  - in-process memory of the streams as Python lists vs NumPy arrays
+  - on-disk SQLite size for JSON text columns vs encoded BLOB columns
+  - decode time for both formats
+
+    python scripts/bench_stream_storage.py [--samples 14400] [--activities 50]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.utils import stream_codec  # noqa: E402
+
+
+def synthetic_streams(n, seed=0):
+    rng = np.random.default_rng(seed)
+    hr = np.clip(135 + np.cumsum(rng.normal(0, 0.4, n)), 95, 195).round().astype(int).tolist()
+    dist = np.cumsum(rng.uniform(2.6, 3.2, n)).round(1).tolist()
+    return hr, dist
+
+
+def list_bytes(values):
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+
+
+def db_size(rows, schema, insert):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        con = sqlite3.connect(path)
+        con.execute(schema)
+        con.executemany(insert, rows)
+        con.commit()
+        con.execute("VACUUM")
+        con.close()
+        return os.path.getsize(path)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--samples", type=int, default=4 * 3600)
+    ap.add_argument("--activities", type=int, default=50)
+    args = ap.parse_args()
+
+    hr, dist = synthetic_streams(args.samples)
+
+    mem_lists = list_bytes(hr) + list_bytes(dist)
+    hr_arr = stream_codec.to_array("heartrate", hr)
+    dist_arr = stream_codec.to_array("distance", dist)
+    mem_arrays = hr_arr.nbytes + dist_arr.nbytes
+
+    hr_json, dist_json = json.dumps(hr), json.dumps(dist)
+    hr_blob, hr_enc = stream_codec.encode("heartrate", hr)
+    dist_blob, dist_enc = stream_codec.encode("distance", dist)
+
+    json_rows, blob_rows = [], []
+    for i in range(args.activities):
+        json_rows += [(i, "heartrate", hr_json), (i, "distance", dist_json)]
+        blob_rows += [(i, "heartrate", hr_enc, hr_blob), (i, "distance", dist_enc, dist_blob)]
+    size_json = db_size(
+        json_rows,
+        "CREATE TABLE s (activity_id INTEGER, stream_type TEXT, data TEXT, PRIMARY KEY (activity_id, stream_type))",
+        "INSERT INTO s VALUES (?, ?, ?)",
+    )
+    size_blob = db_size(
+        blob_rows,
+        "CREATE TABLE s (activity_id INTEGER, stream_type TEXT, encoding TEXT, payload BLOB, PRIMARY KEY (activity_id, stream_type))",
+        "INSERT INTO s VALUES (?, ?, ?, ?)",
+    )
+
+    t0 = time.perf_counter()
+    for _ in range(20):
+        json.loads(hr_json), json.loads(dist_json)
+    t_json = (time.perf_counter() - t0) / 20
+    t0 = time.perf_counter()
+    for _ in range(20):
+        stream_codec.decode(hr_blob, hr_enc), stream_codec.decode(dist_blob, dist_enc)
+    t_blob = (time.perf_counter() - t0) / 20
+
+    max_err = float(np.abs(stream_codec.decode(dist_blob, dist_enc) - np.asarray(dist)).max())
+
+    print(f"samples per stream        : {args.samples}")
+    print(f"memory  lists / arrays    : {mem_lists / 1024:.0f} KiB / {mem_arrays / 1024:.0f} KiB ({mem_lists / mem_arrays:.1f}x)")
+    print(f"payload json / binary     : {(len(hr_json) + len(dist_json)) / 1024:.0f} KiB / {(len(hr_blob) + len(dist_blob)) / 1024:.0f} KiB")
+    print(f"sqlite x{args.activities} json / binary : {size_json / 1024:.0f} KiB / {size_blob / 1024:.0f} KiB ({size_json / size_blob:.1f}x)")
+    print(f"decode  json / binary     : {t_json * 1000:.2f} ms / {t_blob * 1000:.3f} ms")
+    print(f"distance max abs error    : {max_err:.4f} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Concurrency check: N callers hitting an expired token share a single refresh.
+
+Starts a local /oauth/token stub (stdlib HTTP server, counts POSTs, rotates the
+refresh token like Strava does), stores an expired token in a throw-away SQLite
+database, then calls get_access_token from a pool of threads and aget_access_token
+from a batch of coroutines at the same time. Exits non-zero unless exactly one
+refresh was sent and every caller got the new access token.
+
+Then expires the token again and starts --processes worker processes on the same
+database, each calling refresh_if_expiring at the same instant (as the per-worker
+token refreshers do): again exactly one refresh may reach the stub.
+
+    python scripts/check_token_refresh.py [--threads 16] [--tasks 16] [--processes 4] [--latency 0.3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+LATENCY = 0.3
+POSTS = []
+_posts_lock = threading.Lock()
+
+
+class TokenStub(BaseHTTPRequestHandler):
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+        with _posts_lock:
+            POSTS.append(form.get("refresh_token", [None])[0])
+            n = len(POSTS)
+        time.sleep(LATENCY)
+        payload = json.dumps({
+            "access_token": f"access-{n}",
+            "refresh_token": f"refresh-{n}",
+            "expires_at": int(time.time()) + 6 * 3600,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def child(user_id: str, start_at: float):
+    """One worker process: wait for the common start time, then refresh proactively."""
+    from backend.services.token_manager import refresh_if_expiring
+    time.sleep(max(0.0, start_at - time.time()))
+    print(refresh_if_expiring(user_id, 600))
+
+
+def main():
+    global LATENCY
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], float(sys.argv[3]))
+        return
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16, help="concurrent sync callers")
+    ap.add_argument("--tasks", type=int, default=16, help="concurrent async callers")
+    ap.add_argument("--processes", type=int, default=4, help="worker processes refreshing at once")
+    ap.add_argument("--latency", type=float, default=LATENCY, help="stub latency per refresh, seconds")
+    args = ap.parse_args()
+    LATENCY = args.latency
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TokenStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["STRAVA_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Scratch SQLite database, whatever DATABASE_URL the environment/.env points at
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'tokens.db')}"
+
+    from backend.db.session import init_models
+    from backend.services.token_manager import save_tokens, get_access_token, aget_access_token
+
+    init_models()
+    user_id = "1"
+    save_tokens(user_id, {"access_token": "stale", "refresh_token": "refresh-0", "expires_at": int(time.time()) - 60})
+
+    start = threading.Barrier(args.threads + 1)
+
+    def sync_caller():
+        start.wait()
+        return get_access_token(user_id)
+
+    async def async_callers():
+        await asyncio.to_thread(start.wait)
+        return await asyncio.gather(*(aget_access_token(user_id) for _ in range(args.tasks)))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        sync_futures = [pool.submit(sync_caller) for _ in range(args.threads)]
+        async_results = asyncio.run(async_callers())
+        sync_results = [f.result() for f in sync_futures]
+    elapsed = time.perf_counter() - t0
+
+    results = sync_results + list(async_results)
+    print(f"callers          : {args.threads} threads + {args.tasks} coroutines")
+    print(f"refresh POSTs    : {len(POSTS)} (refresh tokens sent: {sorted(set(POSTS))})")
+    print(f"distinct results : {sorted(set(results), key=str)}")
+    print(f"wall time        : {elapsed * 1000:.0f} ms (stub latency {LATENCY * 1000:.0f} ms)")
+    ok = len(POSTS) == 1 and set(results) == {"access-1"}
+
+    # Same again across processes: only the row claim in the DB can stop the duplicates
+    save_tokens(user_id, {"access_token": "access-1", "refresh_token": "refresh-1", "expires_at": int(time.time()) - 60})
+    start_at = str(time.time() + 3)
+    procs = [
+        subprocess.Popen([sys.executable, __file__, "--child", user_id, start_at], stdout=subprocess.PIPE, text=True)
+        for _ in range(args.processes)
+    ]
+    proc_results = [p.communicate()[0].strip().splitlines()[-1:] for p in procs]
+    server.shutdown()
+
+    print(f"processes        : {args.processes}")
+    print(f"refresh POSTs    : {len(POSTS) - 1} (refresh tokens sent: {POSTS[1:]})")
+    print(f"distinct results : {sorted({r[0] if r else None for r in proc_results}, key=str)}")
+    ok = ok and POSTS[1:] == ["refresh-1"] and all(r == ["access-2"] for r in proc_results)
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
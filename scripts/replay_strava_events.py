@@ -0,0 +1,147 @@
+"""
+Replay Strava webhook traffic against a running backend.
+
+Sends the GET subscription handshake and/or POSTs events to /strava/webhook the
+way Strava does, so the webhook path can be exercised locally without a public
+callback URL. Events come from a JSON/JSON-lines file (one Strava event object per
+line, or a JSON list), or are built from the command line.
+
+    python scripts/replay_strava_events.py --handshake
+    python scripts/replay_strava_events.py --owner 12345 --create 987654321
+    python scripts/replay_strava_events.py --owner 12345 --update 987654321 --title "Long run"
+    python scripts/replay_strava_events.py --owner 12345 --delete 987654321
+    python scripts/replay_strava_events.py --owner 12345 --deauthorize
+    python scripts/replay_strava_events.py --file events.jsonl [--delay 0.5]
+    python scripts/replay_strava_events.py --owner 12345 --update 987654321 --flood 50
+
+Events carry STRAVA_WEBHOOK_SUBSCRIPTION_ID, which must match the backend's (it
+rejects every POST while that is unset). The backend answers right away; watch the
+worker's effect in its logs or in /metrics (strava_webhook_events_total). Deletes
+and deauthorizations only take effect once Strava confirms them (404 / 401), so
+against the real API a replayed one is ignored ("unconfirmed").
+
+--flood N is the backpressure regression check: it POSTs N copies of the events at
+once, then redelivers every 503 like Strava does. Run the backend with a small
+STRAVA_WEBHOOK_QUEUE_SIZE (e.g. 1); it passes only if the overflow was answered 503
+(not a 200 for an event that was never queued) and every event got in eventually.
+"""
+import argparse
+import json
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+DEFAULT_URL = "http://localhost:8000/strava/webhook"
+REDELIVERIES = 3  # Strava retries a failed delivery up to three times
+
+
+def build_event(object_type, aspect_type, object_id, owner_id, updates=None, subscription_id=None):
+    return {
+        "aspect_type": aspect_type,
+        "event_time": int(time.time()),
+        "object_id": int(object_id),
+        "object_type": object_type,
+        "owner_id": int(owner_id),
+        "subscription_id": int(subscription_id or os.getenv("STRAVA_WEBHOOK_SUBSCRIPTION_ID") or 1),
+        "updates": updates or {},
+    }
+
+
+def load_events(path):
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def handshake(client, url, verify_token):
+    challenge = secrets.token_urlsafe(12)
+    r = client.get(url, params={
+        "hub.mode": "subscribe",
+        "hub.verify_token": verify_token or "",
+        "hub.challenge": challenge,
+    })
+    ok = r.status_code == 200 and r.json().get("hub.challenge") == challenge
+    print(f"GET handshake -> {r.status_code} {r.text} {'OK' if ok else 'FAILED'}")
+    return ok
+
+
+def flood(client, url, events, copies):
+    """POST `copies` of each event concurrently, then redeliver the 503s one by one."""
+    batch = [event for event in events for _ in range(copies)]
+    with ThreadPoolExecutor(max_workers=min(len(batch), 32)) as pool:
+        codes = list(pool.map(lambda event: client.post(url, json=event).status_code, batch))
+    rejected = [event for event, code in zip(batch, codes) if code == 503]
+    print(f"flood: {len(batch)} POSTs -> {codes.count(200)} accepted, {len(rejected)} rejected (503), "
+          f"{len(batch) - codes.count(200) - len(rejected)} other")
+
+    for attempt in range(1, REDELIVERIES + 1):
+        if not rejected:
+            break
+        time.sleep(2)
+        rejected = [event for event in rejected if client.post(url, json=event).status_code == 503]
+        print(f"redelivery {attempt}: {len(rejected)} still rejected")
+
+    ok = set(codes) <= {200, 503} and 503 in codes and not rejected
+    print(f"flood {'OK' if ok else 'FAILED'}" + ("" if 503 in codes else " (no 503: is the queue small enough?)"))
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--url", default=DEFAULT_URL)
+    ap.add_argument("--handshake", action="store_true", help="run the GET subscription handshake")
+    ap.add_argument("--verify-token", default=os.getenv("STRAVA_WEBHOOK_VERIFY_TOKEN"))
+    ap.add_argument("--file", help="JSON list or JSON-lines file of Strava events")
+    ap.add_argument("--owner", type=int, help="Strava athlete id (owner_id)")
+    ap.add_argument("--create", type=int, metavar="ACTIVITY_ID")
+    ap.add_argument("--update", type=int, metavar="ACTIVITY_ID")
+    ap.add_argument("--title", help="new title for --update")
+    ap.add_argument("--delete", type=int, metavar="ACTIVITY_ID")
+    ap.add_argument("--deauthorize", action="store_true", help="athlete revoked access")
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds between events")
+    ap.add_argument("--flood", type=int, metavar="N", help="POST N copies of the events at once and expect 503s")
+    args = ap.parse_args()
+
+    events = load_events(args.file) if args.file else []
+    if args.create or args.update or args.delete or args.deauthorize:
+        if args.owner is None:
+            ap.error("--owner is required to build events")
+        if args.create:
+            events.append(build_event("activity", "create", args.create, args.owner))
+        if args.update:
+            updates = {"title": args.title} if args.title else {}
+            events.append(build_event("activity", "update", args.update, args.owner, updates))
+        if args.delete:
+            events.append(build_event("activity", "delete", args.delete, args.owner))
+        if args.deauthorize:
+            events.append(build_event("athlete", "update", args.owner, args.owner, {"authorized": "false"}))
+
+    if not args.handshake and not events:
+        ap.error("nothing to do: pass --handshake, --file or an event option")
+
+    ok = True
+    with httpx.Client(timeout=5.0) as client:
+        if args.handshake:
+            ok &= handshake(client, args.url, args.verify_token)
+        if args.flood:
+            ok &= flood(client, args.url, events, args.flood)
+            events = []
+        for event in events:
+            t0 = time.perf_counter()
+            r = client.post(args.url, json=event)
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"POST {event['object_type']}/{event['aspect_type']} {event['object_id']} -> {r.status_code} in {ms:.0f} ms")
+            ok &= r.status_code == 200
+            if args.delay:
+                time.sleep(args.delay)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()